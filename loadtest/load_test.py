@@ -0,0 +1,544 @@
+# loadtest/load_test.py
+"""
+End-to-end load test of the gateway, api and verification services
+
+Sends requests at a fixed open-loop arrival rate, whether or not earlier
+ones have finished, so a saturated service shows up as growing latency and
+errors and the generator does not slow down with it. Requests go to:
+  gateway       POST /verify?image_url=... (the image is served by this script)
+  api           POST /upload
+  verification  POST /analyze
+  stored        POST /upload on the api, then /analyze/stored/{handle} on verification
+The mix of targets and image sizes is configurable. Images are synthetic
+JPEGs, and each request gets different bytes (a JPEG comment holds its
+sequence number), so every analysis misses the result cache unless
+--cache-hits is given.
+
+Reports p50/p95/p99 latency, throughput and error rates per target and
+image size. Latency is measured from the scheduled send time, so time
+spent queued in the client counts too. Results can be saved and compared
+against an earlier run; a comparison regresses when latency or error
+rate grows, or throughput drops, beyond the thresholds.
+
+Usage (from the repository root, with the services running):
+    python loadtest/load_test.py [--rate 2] [--duration 60] [--warm-up 10]
+        [--arrivals poisson|constant] [--mix gateway=1 api=1 verification=1 stored=1]
+        [--sizes 0.3:5 2:3 12:1] [--cache-hits] [--save NAME] [--compare NAME]
+        [--results-dir DIR]
+    python loadtest/load_test.py --report BASE NEW [--results-dir DIR]
+
+The default URLs are the ports docker-compose.yml publishes. The gateway
+fetches images from this script, so it must list the image host in
+FETCH_ALLOWED_HOSTS; with docker-compose pass --image-host
+host.docker.internal.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import random
+import sys
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+import httpx
+import numpy as np
+from PIL import Image
+
+# Default home of saved runs (ignored by git); --results-dir puts them elsewhere
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+TARGETS = ['gateway', 'api', 'verification', 'stored']
+PERCENTILES = (50, 95, 99)
+
+# Latency growth smaller than this is timer and scheduling noise
+MIN_LATENCY_DELTA_MS = 5.0
+
+# The generator itself is overloaded when sends start this late
+MAX_SEND_LAG_S = 0.05
+
+@dataclass
+class Sample:
+    """Outcome of one request"""
+    target: str
+    size: str
+    latency_s: float
+    outcome: str  # 'ok', an HTTP status code, or a transport error
+    queue_wait_ms: Optional[float] = None
+    compute_ms: Optional[float] = None
+
+def synthetic_jpeg(megapixels: float, seed: int, quality: int = 90) -> bytes:
+    """RGB JPEG of a smooth gradient with sensor-like noise and a noisier patch"""
+    rng = np.random.default_rng(seed)
+    h = int(np.sqrt(megapixels * 1e6 * 3 / 4))
+    w = int(megapixels * 1e6 / h)
+    gray = np.add.outer(np.linspace(40, 200, h, dtype=np.float32),
+                        np.linspace(0, 30, w, dtype=np.float32))
+    gray += rng.normal(0, 3, (h, w)).astype(np.float32)
+    gray[h // 4:h // 2, w // 4:w // 2] += rng.normal(0, 9, (h // 2 - h // 4, w // 2 - w // 4))
+    tint = np.array([1.0, 0.85, 0.7], dtype=np.float32)
+    pixels = np.clip(gray[..., None] * tint, 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels, 'RGB').save(buffer, 'JPEG', quality=quality)
+    return buffer.getvalue()
+
+def with_comment(contents: bytes, text: str) -> bytes:
+    """The JPEG with a COM segment after SOI: new bytes (and SHA-256), same pixels"""
+    payload = text.encode()
+    return contents[:2] + b'\xff\xfe' + (len(payload) + 2).to_bytes(2, 'big') + payload + contents[2:]
+
+class ImageSet:
+    """Synthetic JPEGs per size class, picked by weight"""
+
+    def __init__(self, sizes: Dict[str, Tuple[float, float]], variants: int, unique: bool):
+        self.labels = list(sizes)
+        self.weights = [weight for _, weight in sizes.values()]
+        self.unique = unique
+        self.images: Dict[str, List[bytes]] = {}
+        for index, (label, (megapixels, _)) in enumerate(sizes.items()):
+            self.images[label] = [synthetic_jpeg(megapixels, seed=index * 1000 + variant)
+                                  for variant in range(variants)]
+
+    def pick(self, rng: random.Random) -> Tuple[str, int]:
+        """(size label, variant) for the next request"""
+        label = rng.choices(self.labels, self.weights)[0]
+        return label, rng.randrange(len(self.images[label]))
+
+    def contents(self, label: str, variant: int, seq: int) -> bytes:
+        contents = self.images[label][variant]
+        return with_comment(contents, f"load_test {seq}") if self.unique else contents
+
+class ImageServer:
+    """Minimal HTTP server for the gateway to fetch images from
+
+    Serves GET /images/<size>/<variant>/<seq>.jpg, one request per connection.
+    """
+
+    def __init__(self, images: ImageSet, host: str, bind: str, port: int):
+        self.images = images
+        self.host = host
+        self.bind = bind
+        self.port = port
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, self.bind, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    def url(self, label: str, variant: int, seq: int) -> str:
+        return f"http://{self.host}:{self.port}/images/{label}/{variant}/{seq}.jpg"
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            # Skip the headers
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+            body = self._lookup(request_line)
+            if body is None:
+                writer.write(b'HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+            else:
+                writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: image/jpeg\r\n'
+                             b'Content-Length: %d\r\nConnection: close\r\n\r\n' % len(body))
+                writer.write(body)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def _lookup(self, request_line: List[str]) -> Optional[bytes]:
+        if len(request_line) < 2 or request_line[0] != 'GET':
+            return None
+        parts = request_line[1].split('/')
+        # ['', 'images', label, variant, '<seq>.jpg']
+        if len(parts) != 5 or parts[1] != 'images' or parts[2] not in self.images.images:
+            return None
+        try:
+            variant, seq = int(parts[3]), int(parts[4].rsplit('.', 1)[0])
+            return self.images.contents(parts[2], variant, seq)
+        except (ValueError, IndexError):
+            return None
+
+def outcome_of(response: httpx.Response) -> str:
+    return 'ok' if response.status_code == 200 else str(response.status_code)
+
+def analysis_timings(body: Dict[str, Any]) -> Tuple[Optional[float], Optional[float]]:
+    """queue_wait_ms and compute_ms of a computed analysis, if reported"""
+    return body.get('queue_wait_ms'), body.get('compute_ms')
+
+class LoadTest:
+    """Open-loop request generator for one run"""
+
+    def __init__(self, args: argparse.Namespace, images: ImageSet, image_server: Optional[ImageServer]):
+        self.args = args
+        self.images = images
+        self.image_server = image_server
+        self.targets = [target for target in TARGETS if args.mix.get(target, 0) > 0]
+        self.target_weights = [args.mix[target] for target in self.targets]
+        self.rng = random.Random(args.seed)
+        self.samples: List[Sample] = []
+        self.send_lags: List[float] = []
+        self.client: Optional[httpx.AsyncClient] = None
+
+    async def run(self) -> List[Sample]:
+        args = self.args
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(args.timeout, connect=5),
+            limits=httpx.Limits(max_connections=args.max_in_flight,
+                                max_keepalive_connections=args.max_in_flight)
+        )
+        loop = asyncio.get_running_loop()
+        in_flight = set()
+        seq = 0
+        offset = 0.0
+        start = loop.time()
+        end = args.warm_up + args.duration
+        try:
+            while offset < end:
+                delay = start + offset - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                measured = offset >= args.warm_up
+                if measured:
+                    self.send_lags.append(loop.time() - start - offset)
+                target = self.rng.choices(self.targets, self.target_weights)[0]
+                label, variant = self.images.pick(self.rng)
+                if len(in_flight) >= args.max_in_flight:
+                    # Never queue in the client: an open loop would hide the overload
+                    if measured:
+                        self.samples.append(Sample(target, label, 0.0, 'client_saturated'))
+                else:
+                    task = asyncio.ensure_future(
+                        self._send(target, label, variant, seq, start + offset, measured))
+                    in_flight.add(task)
+                    task.add_done_callback(in_flight.discard)
+                seq += 1
+                offset += self._interval()
+            if in_flight:
+                await asyncio.gather(*in_flight)
+        finally:
+            await self.client.aclose()
+        return self.samples
+
+    def _interval(self) -> float:
+        if self.args.arrivals == 'poisson':
+            return self.rng.expovariate(self.args.rate)
+        return 1 / self.args.rate
+
+    async def _send(self, target: str, label: str, variant: int, seq: int,
+                    scheduled: float, measured: bool):
+        loop = asyncio.get_running_loop()
+        queue_wait_ms = compute_ms = None
+        try:
+            outcome, body = await getattr(self, f"_call_{target}")(label, variant, seq)
+            if outcome == 'ok':
+                queue_wait_ms, compute_ms = analysis_timings(body)
+        except httpx.TimeoutException:
+            outcome = 'timeout'
+        except httpx.ConnectError:
+            outcome = 'connect_error'
+        except (httpx.HTTPError, ValueError):
+            outcome = 'http_error'
+        if measured:
+            self.samples.append(Sample(target, label, loop.time() - scheduled, outcome,
+                                       queue_wait_ms, compute_ms))
+
+    def _upload(self, label: str, variant: int, seq: int) -> Dict[str, Any]:
+        return {'file': (f"{label}-{variant}-{seq}.jpg",
+                         self.images.contents(label, variant, seq), 'image/jpeg')}
+
+    async def _call_gateway(self, label: str, variant: int, seq: int) -> Tuple[str, Dict[str, Any]]:
+        response = await self.client.post(f"{self.args.gateway_url}/verify", params={
+            'image_url': self.image_server.url(label, variant, seq)})
+        return outcome_of(response), response.json().get('verification', {}) if response.status_code == 200 else {}
+
+    async def _call_api(self, label: str, variant: int, seq: int) -> Tuple[str, Dict[str, Any]]:
+        response = await self.client.post(f"{self.args.api_url}/upload",
+                                          files=self._upload(label, variant, seq))
+        return outcome_of(response), {}
+
+    async def _call_verification(self, label: str, variant: int, seq: int) -> Tuple[str, Dict[str, Any]]:
+        response = await self.client.post(f"{self.args.verification_url}/analyze",
+                                          files=self._upload(label, variant, seq))
+        return outcome_of(response), response.json() if response.status_code == 200 else {}
+
+    async def _call_stored(self, label: str, variant: int, seq: int) -> Tuple[str, Dict[str, Any]]:
+        upload = await self.client.post(f"{self.args.api_url}/upload",
+                                        files=self._upload(label, variant, seq))
+        if upload.status_code != 200:
+            return f"upload_{upload.status_code}", {}
+        response = await self.client.post(
+            f"{self.args.verification_url}/analyze/stored/{upload.json()['handle']}")
+        return outcome_of(response), response.json() if response.status_code == 200 else {}
+
+def percentiles(values: List[float], scale: float = 1.0) -> Optional[Dict[str, float]]:
+    if not values:
+        return None
+    points = np.percentile(np.asarray(values) * scale, PERCENTILES)
+    summary = {f"p{p}": round(float(v), 1) for p, v in zip(PERCENTILES, points)}
+    summary['max'] = round(float(max(values)) * scale, 1)
+    return summary
+
+def summarize_group(samples: List[Sample], duration: float) -> Dict[str, Any]:
+    """Counts, rates and latency percentiles (ms, successful requests) of one group"""
+    ok = [s for s in samples if s.outcome == 'ok']
+    summary = {
+        'requests': len(samples),
+        'ok': len(ok),
+        'errors': dict(Counter(s.outcome for s in samples if s.outcome != 'ok')),
+        'error_rate': round(1 - len(ok) / len(samples), 4) if samples else 0.0,
+        'offered_rps': round(len(samples) / duration, 3),
+        'throughput_rps': round(len(ok) / duration, 3),
+        'latency_ms': percentiles([s.latency_s for s in ok], 1000)
+    }
+    queue_waits = [s.queue_wait_ms for s in ok if s.queue_wait_ms is not None]
+    if queue_waits:
+        summary['queue_wait_ms'] = percentiles(queue_waits)
+        summary['compute_ms'] = percentiles([s.compute_ms for s in ok if s.compute_ms is not None])
+    return summary
+
+def summarize(samples: List[Sample], duration: float) -> Dict[str, Dict[str, Any]]:
+    """Summaries for all requests, each target and each target and image size"""
+    groups: Dict[str, List[Sample]] = defaultdict(list)
+    for sample in samples:
+        groups['all'].append(sample)
+        groups[sample.target].append(sample)
+        groups[f"{sample.target}/{sample.size}MP"].append(sample)
+    return {key: summarize_group(groups[key], duration)
+            for key in sorted(groups, key=lambda k: (k != 'all', k))}
+
+def print_summary(summary: Dict[str, Dict[str, Any]]):
+    print(f"\n{'group':<26} {'req':>6} {'ok/s':>7} {'err%':>6} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'wait p95':>9} {'cpu p95':>8}  errors")
+    for key, group in summary.items():
+        latency = group['latency_ms'] or {}
+        queue_wait = group.get('queue_wait_ms') or {}
+        compute = group.get('compute_ms') or {}
+        errors = ', '.join(f"{outcome}={count}" for outcome, count in sorted(group['errors'].items()))
+        print(f"{key:<26} {group['requests']:>6} {group['throughput_rps']:>7.2f} "
+              f"{group['error_rate'] * 100:>6.1f} {cell(latency.get('p50'), 8)} "
+              f"{cell(latency.get('p95'), 8)} {cell(latency.get('p99'), 8)} "
+              f"{cell(queue_wait.get('p95'), 9)} {cell(compute.get('p95'), 8)}  {errors}")
+
+def cell(value: Optional[float], width: int, spec: str = '.1f', suffix: str = '') -> str:
+    """Right-aligned table cell; '-' when there is nothing to report (no successful requests)"""
+    text = '-' if value is None else f"{value:{spec}}{suffix}"
+    return f"{text:>{width}}"
+
+def environment() -> Dict[str, Any]:
+    """Load generator host, stored with results to spot cross-machine comparisons"""
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count()
+    }
+
+def run_config(args: argparse.Namespace) -> Dict[str, Any]:
+    """Settings that make two runs comparable"""
+    return {
+        'rate': args.rate,
+        'arrivals': args.arrivals,
+        'duration': args.duration,
+        'mix': args.mix,
+        'sizes': {label: weight for label, (_, weight) in args.sizes.items()},
+        'cache_hits': args.cache_hits
+    }
+
+def results_path(name: str, results_dir: str = RESULTS_DIR) -> str:
+    return name if name.endswith('.json') else os.path.join(results_dir, f"{name}.json")
+
+def save_results(name: str, config: Dict[str, Any], summary: Dict[str, Dict[str, Any]],
+                 results_dir: str = RESULTS_DIR):
+    path = results_path(name, results_dir)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'config': config,
+            'environment': environment(),
+            'summary': summary
+        }, f, indent=2, sort_keys=True)
+    print(f"\nSaved results to {path}")
+
+def load_results(name: str, results_dir: str = RESULTS_DIR) -> Dict[str, Any]:
+    with open(results_path(name, results_dir)) as f:
+        return json.load(f)
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], latency_threshold: float,
+            throughput_threshold: float, error_threshold: float) -> List[str]:
+    """Print a comparison table of two runs and return the regressed groups"""
+    if baseline['config'] != current['config']:
+        print("\nWarning: runs used different settings:")
+        print(f"  baseline: {json.dumps(baseline['config'], sort_keys=True)}")
+        print(f"  current:  {json.dumps(current['config'], sort_keys=True)}")
+    if baseline['environment'] != current['environment']:
+        print("\nWarning: runs were generated from different hosts")
+
+    regressions = []
+    print(f"\n{'group':<26} {'p50':>7} {'p95':>7} {'p99':>7} {'ok/s':>7} {'err% was':>9} {'err% now':>9}  status")
+    for key, now in current['summary'].items():
+        before = baseline['summary'].get(key)
+        if before is None:
+            print(f"{key:<26} {'':>7} {'':>7} {'':>7} {'':>7} {'':>9} {'':>9}  new")
+            continue
+        problems = []
+        ratios = {}
+        for point in ('p50', 'p95', 'p99'):
+            if not before['latency_ms'] or not now['latency_ms']:
+                ratios[point] = None
+                continue
+            was, is_ = before['latency_ms'][point], now['latency_ms'][point]
+            ratios[point] = is_ / max(was, 1e-9)
+            if (point != 'p50' and ratios[point] > 1 + latency_threshold
+                    and is_ - was > MIN_LATENCY_DELTA_MS):
+                problems.append(f"{point.upper()} SLOWER")
+        throughput_ratio = now['throughput_rps'] / before['throughput_rps'] if before['throughput_rps'] else 1.0
+        if throughput_ratio < 1 - throughput_threshold:
+            problems.append("LESS THROUGHPUT")
+        if now['error_rate'] - before['error_rate'] > error_threshold:
+            problems.append("MORE ERRORS")
+        if problems:
+            regressions.append(key)
+        print(f"{key:<26} {cell(ratios['p50'], 7, '.2f', 'x')} {cell(ratios['p95'], 7, '.2f', 'x')} "
+              f"{cell(ratios['p99'], 7, '.2f', 'x')} {cell(throughput_ratio, 7, '.2f', 'x')} {before['error_rate'] * 100:>9.1f} {now['error_rate'] * 100:>9.1f}  "
+              f"{', '.join(problems) or 'ok'}")
+    return regressions
+
+async def check_services(args: argparse.Namespace, targets: List[str]):
+    """Fail fast when a service the mix needs is not answering its health check"""
+    needed = set()
+    for target in targets:
+        needed.update({'gateway': ['gateway'], 'api': ['api'], 'verification': ['verification'],
+                       'stored': ['api', 'verification']}[target])
+    async with httpx.AsyncClient(timeout=5) as client:
+        for service in sorted(needed):
+            url = getattr(args, f"{service}_url")
+            try:
+                (await client.get(f"{url}/health")).raise_for_status()
+            except httpx.HTTPError as e:
+                sys.exit(f"{service} service at {url} is not healthy: {e!r}")
+
+async def run(args: argparse.Namespace) -> List[Sample]:
+    print(f"Generating images ({', '.join(args.sizes)} MP, {args.variants} variants each)...")
+    images = ImageSet(args.sizes, args.variants, unique=not args.cache_hits)
+    load_test_targets = [target for target in TARGETS if args.mix.get(target, 0) > 0]
+    await check_services(args, load_test_targets)
+
+    image_server = None
+    if 'gateway' in load_test_targets:
+        image_server = ImageServer(images, args.image_host, args.image_bind, args.image_port)
+        await image_server.start()
+        print(f"Serving images at http://{args.image_host}:{image_server.port}/images/")
+    print(f"Sending {args.rate:g} requests/s ({args.arrivals}) for {args.warm_up:g} s of warm-up "
+          f"and {args.duration:g} s measured...")
+    load_test = LoadTest(args, images, image_server)
+    try:
+        samples = await load_test.run()
+    finally:
+        if image_server is not None:
+            await image_server.stop()
+
+    if load_test.send_lags and np.percentile(load_test.send_lags, 99) > MAX_SEND_LAG_S:
+        print(f"\nWarning: sends started up to {max(load_test.send_lags) * 1000:.0f} ms late; "
+              f"the load generator is overloaded and the offered rate was not reached")
+    return samples
+
+def parse_weights(values: List[str], name: str) -> Dict[str, float]:
+    weights = {}
+    for value in values:
+        key, _, weight = value.partition('=')
+        if key not in TARGETS:
+            raise argparse.ArgumentTypeError(f"unknown {name} target {key!r}")
+        weights[key] = float(weight or 1)
+    return weights
+
+def parse_sizes(values: List[str]) -> Dict[str, Tuple[float, float]]:
+    """'MP:weight' entries, keyed by their label ('12' for 12 MP)"""
+    sizes = {}
+    for value in values:
+        megapixels, _, weight = value.partition(':')
+        sizes[f"{float(megapixels):g}"] = (float(megapixels), float(weight or 1))
+    return sizes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rate', type=float, default=2.0, help='requests per second (default 2)')
+    parser.add_argument('--duration', type=float, default=60.0, help='measured seconds (default 60)')
+    parser.add_argument('--warm-up', type=float, default=10.0,
+                        help='seconds of load sent before measuring (default 10)')
+    parser.add_argument('--arrivals', choices=['poisson', 'constant'], default='poisson',
+                        help='exponential or fixed gaps between requests (default poisson)')
+    parser.add_argument('--mix', nargs='+', default=['gateway=1', 'api=1', 'verification=1', 'stored=1'],
+                        metavar='TARGET=WEIGHT', help=f"relative share of each target ({', '.join(TARGETS)})")
+    parser.add_argument('--sizes', nargs='+', default=['0.3:5', '2:3', '12:1'], metavar='MP:WEIGHT',
+                        help='image sizes in megapixels and their relative share')
+    parser.add_argument('--variants', type=int, default=4, help='distinct images per size (default 4)')
+    parser.add_argument('--cache-hits', action='store_true',
+                        help='resend the same bytes per variant, so analyses hit the result cache')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the arrival and mix sequence')
+    parser.add_argument('--timeout', type=float, default=120.0, help='seconds allowed per request')
+    parser.add_argument('--max-in-flight', type=int, default=512,
+                        help='requests open at once; arrivals beyond it count as client_saturated errors')
+    parser.add_argument('--gateway-url', default='http://localhost:8002')
+    parser.add_argument('--api-url', default='http://localhost:8000')
+    parser.add_argument('--verification-url', default='http://localhost:8003')
+    parser.add_argument('--image-host', default='127.0.0.1',
+                        help='host name the gateway reaches this script by (host.docker.internal for docker-compose)')
+    parser.add_argument('--image-bind', default='0.0.0.0', help='address the image server listens on')
+    parser.add_argument('--image-port', type=int, default=0, help='image server port (default: any free port)')
+    parser.add_argument('--save', metavar='NAME', help='save the summary as RESULTS_DIR/NAME.json')
+    parser.add_argument('--compare', metavar='NAME', help='compare against RESULTS_DIR/NAME.json')
+    parser.add_argument('--results-dir', default=RESULTS_DIR,
+                        help='directory of saved runs (default loadtest/results, ignored by git)')
+    parser.add_argument('--report', nargs=2, metavar=('BASE', 'NEW'),
+                        help='compare two saved runs without sending any load')
+    parser.add_argument('--latency-threshold', type=float, default=0.15,
+                        help='allowed relative p95/p99 latency growth before flagging (default 0.15)')
+    parser.add_argument('--throughput-threshold', type=float, default=0.05,
+                        help='allowed relative throughput drop before flagging (default 0.05)')
+    parser.add_argument('--error-threshold', type=float, default=0.01,
+                        help='allowed absolute error rate growth before flagging (default 0.01)')
+    args = parser.parse_args()
+
+    thresholds = (args.latency_threshold, args.throughput_threshold, args.error_threshold)
+    if args.report:
+        regressions = compare(load_results(args.report[0], args.results_dir),
+                              load_results(args.report[1], args.results_dir), *thresholds)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.report[0]}")
+            sys.exit(1)
+        return
+
+    try:
+        args.mix = parse_weights(args.mix, 'mix')
+        args.sizes = parse_sizes(args.sizes)
+    except (argparse.ArgumentTypeError, ValueError) as e:
+        parser.error(str(e))
+    if args.rate <= 0 or not any(weight > 0 for weight in args.mix.values()):
+        parser.error('--rate and at least one --mix weight must be positive')
+
+    samples = asyncio.run(run(args))
+    summary = summarize(samples, args.duration)
+    print_summary(summary)
+    current = {'config': run_config(args), 'environment': environment(), 'summary': summary}
+
+    regressions: Optional[List[str]] = None
+    if args.compare:
+        regressions = compare(load_results(args.compare, args.results_dir), current, *thresholds)
+    if args.save:
+        save_results(args.save, current['config'], summary, args.results_dir)
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) against {args.compare}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+# services/api/src/blobstore.py (copy of services/verification/src/blobstore.py; tests/test_shared_modules.py keeps them identical)
+import hashlib
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional
+from ingest import BytesSource, ImageSource, MappedFileSource
+
+# Used by both the api and verification services; they share blobs only
+# when pointed at the same directory (a shared volume across containers)
+DEFAULT_BLOB_DIR = os.path.join(tempfile.gettempdir(), "image-blobs")
+
+METADATA_FORMAT = 1
+
+CHUNK_BYTES = 1024 * 1024
+
+HANDLE_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+class BlobStore:
+    """Content-addressed store for uploaded images and their parsed metadata
+
+    Blobs are named by the SHA-256 of their bytes, so the digest doubles as
+    the handle clients pass between services and identical uploads are
+    stored once. Writes go to a temporary file renamed into place, so a
+    reader in another process never sees a partial blob. Blobs neither
+    written nor read for `max_age` seconds are swept (0 keeps them forever),
+    in a background thread started by `put`.
+
+    Every method does blocking file I/O; async callers run them in a thread.
+    """
+
+    def __init__(self, root: str = DEFAULT_BLOB_DIR, max_age: float = 86400.0):
+        self.root = root
+        self.max_age = max_age
+        self._last_sweep = time.time()
+        self._sweeping = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def put(self, source: ImageSource, metadata: Optional[Dict[str, Any]] = None) -> str:
+        """Store the bytes of `source` plus optional JSON metadata; returns the handle
+
+        The digest is computed while copying, so the upload is read once.
+        """
+        digest = hashlib.sha256()
+        with source.open() as f:
+            temp_path = self._write_atomic(lambda out: _copy_hashing(f, out, digest))
+        handle = digest.hexdigest()
+        path = self._path(handle)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Replacing an identical blob is harmless and refreshes its age
+        os.replace(temp_path, path)
+
+        if metadata is not None:
+            sidecar = json.dumps({**metadata, "format_version": METADATA_FORMAT}).encode("utf-8")
+            os.replace(self._write_atomic(lambda out: out.write(sidecar)), path + ".json")
+
+        self._maybe_sweep()
+        return handle
+
+    def open(self, handle: str) -> Optional[ImageSource]:
+        """Source over a stored blob, or None for unknown, expired or malformed handles
+
+        The source keeps the file open, so a concurrent sweep can't pull it
+        away mid-analysis.
+        """
+        if not HANDLE_PATTERN.match(handle):
+            return None
+        path = self._path(handle)
+        try:
+            fileobj = open(path, "rb")
+        except FileNotFoundError:
+            return None
+        _touch(path)
+        if os.fstat(fileobj.fileno()).st_size == 0:
+            # Empty files cannot be memory-mapped
+            fileobj.close()
+            return BytesSource(b"")
+        return _BlobSource(fileobj, handle)
+
+    def metadata(self, handle: str) -> Optional[Dict[str, Any]]:
+        """Metadata stored with a blob, or None when absent or from another format version"""
+        if not HANDLE_PATTERN.match(handle):
+            return None
+        try:
+            with open(self._path(handle) + ".json", "rb") as f:
+                metadata = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if metadata.pop("format_version", None) != METADATA_FORMAT:
+            return None
+        return metadata
+
+    def sweep(self) -> int:
+        """Delete blobs, sidecars and abandoned partial writes older than `max_age`"""
+        expired = time.time() - self.max_age
+        removed = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    if os.stat(path).st_mtime < expired:
+                        os.unlink(path)
+                        removed += 1
+                except FileNotFoundError:
+                    # Another process swept it first
+                    pass
+        return removed
+
+    def _maybe_sweep(self):
+        """Start a sweep when one is due, unless one is still running"""
+        if self.max_age <= 0 or time.time() - self._last_sweep <= self.max_age / 10:
+            return
+        if not self._sweeping.acquire(blocking=False):
+            return
+        self._last_sweep = time.time()
+        # Walking a large shared store must not hold up the upload that triggered it
+        threading.Thread(target=self._sweep_in_background, name="blob-sweep", daemon=True).start()
+
+    def _sweep_in_background(self):
+        try:
+            self.sweep()
+        finally:
+            self._sweeping.release()
+
+    def _write_atomic(self, write) -> str:
+        """Run `write(fileobj)` against a new temporary file in the store; returns its path"""
+        fd, temp_path = tempfile.mkstemp(dir=self.root, prefix=".incoming-")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                write(out)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        return temp_path
+
+    def _path(self, handle: str) -> str:
+        # Two-character fan-out keeps directories small
+        return os.path.join(self.root, handle[:2], handle)
+
+def _copy_hashing(source: io.RawIOBase, out, digest):
+    for chunk in iter(lambda: source.read(CHUNK_BYTES), b""):
+        digest.update(chunk)
+        out.write(chunk)
+
+def _touch(path: str):
+    for target in (path, path + ".json"):
+        try:
+            os.utime(target)
+        except FileNotFoundError:
+            pass
+
+class _BlobSource(MappedFileSource):
+    """Mapped source over a stored blob; its handle is already its digest"""
+
+    def __init__(self, fileobj, handle: str):
+        super().__init__(fileobj)
+        self._fileobj = fileobj
+        self._handle = handle
+
+    def sha256(self) -> str:
+        return self._handle
+
+    def close(self):
+        super().close()
+        self._fileobj.close()
@@ -3,10 +3,21 @@ from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from PIL import Image
-import io
+import asyncio
+import os
+import time
+from blobstore import DEFAULT_BLOB_DIR, BlobStore
+from ingest import UploadLimitMiddleware, source_for_upload
+from metrics import IMAGE_BYTES, IMAGE_MEGAPIXELS, STAGE_SECONDS, MetricsMiddleware, metrics_response
 
 app = FastAPI(title="Upload API Service")
 
+# MAX_UPLOAD_BYTES: request body cap, checked before the upload is spooled
+app.add_middleware(
+    UploadLimitMiddleware,
+    max_bytes=int(os.getenv("MAX_UPLOAD_BYTES", str(256 * 1024 * 1024)))
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -15,46 +26,85 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so rejected uploads are counted too
+app.add_middleware(MetricsMiddleware)
+
+# BLOB_STORE_DIR: content-addressed upload store, shared with the verification service,
+# BLOB_STORE_MAX_AGE: seconds an unused upload is kept (0 keeps them forever)
+blob_store = BlobStore(
+    root=os.getenv("BLOB_STORE_DIR", DEFAULT_BLOB_DIR),
+    max_age=float(os.getenv("BLOB_STORE_MAX_AGE", "86400"))
+)
+
 class HealthResponse(BaseModel):
     service: str
     status: str
 
 @app.post("/upload")
 async def upload_image(file: UploadFile = File(...)):
-    """Upload and extract metadata from image"""
+    """Upload and extract metadata from image
+    
+    The bytes and parsed metadata are stored under the returned `handle`,
+    which the verification service analyzes without a second upload.
+    """
     try:
-        contents = await file.read()
-        image = Image.open(io.BytesIO(contents))
-        
-        # Extract basic image info
-        image_info = {
-            "filename": file.filename,
-            "format": image.format,
-            "mode": image.mode,
-            "size": image.size,
-            "file_size_bytes": len(contents)
-        }
-        
-        # Extract EXIF data if available
-        exif_data = {}
-        try:
-            exif_dict = image._getexif()
-            if exif_dict:
-                from PIL.ExifTags import TAGS
-                for tag_id, value in exif_dict.items():
-                    tag = TAGS.get(tag_id, tag_id)
-                    exif_data[str(tag)] = str(value)
-        except:
-            exif_data = {"note": "No EXIF data available"}
+        # Read through a memory map of the spooled upload instead of a copy in RAM
+        with source_for_upload(file) as source, source.open() as fp:
+            IMAGE_BYTES.observe(source.size)
+            start_time = time.perf_counter()
+            image = Image.open(fp)
+            STAGE_SECONDS.labels('decode_header').observe(time.perf_counter() - start_time)
+            IMAGE_MEGAPIXELS.observe(image.size[0] * image.size[1] / 1e6)
+            
+            # Extract basic image info
+            image_info = {
+                "filename": file.filename,
+                "format": image.format,
+                "mode": image.mode,
+                "size": image.size,
+                "file_size_bytes": source.size
+            }
+            
+            # Extract EXIF data if available
+            start_time = time.perf_counter()
+            exif_data = {}
+            exif_tags = {}
+            try:
+                exif_dict = image._getexif()
+                if exif_dict:
+                    from PIL.ExifTags import TAGS
+                    for tag_id, value in exif_dict.items():
+                        tag = TAGS.get(tag_id, tag_id)
+                        exif_data[str(tag)] = str(value)
+                exif_tags = exif_data
+            except:
+                exif_data = {"note": "No EXIF data available"}
+            STAGE_SECONDS.labels('exif').observe(time.perf_counter() - start_time)
+            
+            # Store bytes and parsed tags for the verification service
+            start_time = time.perf_counter()
+            handle = await asyncio.to_thread(blob_store.put, source, {
+                "filename": file.filename,
+                "format": image.format,
+                "size": list(image.size),
+                "exif": exif_tags
+            })
+            STAGE_SECONDS.labels('store').observe(time.perf_counter() - start_time)
         
         return JSONResponse(content={
             "message": "Image uploaded successfully",
+            "handle": handle,
             "image_info": image_info,
             "exif_data": exif_data
         })
     except Exception as e:
         return JSONResponse(content={"error": str(e)}, status_code=400)
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: request latencies, upload sizes, decode and EXIF timings"""
+    return metrics_response()
+
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
     """Simple health check for upload service"""
@@ -0,0 +1,77 @@
+# services/api/src/metrics.py
+import time
+from fastapi import Response
+from prometheus_client import CONTENT_TYPE_LATEST, Gauge, Histogram, generate_latest
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MEGAPIXEL_BUCKETS = (0.3, 1, 2, 4, 8, 12, 16, 24, 50, 100, 200)
+BYTE_BUCKETS = tuple(64 * 1024 * 4 ** i for i in range(8))  # 64 KiB .. 1 GiB
+
+REQUEST_SECONDS = Histogram(
+    'http_request_duration_seconds', 'HTTP request latency',
+    ['method', 'route', 'status'], buckets=LATENCY_BUCKETS
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    'http_requests_in_progress', 'HTTP requests currently being served', ['method', 'route']
+)
+
+STAGE_SECONDS = Histogram(
+    'api_stage_duration_seconds', 'Upload pipeline stage latency (decode_header, exif, store)',
+    ['stage'], buckets=LATENCY_BUCKETS
+)
+IMAGE_MEGAPIXELS = Histogram(
+    'api_image_megapixels', 'Uploaded image size in megapixels', buckets=MEGAPIXEL_BUCKETS
+)
+IMAGE_BYTES = Histogram(
+    'api_image_bytes', 'Uploaded image size in bytes', buckets=BYTE_BUCKETS
+)
+
+def metrics_response() -> Response:
+    """Current metrics in the Prometheus text format"""
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+class MetricsMiddleware:
+    """Request latency and in-flight gauges, labelled by route template
+
+    Route templates (not raw paths) keep label cardinality bounded;
+    unmatched paths are grouped under "other".
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        method = scope["method"]
+        in_progress = REQUESTS_IN_PROGRESS.labels(method, _route_for(scope))
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start_time = time.perf_counter()
+        in_progress.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_progress.dec()
+            # Streaming responses are timed until their last chunk
+            REQUEST_SECONDS.labels(method, _route_for(scope), str(status)).observe(
+                time.perf_counter() - start_time
+            )
+
+def _route_for(scope) -> str:
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    # Before routing, fall back to the raw path of known endpoints
+    app = scope.get("app")
+    if app is not None and any(getattr(r, "path", None) == scope["path"] for r in app.routes):
+        return scope["path"]
+    return "other"
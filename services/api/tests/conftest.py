@@ -0,0 +1,6 @@
+# services/api/tests/conftest.py
+import os
+import sys
+
+# The service runs from src/ with flat imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
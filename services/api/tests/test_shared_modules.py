@@ -0,0 +1,22 @@
+# services/api/tests/test_shared_modules.py
+import os
+import pytest
+
+SRC = os.path.join(os.path.dirname(__file__), '..', 'src')
+VERIFICATION_SRC = os.path.join(os.path.dirname(__file__), '..', '..', 'verification', 'src')
+
+# Copied from the verification service, which owns them: each service image is built
+# from its own directory. Change them there and copy them over
+SHARED_MODULES = ['ingest.py', 'blobstore.py']
+
+def body(path: str) -> str:
+    """The module without its first line (the path comment)"""
+    with open(path) as f:
+        return f.read().split('\n', 1)[1]
+
+@pytest.mark.parametrize('module', SHARED_MODULES)
+def test_shared_module_matches_verification_copy(module):
+    assert body(os.path.join(SRC, module)) == body(os.path.join(VERIFICATION_SRC, module)), (
+        f"services/api/src/{module} differs from services/verification/src/{module}; "
+        f"copy the verification version over it"
+    )
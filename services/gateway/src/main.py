@@ -1,10 +1,58 @@
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
+import asyncio
 import httpx
+import ipaddress
+import os
+import socket
 import time
-from typing import Dict, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
+from urllib.parse import urlparse
+from metrics import HOP_ERRORS, HOP_RETRIES, HOP_SECONDS, IMAGE_BYTES, MetricsMiddleware, metrics_response
 
 app = FastAPI(title="Gateway Service")
+app.add_middleware(MetricsMiddleware)
+
+# Dependent services (docker-compose service names by default)
+API_SERVICE_URL = os.getenv("API_SERVICE_URL", "http://api:8000")
+VERIFICATION_SERVICE_URL = os.getenv("VERIFICATION_SERVICE_URL", "http://verification:8001")
+
+# Per-stage timeouts (seconds), retry budget and pool size for /verify
+CONNECT_TIMEOUT = float(os.getenv("CONNECT_TIMEOUT", "2"))
+HEALTH_TIMEOUT = float(os.getenv("HEALTH_TIMEOUT", "5"))
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", "10"))
+ANALYZE_TIMEOUT = float(os.getenv("ANALYZE_TIMEOUT", "60"))
+MAX_RETRIES = int(os.getenv("MAX_RETRIES", "2"))
+MAX_CONNECTIONS = int(os.getenv("MAX_CONNECTIONS", "100"))
+MAX_IMAGE_BYTES = int(os.getenv("MAX_IMAGE_BYTES", str(256 * 1024 * 1024)))
+
+# /verify fetches only public addresses, following at most this many redirects;
+# hosts listed here (e.g. a local image origin for load tests) are exempt
+FETCH_MAX_REDIRECTS = int(os.getenv("FETCH_MAX_REDIRECTS", "5"))
+FETCH_ALLOWED_HOSTS = {host.strip().lower() for host in os.getenv("FETCH_ALLOWED_HOSTS", "").split(",") if host.strip()}
+
+# Responses worth retrying: the upstream was briefly unavailable. Those with
+# Retry-After come from an upstream shedding load and are not retried at once.
+RETRY_STATUS_CODES = {502, 503, 504}
+
+# One connection-pooled client for all outgoing requests, created at startup
+http_client: Optional[httpx.AsyncClient] = None
+
+@app.on_event("startup")
+async def create_http_client():
+    """Open the shared keep-alive connection pool"""
+    global http_client
+    http_client = httpx.AsyncClient(
+        timeout=httpx.Timeout(HEALTH_TIMEOUT, connect=CONNECT_TIMEOUT),
+        limits=httpx.Limits(max_connections=MAX_CONNECTIONS,
+                            max_keepalive_connections=MAX_CONNECTIONS),
+        follow_redirects=True
+    )
+
+@app.on_event("shutdown")
+async def close_http_client():
+    """Close pooled connections"""
+    await http_client.aclose()
 
 class HealthResponse(BaseModel):
     service: str
@@ -17,12 +65,12 @@ async def health_check():
     dependencies = {}
     overall_status = "healthy"
     
-    # Check API service health
-    api_health = await check_service_health("api", 8000, "api-service")
+    # Check API and verification service health concurrently
+    api_health, verification_health = await asyncio.gather(
+        check_service_health(API_SERVICE_URL, "api-service"),
+        check_service_health(VERIFICATION_SERVICE_URL, "verification-service")
+    )
     dependencies["api-service"] = api_health
-    
-    # Check verification service health
-    verification_health = await check_service_health("verification", 8001, "verification-service")
     dependencies["verification-service"] = verification_health
     
     # Determine overall status
@@ -40,36 +88,219 @@ async def health_check():
     
     return response
 
-async def check_service_health(service_name: str, port: int, display_name: str) -> Dict[str, Any]:
+async def check_service_health(base_url: str, display_name: str) -> Dict[str, Any]:
     """Helper function to check health of a dependent service"""
     start_time = time.time()
-    url = f"http://{service_name}:{port}/health"
+    url = f"{base_url}/health"
     
     try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            response = await client.get(url)
-            response_time = int((time.time() - start_time) * 1000)
-            
-            if response.status_code == 200:
-                return {
-                    "status": "healthy",
-                    "response_time_ms": response_time
-                }
-            else:
-                return {
-                    "status": "unhealthy",
-                    "response_time_ms": response_time,
-                    "error": f"HTTP {response.status_code}"
-                }
+        response = await http_client.get(url)
+        response_time = int((time.time() - start_time) * 1000)
+        HOP_SECONDS.labels(f"{display_name}-health").observe(time.time() - start_time)
+        
+        if response.status_code == 200:
+            return {
+                "status": "healthy",
+                "response_time_ms": response_time
+            }
+        else:
+            return {
+                "status": "unhealthy",
+                "response_time_ms": response_time,
+                "error": f"HTTP {response.status_code}"
+            }
     except Exception as e:
         response_time = int((time.time() - start_time) * 1000)
+        HOP_ERRORS.labels(f"{display_name}-health").inc()
         return {
             "status": "unhealthy",
             "response_time_ms": response_time,
             "error": str(e)
         }
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: request latencies and per-hop upstream latency, retries, errors"""
+    return metrics_response()
+
 @app.post("/verify")
 async def verify_image(image_url: str):
-    """Coordinate image verification across services"""
-    return {"message": "Image verification process initiated", "image_url": image_url}
\ No newline at end of file
+    """Coordinate image verification across services
+    
+    Fetches the image from `image_url` and forwards it to the verification
+    service over the shared connection pool, reporting per-hop latency.
+    """
+    start_time = time.perf_counter()
+    if urlparse(image_url).scheme not in ("http", "https"):
+        raise HTTPException(status_code=400, detail="image_url must be an http(s) URL")
+    
+    # Hop 1: fetch the image from its origin
+    try:
+        (contents, content_type), fetch_attempts, fetch_ms = await with_retries(
+            "fetch", lambda: fetch_image(image_url)
+        )
+    except BlockedURL as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ImageTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except (httpx.HTTPError, UpstreamError) as e:
+        raise HTTPException(status_code=502, detail=f"Failed to fetch image: {e}")
+    
+    # Hop 2: forward it to the verification service
+    filename = os.path.basename(urlparse(image_url).path) or "image"
+    try:
+        response, analyze_attempts, analyze_ms = await with_retries(
+            "verification", lambda: http_client.post(
+                f"{VERIFICATION_SERVICE_URL}/analyze",
+                files={"file": (filename, contents, content_type)},
+                timeout=httpx.Timeout(ANALYZE_TIMEOUT, connect=CONNECT_TIMEOUT)
+            )
+        )
+    except (httpx.HTTPError, UpstreamError) as e:
+        raise HTTPException(status_code=502, detail=f"Verification service unavailable: {e}")
+    
+    if response.status_code == 503 and "retry-after" in response.headers:
+        # Shed by the verification service's admission control; the client backs off
+        raise HTTPException(status_code=503, detail=error_detail(response),
+                            headers={"Retry-After": response.headers["retry-after"]})
+    if response.status_code != 200:
+        # Client errors (undecodable image, too large) keep their status
+        status_code = response.status_code if 400 <= response.status_code < 500 else 502
+        raise HTTPException(status_code=status_code, detail=error_detail(response))
+    try:
+        verification = response.json()
+    except ValueError:
+        raise HTTPException(status_code=502, detail="Verification service returned a response that isn't JSON")
+    
+    return {
+        "message": "Image verification completed",
+        "image_url": image_url,
+        "verification": verification,
+        "latency_ms": {
+            "fetch": fetch_ms,
+            "verification": analyze_ms,
+            "total": round((time.perf_counter() - start_time) * 1000, 1)
+        },
+        "attempts": {
+            "fetch": fetch_attempts,
+            "verification": analyze_attempts
+        },
+        "image_bytes": len(contents)
+    }
+
+def error_detail(response: httpx.Response) -> Any:
+    """An upstream error body: its JSON, or its text (a proxy's HTML or plain-text page)"""
+    try:
+        return response.json()
+    except ValueError:
+        return response.text
+
+class UpstreamError(Exception):
+    """Retryable upstream failure (HTTP 502/503/504)"""
+
+class ImageTooLarge(Exception):
+    """Fetched image exceeds MAX_IMAGE_BYTES"""
+
+class BlockedURL(Exception):
+    """image_url, or a redirect from it, is not a public http(s) URL"""
+
+async def resolve_addresses(host: str, port: int) -> List[str]:
+    """IP addresses `host` resolves to"""
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except socket.gaierror as e:
+        raise httpx.ConnectError(f"Cannot resolve {host}: {e}")
+    return [info[4][0] for info in infos]
+
+async def check_fetch_url(url: str):
+    """Reject URLs that would reach the gateway's own network
+    
+    Loopback, private, link-local (cloud metadata), reserved and multicast
+    addresses are refused unless the host is in FETCH_ALLOWED_HOSTS. The
+    connection resolves the name again, so a DNS server that answers
+    differently the second time can still get through; restrict the
+    gateway's egress at the network level as well.
+    """
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise BlockedURL("image_url must be an http(s) URL")
+    host = parsed.hostname.lower()
+    if host in FETCH_ALLOWED_HOSTS:
+        return
+    try:
+        addresses = [str(ipaddress.ip_address(host))]
+    except ValueError:
+        addresses = await resolve_addresses(host, parsed.port or (443 if parsed.scheme == "https" else 80))
+    for address in addresses:
+        # Drop the IPv6 zone (fe80::1%eth0)
+        ip = ipaddress.ip_address(address.split("%")[0])
+        if not ip.is_global or ip.is_multicast:
+            raise BlockedURL(f"image_url host {host} is not a public address")
+
+async def fetch_image(image_url: str) -> Tuple[bytes, str]:
+    """Download an image, following up to FETCH_MAX_REDIRECTS redirects
+    
+    Redirects are followed here rather than by the client, so that every
+    hop passes check_fetch_url.
+    """
+    timeout = httpx.Timeout(FETCH_TIMEOUT, connect=CONNECT_TIMEOUT)
+    url = image_url
+    for _ in range(FETCH_MAX_REDIRECTS + 1):
+        await check_fetch_url(url)
+        async with http_client.stream("GET", url, timeout=timeout, follow_redirects=False) as response:
+            if response.is_redirect:
+                url = str(response.url.join(response.headers["location"]))
+                continue
+            return await read_image(response)
+    raise httpx.TooManyRedirects(f"More than {FETCH_MAX_REDIRECTS} redirects")
+
+async def read_image(response: httpx.Response) -> Tuple[bytes, str]:
+    """Body of an image response, aborting once it exceeds MAX_IMAGE_BYTES"""
+    if response.status_code in RETRY_STATUS_CODES:
+        raise UpstreamError(f"HTTP {response.status_code}")
+    response.raise_for_status()
+    
+    declared = response.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > MAX_IMAGE_BYTES:
+        raise ImageTooLarge(f"Image exceeds the {MAX_IMAGE_BYTES} byte limit")
+    
+    chunks = []
+    received = 0
+    async for chunk in response.aiter_bytes():
+        received += len(chunk)
+        if received > MAX_IMAGE_BYTES:
+            raise ImageTooLarge(f"Image exceeds the {MAX_IMAGE_BYTES} byte limit")
+        chunks.append(chunk)
+    
+    IMAGE_BYTES.observe(received)
+    content_type = response.headers.get("content-type", "application/octet-stream")
+    return b"".join(chunks), content_type
+
+async def with_retries(hop: str, call) -> Tuple[Any, int, float]:
+    """Run `call` with bounded retries and exponential backoff
+    
+    Retries connection failures (including stale keep-alive connections)
+    and 502/503/504 responses, never read timeouts: a slow analysis is not
+    made faster by starting it again, nor responses with Retry-After: those
+    are returned for the caller to back off. Returns (result, attempts, elapsed_ms);
+    latency, retries and failures are recorded under the `hop` label.
+    """
+    start_time = time.perf_counter()
+    for attempt in range(1, MAX_RETRIES + 2):
+        try:
+            result = await call()
+            if (isinstance(result, httpx.Response) and result.status_code in RETRY_STATUS_CODES
+                    and "retry-after" not in result.headers):
+                raise UpstreamError(f"HTTP {result.status_code}")
+            elapsed = time.perf_counter() - start_time
+            HOP_SECONDS.labels(hop).observe(elapsed)
+            return result, attempt, round(elapsed * 1000, 1)
+        except (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError, UpstreamError):
+            if attempt > MAX_RETRIES:
+                HOP_ERRORS.labels(hop).inc()
+                raise
+            HOP_RETRIES.labels(hop).inc()
+            await asyncio.sleep(0.1 * 2 ** (attempt - 1))
+        except Exception:
+            HOP_ERRORS.labels(hop).inc()
+            raise
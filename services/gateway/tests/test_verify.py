@@ -0,0 +1,165 @@
+# services/gateway/tests/test_verify.py
+import asyncio
+import httpx
+import pytest
+from fastapi import HTTPException
+
+import main
+
+ORIGIN = "http://images.example"
+PUBLIC_ADDRESS = "93.184.216.34"
+JPEG = b"\xff\xd8\xff\xe0" + b"\x00" * 64 + b"\xff\xd9"
+
+def verify(image_url: str, handler, addresses=None, monkeypatch=None):
+    """Run /verify against `handler`, with hosts resolving to `addresses` (a public one by default)"""
+    async def resolve(host: str, port: int):
+        return (addresses or {}).get(host, [PUBLIC_ADDRESS])
+    monkeypatch.setattr(main, "resolve_addresses", resolve)
+
+    async def run():
+        main.http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            return await main.verify_image(image_url)
+        finally:
+            await main.http_client.aclose()
+    return asyncio.run(run())
+
+def analysis(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(200, json={"confidence_score": 0.1, "risk_level": "low"})
+
+def test_success(monkeypatch):
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "images.example":
+            return httpx.Response(200, content=JPEG, headers={"content-type": "image/jpeg"})
+        assert str(request.url) == f"{main.VERIFICATION_SERVICE_URL}/analyze"
+        return analysis(request)
+
+    result = verify(f"{ORIGIN}/photo.jpg", handler, monkeypatch=monkeypatch)
+    assert result["verification"]["risk_level"] == "low"
+    assert result["image_bytes"] == len(JPEG)
+    assert result["attempts"] == {"fetch": 1, "verification": 1}
+
+def test_missing_image_is_502(monkeypatch):
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(404)
+
+    with pytest.raises(HTTPException) as error:
+        verify(f"{ORIGIN}/missing.jpg", handler, monkeypatch=monkeypatch)
+    assert error.value.status_code == 502
+
+def test_refused_origin_is_502_after_retries(monkeypatch):
+    attempts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        attempts.append(request.url)
+        raise httpx.ConnectError("Connection refused", request=request)
+
+    with pytest.raises(HTTPException) as error:
+        verify(f"{ORIGIN}/photo.jpg", handler, monkeypatch=monkeypatch)
+    assert error.value.status_code == 502
+    assert len(attempts) == main.MAX_RETRIES + 1
+
+def test_verification_retries_exhausted_is_502(monkeypatch):
+    attempts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "images.example":
+            return httpx.Response(200, content=JPEG, headers={"content-type": "image/jpeg"})
+        attempts.append(request.url)
+        return httpx.Response(503)
+
+    with pytest.raises(HTTPException) as error:
+        verify(f"{ORIGIN}/photo.jpg", handler, monkeypatch=monkeypatch)
+    assert error.value.status_code == 502
+    assert len(attempts) == main.MAX_RETRIES + 1
+
+def test_non_json_503_passes_through_with_its_text(monkeypatch):
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "images.example":
+            return httpx.Response(200, content=JPEG, headers={"content-type": "image/jpeg"})
+        return httpx.Response(503, text="Service Unavailable", headers={"retry-after": "3"})
+
+    with pytest.raises(HTTPException) as error:
+        verify(f"{ORIGIN}/photo.jpg", handler, monkeypatch=monkeypatch)
+    assert error.value.status_code == 503
+    assert error.value.detail == "Service Unavailable"
+    assert error.value.headers == {"Retry-After": "3"}
+
+@pytest.mark.parametrize("status_code, body, expected", [
+    (500, "<html><body>Internal Server Error</body></html>", 502),
+    (413, "Request Entity Too Large", 413),
+])
+def test_non_json_error_keeps_its_text(monkeypatch, status_code, body, expected):
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "images.example":
+            return httpx.Response(200, content=JPEG, headers={"content-type": "image/jpeg"})
+        return httpx.Response(status_code, text=body)
+
+    with pytest.raises(HTTPException) as error:
+        verify(f"{ORIGIN}/photo.jpg", handler, monkeypatch=monkeypatch)
+    assert error.value.status_code == expected
+    assert error.value.detail == body
+
+def test_non_json_success_is_502(monkeypatch):
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "images.example":
+            return httpx.Response(200, content=JPEG, headers={"content-type": "image/jpeg"})
+        return httpx.Response(200, text="OK")
+
+    with pytest.raises(HTTPException) as error:
+        verify(f"{ORIGIN}/photo.jpg", handler, monkeypatch=monkeypatch)
+    assert error.value.status_code == 502
+
+@pytest.mark.parametrize("image_url, addresses", [
+    ("http://127.0.0.1/photo.jpg", None),
+    ("http://localhost:8001/health", {"localhost": ["127.0.0.1"]}),
+    ("http://verification:8001/health", {"verification": ["172.18.0.3"]}),
+    ("http://metadata.internal/latest", {"metadata.internal": ["169.254.169.254"]}),
+    ("http://[::1]/photo.jpg", None),
+    ("http://10.0.0.5/photo.jpg", None),
+    ("http://[::ffff:192.168.1.1]/photo.jpg", None),
+    ("ftp://images.example/photo.jpg", None),
+])
+def test_internal_addresses_are_refused(monkeypatch, image_url, addresses):
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise AssertionError(f"fetched {request.url}")
+
+    with pytest.raises(HTTPException) as error:
+        verify(image_url, handler, addresses, monkeypatch=monkeypatch)
+    assert error.value.status_code == 400
+
+def test_redirect_to_internal_address_is_refused(monkeypatch):
+    fetched = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        fetched.append(str(request.url))
+        return httpx.Response(302, headers={"location": "http://169.254.169.254/latest/meta-data"})
+
+    with pytest.raises(HTTPException) as error:
+        verify(f"{ORIGIN}/photo.jpg", handler, monkeypatch=monkeypatch)
+    assert error.value.status_code == 400
+    assert fetched == [f"{ORIGIN}/photo.jpg"]
+
+def test_redirects_are_capped(monkeypatch):
+    fetched = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        fetched.append(str(request.url))
+        return httpx.Response(302, headers={"location": f"/hop{len(fetched)}"})
+
+    with pytest.raises(HTTPException) as error:
+        verify(f"{ORIGIN}/photo.jpg", handler, monkeypatch=monkeypatch)
+    assert error.value.status_code == 502
+    assert len(fetched) == main.FETCH_MAX_REDIRECTS + 1
+
+def test_allowed_host_skips_the_address_check(monkeypatch):
+    monkeypatch.setattr(main, "FETCH_ALLOWED_HOSTS", {"host.docker.internal"})
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "host.docker.internal":
+            return httpx.Response(200, content=JPEG, headers={"content-type": "image/jpeg"})
+        return analysis(request)
+
+    result = verify("http://host.docker.internal:8080/photo.jpg", handler,
+                    {"host.docker.internal": ["172.17.0.1"]}, monkeypatch=monkeypatch)
+    assert result["image_bytes"] == len(JPEG)
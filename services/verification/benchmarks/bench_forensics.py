@@ -0,0 +1,257 @@
+# services/verification/benchmarks/bench_forensics.py
+"""
+Forensics benchmark suite
+
+Runs each analyzer and the full decode + AdvancedForensicsEngine pipeline
+on synthetic JPEGs across a grid of sizes, color modes and qualities, and
+reports wall time, peak traced memory and throughput. Results can be saved
+as a JSON baseline and compared against one later; a case regresses when
+it is slower or uses more memory than the thresholds allow, or when its
+score changes.
+
+Baselines are machine-specific: save and compare them on the same host.
+
+Usage (from services/verification):
+    python benchmarks/bench_forensics.py [--sizes 0.3 1 4 12 50] [--modes L RGB]
+        [--qualities 75 95] [--targets ela noise ...] [--repeat 3] [--quick]
+        [--save NAME] [--compare NAME] [--time-threshold 0.15] [--memory-threshold 0.15]
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+import cv2
+import numpy as np
+import PIL
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from algorithms.ela_analysis import ELAAnalyzer
+from algorithms.jpeg_analysis import JPEGQualityAnalyzer
+from algorithms.metadata_analysis import MetadataAnalyzer
+from algorithms.noise_analysis import NoisePatternAnalyzer
+from decoding import decode_for_analysis, read_quantization
+from forensics_engine import AdvancedForensicsEngine
+from ingest import BytesSource
+from bench_noise import best_time, synthetic_gray
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), 'baselines')
+
+# Scores are deterministic for a given input; any change is reported
+SCORE_TOLERANCE = 1e-6
+
+# Slowdowns smaller than this are timer noise (the metadata checks take microseconds)
+MIN_TIME_DELTA_S = 0.001
+
+# Fast cases are repeated until they have run for about this long (at most MAX_RUNS times)
+MIN_SAMPLE_S = 0.5
+MAX_RUNS = 50
+
+# Exercises the resolution and software checks like a real camera file would
+SYNTHETIC_EXIF = {
+    'Make': 'Benchmark',
+    'Model': 'Synthetic',
+    'Software': 'bench_forensics',
+    'ExifImageWidth': '0',
+    'ExifImageHeight': '0'
+}
+
+TARGETS = ['ela', 'metadata', 'noise', 'jpeg', 'engine']
+
+def synthetic_jpeg(megapixels: float, mode: str, quality: int, seed: int = 0) -> bytes:
+    """Encoded JPEG of a synthetic scene (see synthetic_gray) in `mode` (L or RGB)"""
+    gray = synthetic_gray(megapixels, seed)
+    if mode == 'RGB':
+        # Tint the channels differently so chroma subsampling has work to do
+        tint = np.array([1.0, 0.85, 0.7])
+        pixels = np.clip(gray[..., None] * tint, 0, 255).astype(np.uint8)
+    else:
+        pixels = gray
+    buffer = io.BytesIO()
+    Image.fromarray(pixels, mode).save(buffer, 'JPEG', quality=quality)
+    return buffer.getvalue()
+
+def make_runners(contents: bytes) -> Dict[str, Callable[[], float]]:
+    """Benchmark targets for one JPEG; each returns the resulting score
+
+    Analyzers get the RGB array (and JPEG tables) the service would hand
+    them; `engine` also pays for decoding, like /analyze does on a cache miss.
+    """
+    header = Image.open(io.BytesIO(contents))
+    quantization = read_quantization(header)
+    image = header.convert('RGB')
+    image_array = np.array(image)
+    exif_data = dict(SYNTHETIC_EXIF, ExifImageWidth=str(image.size[0]),
+                     ExifImageHeight=str(image.size[1]))
+    engine = AdvancedForensicsEngine()
+
+    def run_engine() -> float:
+        source = BytesSource(contents)
+        decoded = decode_for_analysis(source, engine.resolution_policy, engine.pixel_analyzers)
+        result = asyncio.run(engine.analyze_image(decoded.full, exif_data,
+                                                  reduced_image=decoded.reduced,
+                                                  original_size=decoded.original_size,
+                                                  quantization=decoded.quantization,
+                                                  signature=decoded.signature))
+        return result['final_score']
+
+    return {
+        'ela': lambda: ELAAnalyzer().analyze(image_array)['score'],
+        'metadata': lambda: MetadataAnalyzer().analyze(exif_data, image_array)['score'],
+        'noise': lambda: NoisePatternAnalyzer().analyze(image_array)['score'],
+        'jpeg': lambda: JPEGQualityAnalyzer().analyze(image_array, quantization=quantization)['score'],
+        'engine': run_engine
+    }
+
+def peak_memory(func: Callable[[], Any]) -> int:
+    """Peak bytes allocated through Python and numpy while `func` runs
+
+    Measured in a separate run: tracing slows allocation-heavy code, so it
+    would distort the timings. Buffers that PIL and OpenCV allocate
+    internally are not traced.
+    """
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def case_key(target: str, mode: str, megapixels: float, quality: int) -> str:
+    return f"{target}/{mode}/{megapixels:g}MP/q{quality}"
+
+def run_suite(sizes: List[float], modes: List[str], qualities: List[int],
+              targets: List[str], repeat: int) -> Dict[str, Dict[str, Any]]:
+    results = {}
+    print(f"{'case':<28} {'best s':>9} {'peak MB':>9} {'MP/s':>8} {'img/s':>8} {'score':>8}")
+    for megapixels in sizes:
+        for mode in modes:
+            for quality in qualities:
+                contents = synthetic_jpeg(megapixels, mode, quality)
+                runners = make_runners(contents)
+                for target in targets:
+                    run = runners[target]
+                    # Warm-up: first calls pay for imports and lazy initialisation
+                    warm_up, _ = best_time(run, repeat=1)
+                    runs = max(repeat, min(MAX_RUNS, int(MIN_SAMPLE_S / max(warm_up, 1e-6))))
+                    wall_time, score = best_time(run, repeat=runs)
+                    peak = peak_memory(run)
+                    key = case_key(target, mode, megapixels, quality)
+                    results[key] = {
+                        'target': target,
+                        'mode': mode,
+                        'megapixels': megapixels,
+                        'quality': quality,
+                        'wall_time_s': round(wall_time, 6),
+                        'peak_memory_bytes': peak,
+                        'megapixels_per_s': round(megapixels / wall_time, 3),
+                        'images_per_s': round(1 / wall_time, 3),
+                        'score': float(score)
+                    }
+                    print(f"{key:<28} {wall_time:>9.3f} {peak / 1e6:>9.1f} "
+                          f"{megapixels / wall_time:>8.2f} {1 / wall_time:>8.2f} {float(score):>8.3f}")
+    return results
+
+def environment() -> Dict[str, Any]:
+    """Host description stored with baselines, to spot cross-machine comparisons"""
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pillow': PIL.__version__,
+        'opencv': cv2.__version__
+    }
+
+def baseline_path(name: str) -> str:
+    return name if name.endswith('.json') else os.path.join(BASELINE_DIR, f"{name}.json")
+
+def save_baseline(name: str, results: Dict[str, Dict[str, Any]], repeat: int):
+    path = baseline_path(name)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'repeat': repeat,
+            'environment': environment(),
+            'results': results
+        }, f, indent=2, sort_keys=True)
+    print(f"\nSaved baseline to {path}")
+
+def compare(name: str, results: Dict[str, Dict[str, Any]],
+            time_threshold: float, memory_threshold: float) -> List[str]:
+    """Print a comparison table and return the regressed case keys"""
+    with open(baseline_path(name)) as f:
+        baseline = json.load(f)
+    if baseline['environment'] != environment():
+        print("\nWarning: baseline was recorded in a different environment:")
+        print(json.dumps(baseline['environment'], indent=2, sort_keys=True))
+
+    regressions = []
+    print(f"\n{'case':<28} {'time':>8} {'memory':>8}  status")
+    for key, current in results.items():
+        previous = baseline['results'].get(key)
+        if previous is None:
+            print(f"{key:<28} {'':>8} {'':>8}  new")
+            continue
+        time_ratio = current['wall_time_s'] / max(previous['wall_time_s'], 1e-9)
+        memory_ratio = (current['peak_memory_bytes'] / previous['peak_memory_bytes']
+                        if previous['peak_memory_bytes'] else 1.0)
+        problems = []
+        if (time_ratio > 1 + time_threshold
+                and current['wall_time_s'] - previous['wall_time_s'] > MIN_TIME_DELTA_S):
+            problems.append("SLOWER")
+        if memory_ratio > 1 + memory_threshold:
+            problems.append("MORE MEMORY")
+        if abs(current['score'] - previous['score']) > SCORE_TOLERANCE:
+            problems.append(f"SCORE {previous['score']:.3f} -> {current['score']:.3f}")
+        if problems:
+            regressions.append(key)
+        print(f"{key:<28} {time_ratio:>7.2f}x {memory_ratio:>7.2f}x  {', '.join(problems) or 'ok'}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=float, nargs='+', default=[0.3, 1, 4, 12, 50],
+                        help='image sizes in megapixels')
+    parser.add_argument('--modes', nargs='+', default=['L', 'RGB'], choices=['L', 'RGB'])
+    parser.add_argument('--qualities', type=int, nargs='+', default=[75, 95],
+                        help='JPEG qualities of the synthetic inputs')
+    parser.add_argument('--targets', nargs='+', default=TARGETS, choices=TARGETS)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--quick', action='store_true',
+                        help='small grid for a fast sanity check (0.3 and 1 MP, RGB, q75)')
+    parser.add_argument('--save', metavar='NAME', help='save results as baselines/NAME.json')
+    parser.add_argument('--compare', metavar='NAME', help='compare against baselines/NAME.json')
+    parser.add_argument('--time-threshold', type=float, default=0.15,
+                        help='allowed relative slowdown before flagging (default 0.15)')
+    parser.add_argument('--memory-threshold', type=float, default=0.15,
+                        help='allowed relative peak memory growth before flagging (default 0.15)')
+    args = parser.parse_args()
+
+    if args.quick:
+        args.sizes, args.modes, args.qualities = [0.3, 1], ['RGB'], [75]
+
+    results = run_suite(args.sizes, args.modes, args.qualities, args.targets, args.repeat)
+
+    regressions: Optional[List[str]] = None
+    if args.compare:
+        regressions = compare(args.compare, results, args.time_threshold, args.memory_threshold)
+    if args.save:
+        save_baseline(args.save, results, args.repeat)
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) against {args.compare}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+# services/verification/benchmarks/bench_noise.py
+"""
+Noise pattern analysis benchmark
+
+Compares the vectorized block statistics path of NoisePatternAnalyzer with
+the previous per-block loop (kept here as the reference implementation) on
+synthetic grayscale images, and reports how far apart their scores are.
+The equivalence itself is tested in tests/test_block_stats.py.
+
+Usage (from services/verification):
+    python benchmarks/bench_noise.py [--sizes 1 12 50] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+from scipy import signal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from algorithms.noise_analysis import NoisePatternAnalyzer
+
+# Scores must agree to this absolute tolerance (raw coefficient of variation)
+SCORE_TOLERANCE = 1e-6
+
+def reference_noise_consistency(gray_image: np.ndarray) -> float:
+    """Previous per-block implementation of _analyze_noise_consistency"""
+    kernel = np.array([[-1, -1, -1], [-1, 8, -1], [-1, -1, -1]])
+    noise = signal.convolve2d(gray_image.astype(float), kernel, mode='same')
+    
+    h, w = gray_image.shape
+    adaptive_block_size = min(64, max(32, min(h, w) // 10))
+    
+    noise_stats = []
+    step = adaptive_block_size // 2
+    
+    for i in range(0, h - adaptive_block_size + 1, step):
+        for j in range(0, w - adaptive_block_size + 1, step):
+            block = noise[i:i+adaptive_block_size, j:j+adaptive_block_size]
+            std = np.std(block)
+            if std > 1e-3:
+                noise_stats.append(std)
+    
+    if len(noise_stats) < 4:
+        return 0.0
+    
+    median_std = np.median(noise_stats)
+    mad = np.median(np.abs(np.array(noise_stats) - median_std))
+    
+    if median_std == 0:
+        return 0.0
+    
+    return mad / median_std
+
+def synthetic_gray(megapixels: float, seed: int = 0) -> np.ndarray:
+    """Smooth gradient with sensor-like noise and a spliced, noisier patch"""
+    rng = np.random.default_rng(seed)
+    h = int(np.sqrt(megapixels * 1e6 * 3 / 4))
+    w = int(megapixels * 1e6 / h)
+    
+    base = np.add.outer(np.linspace(40, 200, h), np.linspace(0, 30, w))
+    image = base + rng.normal(0, 3, (h, w))
+    image[h // 4:h // 2, w // 4:w // 2] += rng.normal(0, 9, (h // 2 - h // 4, w // 2 - w // 4))
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+def best_time(func, *args, repeat: int = 3):
+    """Best wall time over `repeat` runs, with the last result"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start_time)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=float, nargs='+', default=[1, 12, 50],
+                        help='image sizes in megapixels')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    
+    analyzer = NoisePatternAnalyzer()
+    print(f"{'MP':>6} {'reference s':>12} {'vectorized s':>13} {'speedup':>8} {'|score diff|':>13}")
+    
+    for megapixels in args.sizes:
+        gray = synthetic_gray(megapixels)
+        ref_time, ref_score = best_time(reference_noise_consistency, gray, repeat=args.repeat)
+        new_time, new_score = best_time(analyzer._analyze_noise_consistency, gray, repeat=args.repeat)
+        diff = abs(float(ref_score) - float(new_score))
+        status = "ok" if diff <= SCORE_TOLERANCE else "MISMATCH"
+        print(f"{megapixels:>6g} {ref_time:>12.3f} {new_time:>13.3f} "
+              f"{ref_time / new_time:>7.1f}x {diff:>13.2e} {status}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+# services/verification/benchmarks/bench_similarity.py
+"""
+Near-duplicate index benchmark
+
+Fills a NearDuplicateIndex with random hashes and measures lookup latency
+for near hits (a few bits flipped from an indexed hash) and for misses.
+Every lookup is checked against a brute-force scan of all entries, so a
+multi-index hashing bug shows up as a mismatch instead of a fast time.
+
+Usage (from services/verification):
+    python benchmarks/bench_similarity.py [--sizes 100000 1000000] [--queries 2000]
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from similarity import NearDuplicateIndex, hamming_distances
+
+def random_hashes(rng: np.random.Generator, count: int) -> np.ndarray:
+    return rng.integers(0, 2 ** 64, count, dtype=np.uint64)
+
+def flip_bits(rng: np.random.Generator, value: int, bits: int) -> int:
+    for bit in rng.choice(64, bits, replace=False):
+        value ^= 1 << int(bit)
+    return value
+
+def brute_force(phashes: np.ndarray, dhashes: np.ndarray, query, max_distance: int) -> set:
+    close = ((hamming_distances(phashes, query[0]) <= max_distance)
+             & (hamming_distances(dhashes, query[1]) <= max_distance))
+    return {f"{int(i):064x}" for i in np.flatnonzero(close)}
+
+def timed_lookups(index: NearDuplicateIndex, queries, phashes, dhashes):
+    """Per-lookup latencies in microseconds and the number of brute-force mismatches"""
+    latencies = []
+    mismatches = 0
+    for query in queries:
+        start_time = time.perf_counter()
+        matches = index.lookup(query, limit=len(phashes))
+        latencies.append((time.perf_counter() - start_time) * 1e6)
+        if {m['digest'] for m in matches} != brute_force(phashes, dhashes, query, index.max_distance):
+            mismatches += 1
+    return np.array(latencies), mismatches
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000],
+                        help='indexed entries')
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--max-distance', type=int, default=6)
+    args = parser.parse_args()
+
+    print(f"{'entries':>9} {'add/s':>9} {'hit p50 us':>11} {'hit p99 us':>11} "
+          f"{'miss p50 us':>12} {'miss p99 us':>12} {'mismatches':>11}")
+    for size in args.sizes:
+        rng = np.random.default_rng(size)
+        phashes, dhashes = random_hashes(rng, size), random_hashes(rng, size)
+        index = NearDuplicateIndex(max_distance=args.max_distance, max_entries=size)
+
+        start_time = time.perf_counter()
+        for i in range(size):
+            index.add(f"{i:064x}", (int(phashes[i]), int(dhashes[i])), 0.0, 'low', False)
+        add_rate = size / (time.perf_counter() - start_time)
+
+        targets = rng.integers(0, size, args.queries)
+        hits = [(flip_bits(rng, int(phashes[i]), int(rng.integers(0, args.max_distance + 1))),
+                 flip_bits(rng, int(dhashes[i]), 1)) for i in targets]
+        misses = [tuple(int(v) for v in random_hashes(rng, 2)) for _ in range(args.queries)]
+
+        hit_times, hit_errors = timed_lookups(index, hits, phashes, dhashes)
+        miss_times, miss_errors = timed_lookups(index, misses, phashes, dhashes)
+        status = "ok" if hit_errors + miss_errors == 0 else "MISMATCH"
+        print(f"{size:>9} {add_rate:>9.0f} {np.percentile(hit_times, 50):>11.1f} "
+              f"{np.percentile(hit_times, 99):>11.1f} {np.percentile(miss_times, 50):>12.1f} "
+              f"{np.percentile(miss_times, 99):>12.1f} {hit_errors + miss_errors:>11} {status}")
+
+if __name__ == '__main__':
+    main()
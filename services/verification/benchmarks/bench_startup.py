@@ -0,0 +1,130 @@
+# services/verification/benchmarks/bench_startup.py
+"""
+Cold start benchmark
+
+Measures what a new verification replica pays before it serves requests
+quickly, each run in a fresh interpreter: importing the service and the
+engine, the slowest imports (from python -X importtime), engine warm-up,
+and the first analysis of a JPEG with and without warm-up. The JPEG is the
+same kind of synthetic photo bench_forensics.py uses.
+
+Usage (from services/verification):
+    python benchmarks/bench_startup.py [--runs 5] [--executor thread] [--top 10]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from bench_forensics import synthetic_jpeg
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+# Run in the child: prints one JSON line of timings in milliseconds
+FIRST_ANALYSIS = """
+import asyncio, json, sys, time
+start_time = time.perf_counter()
+from executor import AnalysisExecutor
+from forensics_engine import AdvancedForensicsEngine
+from decoding import decode_for_analysis
+from ingest import BytesSource
+timings = {'import_ms': (time.perf_counter() - start_time) * 1000}
+
+async def run(path, mode, warm):
+    engine = AdvancedForensicsEngine(executor=AnalysisExecutor(mode))
+    if warm:
+        step_time = time.perf_counter()
+        await engine.warm_up()
+        timings['warm_up_ms'] = (time.perf_counter() - step_time) * 1000
+    with open(path, 'rb') as f:
+        source = BytesSource(f.read())
+    step_time = time.perf_counter()
+    decoded = decode_for_analysis(source, engine.resolution_policy, engine.pixel_analyzers)
+    await engine.analyze_image(decoded.full, decoded.exif_data, reduced_image=decoded.reduced,
+                               original_size=decoded.original_size, quantization=decoded.quantization,
+                               signature=decoded.signature)
+    timings['first_analysis_ms'] = (time.perf_counter() - step_time) * 1000
+    engine.executor.shutdown()
+
+if __name__ == '__main__':
+    asyncio.run(run(sys.argv[1], sys.argv[2], sys.argv[3] == 'warm'))
+    print(json.dumps(timings))
+"""
+
+def run_python(args, env=None) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable] + args, cwd=SRC_DIR, capture_output=True, text=True,
+                          env={**os.environ, **(env or {})}, check=True)
+
+def import_ms(module: str) -> float:
+    """Wall time of importing `module` in a fresh interpreter"""
+    code = f"import time; t = time.perf_counter(); import {module}; print((time.perf_counter() - t) * 1000)"
+    return float(run_python(['-c', code]).stdout)
+
+def slowest_imports(module: str, top: int):
+    """(cumulative ms, package) of the costliest top-level packages pulled in by `module`"""
+    stderr = run_python(['-X', 'importtime', '-c', f"import {module}"]).stderr
+    entries = []
+    for line in stderr.splitlines():
+        fields = line[len('import time:'):].split('|')
+        if not line.startswith('import time:') or len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        name = fields[2].rstrip()
+        entries.append((len(name) - len(name.lstrip()), name.strip(), int(fields[1]) / 1000))
+
+    # Imports are listed once complete, so a module's children come right before it
+    depth = next(depth for depth, name, _ in entries if name == module)
+    end = next(i for i, (_, name, _) in enumerate(entries) if name == module)
+    children = []
+    for child_depth, name, ms in reversed(entries[:end]):
+        if child_depth <= depth:
+            break
+        if child_depth == depth + 2:
+            children.append((ms, name))
+    return sorted(children, reverse=True)[:top]
+
+def first_analysis(path: str, mode: str, warm: bool) -> dict:
+    script = os.path.join(tempfile.gettempdir(), 'bench_startup_child.py')
+    with open(script, 'w') as f:
+        f.write(FIRST_ANALYSIS)
+    output = run_python([script, path, mode, 'warm' if warm else 'cold'],
+                        env={'PYTHONPATH': SRC_DIR})
+    return json.loads(output.stdout.splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters per measurement')
+    parser.add_argument('--executor', default='thread', choices=('inline', 'thread', 'process'))
+    parser.add_argument('--top', type=int, default=10, help='slowest imports listed')
+    parser.add_argument('--megapixels', type=float, default=2.0, help='size of the analyzed JPEG')
+    args = parser.parse_args()
+
+    print(f"{'import':<20} {'median ms':>10} {'min ms':>8}")
+    for module in ('main', 'forensics_engine'):
+        times = [import_ms(module) for _ in range(args.runs)]
+        print(f"{module:<20} {np.median(times):>10.1f} {min(times):>8.1f}")
+
+    print("\nslowest imports under main (cumulative ms, one run)")
+    for ms, name in slowest_imports('main', args.top):
+        print(f"  {ms:>8.1f}  {name}")
+
+    with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as f:
+        f.write(synthetic_jpeg(args.megapixels, 'RGB', 90))
+    try:
+        print(f"\nfirst analysis of a {args.megapixels:g} MP JPEG, {args.executor} executor (median of {args.runs})")
+        print(f"{'start':<6} {'import ms':>10} {'warm-up ms':>11} {'first analysis ms':>18}")
+        for warm in (False, True):
+            runs = [first_analysis(f.name, args.executor, warm) for _ in range(args.runs)]
+            median = {key: np.median([run.get(key, 0.0) for run in runs])
+                      for key in ('import_ms', 'warm_up_ms', 'first_analysis_ms')}
+            print(f"{'warm' if warm else 'cold':<6} {median['import_ms']:>10.1f} "
+                  f"{median['warm_up_ms']:>11.1f} {median['first_analysis_ms']:>18.1f}")
+    finally:
+        os.unlink(f.name)
+
+if __name__ == '__main__':
+    main()
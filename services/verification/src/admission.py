@@ -0,0 +1,122 @@
+# services/verification/src/admission.py
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Tuple
+
+# Smallest charge per analysis: hashing, header parsing and bookkeeping cost something
+MIN_COST_MEGAPIXELS = 0.25
+
+class AdmissionRejected(Exception):
+    """Over capacity; retry after `retry_after` seconds
+
+    `reason` is queue_full (too many waiting), wait (the estimated wait
+    exceeds the deadline) or timeout (the deadline passed while waiting).
+    """
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Verification service is over capacity ({reason.replace('_', ' ')})")
+        self.reason = reason
+        self.retry_after = retry_after
+
+class AdmissionController:
+    """Concurrency limit weighted by image size, with a bounded wait queue
+
+    Each analysis holds its megapixels (at least MIN_COST_MEGAPIXELS, at most
+    the whole capacity, so any image can run alone) until it finishes;
+    decode and analysis memory grow with the pixel count, so the total
+    held bounds both CPU contention and memory. Analyses that don't fit
+    wait in arrival order; a large image at the head is not overtaken by
+    smaller ones, so it cannot starve.
+
+    Sheddable requests (interactive ones) are rejected at once when
+    `max_waiting` requests already wait or the estimated wait exceeds
+    `max_wait` seconds, and give up once they have waited `max_wait`.
+    Others (jobs, batches, which bound their own concurrency) wait as long
+    as it takes. Wait estimates and Retry-After assume the held capacity
+    turns over once per average analysis duration.
+    """
+
+    def __init__(self, capacity: float, max_waiting: int = 32, max_wait: float = 10.0):
+        self.capacity = capacity
+        self.max_waiting = max_waiting
+        self.max_wait = max_wait
+        # Seconds an analysis holds its capacity, seeded with a guess and then an exponential moving average
+        self.average_seconds = 1.0
+        self.in_use = 0.0
+        self._waiters: Deque[Tuple[float, asyncio.Future]] = deque()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    @asynccontextmanager
+    async def admit(self, megapixels: float, shed: bool = True) -> AsyncIterator[float]:
+        """Hold capacity for an analysis of `megapixels`; yields the seconds spent waiting
+
+        Yields 0.0 when admitted without queueing. Raises AdmissionRejected
+        for sheddable requests over capacity.
+        """
+        start_time = time.perf_counter()
+        cost = min(max(megapixels, MIN_COST_MEGAPIXELS), self.capacity)
+        queued = await self._acquire(cost, shed)
+        admitted_at = time.perf_counter()
+        try:
+            yield admitted_at - start_time if queued else 0.0
+        finally:
+            self.average_seconds += 0.2 * (time.perf_counter() - admitted_at - self.average_seconds)
+            self._release(cost)
+
+    def estimated_wait(self, megapixels: float = MIN_COST_MEGAPIXELS) -> float:
+        """Seconds before an analysis of `megapixels` arriving now would start"""
+        queued = sum(cost for cost, _ in self._waiters)
+        excess = self.in_use + queued + megapixels - self.capacity
+        return max(0.0, excess / self.capacity * self.average_seconds)
+
+    def retry_after(self, megapixels: float = MIN_COST_MEGAPIXELS) -> int:
+        return max(1, math.ceil(self.estimated_wait(megapixels)))
+
+    async def _acquire(self, cost: float, shed: bool) -> bool:
+        """Take `cost` of the capacity; whether the request had to queue"""
+        if not self._waiters and self.in_use + cost <= self.capacity:
+            self.in_use += cost
+            return False
+        if shed:
+            if len(self._waiters) >= self.max_waiting:
+                raise AdmissionRejected('queue_full', self.retry_after(cost))
+            if self.estimated_wait(cost) > self.max_wait:
+                raise AdmissionRejected('wait', self.retry_after(cost))
+
+        granted = asyncio.get_running_loop().create_future()
+        entry = (cost, granted)
+        self._waiters.append(entry)
+        try:
+            # Shielded, so a timeout can't cancel a grant that is already on its way
+            await asyncio.wait_for(asyncio.shield(granted), self.max_wait if shed else None)
+        except BaseException as e:
+            if granted.done() and not granted.cancelled():
+                # Granted as the wait ended: pass the capacity on
+                self._release(cost)
+            else:
+                granted.cancel()
+                self._waiters.remove(entry)
+                # Whoever queued behind this request may fit now
+                self._grant()
+            if isinstance(e, asyncio.TimeoutError):
+                raise AdmissionRejected('timeout', self.retry_after(cost))
+            raise
+        return True
+
+    def _release(self, cost: float):
+        self.in_use = max(0.0, self.in_use - cost)
+        self._grant()
+
+    def _grant(self):
+        """Admit waiters in arrival order while the next one fits"""
+        while self._waiters and self.in_use + self._waiters[0][0] <= self.capacity:
+            cost, granted = self._waiters.popleft()
+            if not granted.done():
+                self.in_use += cost
+                granted.set_result(None)
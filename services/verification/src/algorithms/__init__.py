@@ -7,16 +7,38 @@ This package contains individual forensic analysis algorithms:
 - Metadata Analysis: EXIF consistency checking
 - Noise Analysis: Sensor noise pattern analysis  
 - JPEG Analysis: Compression quality consistency
+- DCT Analysis: Quantization table quality estimate and double compression evidence
+- JPEG Signatures: Encoder fingerprints (tables, sampling, Huffman coding) and their index
+
+Shared stages:
+- Recompression: One JPEG re-encode per quality, reused by ELA and JPEG analysis
+  (JPEG analysis skips it when the source file's tables are available)
+- Block statistics: Vectorized per-block noise statistics
+- Analysis context: The decoded image handed to every analyzer, with
+  grayscale and noise residual views computed once per request
+
+Analyzers are looked up by name through the registry (see registry.py),
+which imports each one, and its dependencies, on first use. The names below
+are likewise imported only when accessed, so importing the package is cheap.
 """
 
-from .ela_analysis import ELAAnalyzer
-from .metadata_analysis import MetadataAnalyzer
-from .noise_analysis import NoisePatternAnalyzer
-from .jpeg_analysis import JPEGQualityAnalyzer
+import importlib
+
+_EXPORTS = {
+    'ELAAnalyzer': '.ela_analysis',
+    'MetadataAnalyzer': '.metadata_analysis',
+    'NoisePatternAnalyzer': '.noise_analysis',
+    'JPEGQualityAnalyzer': '.jpeg_analysis',
+    'RecompressionStage': '.recompression',
+    'RecompressionResult': '.recompression',
+    'AnalysisContext': '.context',
+    'AnalyzerRegistry': '.registry',
+    'AnalyzerSpec': '.registry'
+}
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(_EXPORTS[name], __name__), name)
 
-__all__ = [
-    'ELAAnalyzer',
-    'MetadataAnalyzer', 
-    'NoisePatternAnalyzer',
-    'JPEGQualityAnalyzer'
-]
\ No newline at end of file
+__all__ = list(_EXPORTS)
\ No newline at end of file
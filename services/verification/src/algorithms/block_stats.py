@@ -0,0 +1,82 @@
+# services/verification/src/algorithms/block_stats.py
+import numpy as np
+import cv2
+
+LAPLACIAN_KERNEL = np.array([[-1, -1, -1], [-1, 8, -1], [-1, -1, -1]], dtype=np.float32)
+
+def laplacian_residual(gray_image: np.ndarray) -> np.ndarray:
+    """High-frequency noise residual of a grayscale image
+
+    Same output as scipy.signal.convolve2d(gray, kernel, mode='same') with
+    zero padding: the kernel is symmetric, so OpenCV's correlation equals
+    the convolution. For 8-bit input every value is an integer below 2**24,
+    so float32 is exact. float32 input is filtered without a copy.
+    """
+    return cv2.filter2D(gray_image.astype(np.float32, copy=False), -1, LAPLACIAN_KERNEL,
+                        borderType=cv2.BORDER_CONSTANT)
+
+# calcHist counts in float32, exact up to 2**24 per bin; chunks stay below that
+HISTOGRAM_CHUNK_PIXELS = 1 << 23
+
+def byte_histogram(values: np.ndarray) -> np.ndarray:
+    """256-bin int64 histogram of a uint8 array in one pass, without copies
+
+    Same counts as np.histogram(values, bins=256, range=(0, 255)), which
+    puts each integer value v in bin v. Row chunks keep every float32
+    count exact.
+    """
+    rows = values.reshape(values.shape[0], -1)
+    histogram = np.zeros(256, dtype=np.int64)
+    chunk_rows = max(1, HISTOGRAM_CHUNK_PIXELS // max(rows.shape[1], 1))
+    for top in range(0, rows.shape[0], chunk_rows):
+        chunk = np.ascontiguousarray(rows[top:top + chunk_rows])
+        histogram += cv2.calcHist([chunk], [0], None, [256], [0, 256]).ravel().astype(np.int64)
+    return histogram
+
+def block_std(values: np.ndarray, block_size: int, step: int) -> np.ndarray:
+    """Standard deviation of every block_size x block_size block on a step grid
+
+    Returns a (rows, cols) grid matching the nested loop
+    `for i in range(0, h - block_size + 1, step): for j in range(0, w - block_size + 1, step)`.
+    """
+    h, w = values.shape
+    if h < block_size or w < block_size:
+        return np.empty((0, 0))
+
+    return block_std_at(values,
+                        np.arange(0, h - block_size + 1, step),
+                        np.arange(0, w - block_size + 1, step),
+                        block_size)
+
+def block_std_at(values: np.ndarray, row_starts: np.ndarray, col_starts: np.ndarray,
+                 block_size: int) -> np.ndarray:
+    """Standard deviation of the blocks starting at every (row, col) pair
+
+    Block sums of values and squared values come from two windowed
+    reductions (one per axis) instead of one np.std call per block.
+    """
+    if len(row_starts) == 0 or len(col_starts) == 0:
+        return np.empty((len(row_starts), len(col_starts)))
+
+    values = values.astype(np.float32, copy=False)
+    sums = _window_sums(_window_sums(values, row_starts, block_size, axis=0),
+                        col_starts, block_size, axis=1)
+    squares = _window_sums(_window_sums(values * values, row_starts, block_size, axis=0),
+                           col_starts, block_size, axis=1)
+
+    count = float(block_size * block_size)
+    variance = (count * squares - sums * sums) / (count * count)
+    return np.sqrt(np.maximum(variance, 0.0))
+
+def _window_sums(values: np.ndarray, starts: np.ndarray, length: int, axis: int) -> np.ndarray:
+    """Sums over [start, start + length) along `axis`, accumulated in float64"""
+    # reduceat sums between consecutive indices; pairing each start with its
+    # end yields the window sum at even positions (odd ones are discarded)
+    indices = np.empty(2 * len(starts), dtype=np.intp)
+    indices[0::2] = starts
+    indices[1::2] = starts + length
+    if indices[-1] == values.shape[axis]:
+        # reduceat needs in-range indices; the last window already runs to the end
+        indices = indices[:-1]
+    sums = np.add.reduceat(values, indices, axis=axis, dtype=np.float64)
+    return sums.take(np.arange(0, 2 * len(starts), 2), axis=axis)
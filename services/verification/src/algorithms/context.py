@@ -0,0 +1,100 @@
+# services/verification/src/algorithms/context.py
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+import numpy as np
+from PIL import Image
+
+@dataclass(frozen=True, eq=False)
+class AnalysisContext:
+    """One decode of the image under analysis, shared by every analyzer
+
+    Holds the uint8 pixels (read-only) and, when available, the PIL image
+    they came from, so recompression can encode it without rebuilding it.
+    Derived views are computed on first access and kept for the other
+    analyzers until `release_views`; never modify them. The engine releases
+    them after each stage, so they don't add to the peak memory of later
+    stages.
+
+    In process mode only the pixels travel to the workers (through shared
+    memory); the PIL image and computed views stay in the parent, and the
+    views are recomputed by the worker that needs them.
+    """
+    pixels: np.ndarray
+    image: Optional[Image.Image] = field(default=None, repr=False)
+    _views: Dict[str, np.ndarray] = field(default_factory=dict, init=False, repr=False)
+    # Reentrant: building a view may read the views it derives from
+    _lock: Any = field(default_factory=threading.RLock, init=False, repr=False)
+
+    @classmethod
+    def from_image(cls, image: Image.Image) -> 'AnalysisContext':
+        # np.asarray copies the PIL buffer once, into a read-only array
+        return cls(np.asarray(image), image)
+
+    @classmethod
+    def of(cls, value: Union['AnalysisContext', np.ndarray]) -> 'AnalysisContext':
+        """Context for analyzers called directly with an array"""
+        return value if isinstance(value, AnalysisContext) else cls(value)
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return self.pixels.shape
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        """(width, height), as PIL reports it"""
+        return self.pixels.shape[1], self.pixels.shape[0]
+
+    @property
+    def gray(self) -> np.ndarray:
+        """uint8 luminance (the pixels themselves for grayscale images)"""
+        return self._view('gray', self._gray)
+
+    @property
+    def gray_float32(self) -> np.ndarray:
+        return self._view('gray_float32', lambda: self.gray.astype(np.float32))
+
+    @property
+    def noise_residual(self) -> np.ndarray:
+        """float32 Laplacian high-pass of the luminance"""
+        from .block_stats import laplacian_residual
+        # Reuses the float32 view if already built, without keeping one just for this
+        return self._view('noise_residual',
+                          lambda: laplacian_residual(self._views.get('gray_float32', self.gray)))
+
+    @property
+    def views(self) -> Tuple[str, ...]:
+        """Names of the views computed so far"""
+        return tuple(self._views)
+
+    def release_views(self):
+        """Drop the computed views; they are rebuilt if read again"""
+        with self._lock:
+            self._views.clear()
+
+    def _gray(self) -> np.ndarray:
+        if self.pixels.ndim == 2:
+            return self.pixels
+        # OpenCV (also behind block_stats) is imported on first use, not at service start-up
+        import cv2
+        return cv2.cvtColor(self.pixels, cv2.COLOR_RGB2GRAY)
+
+    def _view(self, name: str, build: Callable[[], np.ndarray]) -> np.ndarray:
+        view = self._views.get(name)
+        if view is None:
+            with self._lock:
+                view = self._views.get(name)
+                if view is None:
+                    view = build()
+                    view.flags.writeable = False
+                    self._views[name] = view
+        return view
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {'pixels': self.pixels}
+
+    def __setstate__(self, state: Dict[str, Any]):
+        object.__setattr__(self, 'pixels', state['pixels'])
+        object.__setattr__(self, 'image', None)
+        object.__setattr__(self, '_views', {})
+        object.__setattr__(self, '_lock', threading.RLock())
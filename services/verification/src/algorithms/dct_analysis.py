@@ -0,0 +1,145 @@
+# services/verification/src/algorithms/dct_analysis.py
+import numpy as np
+from functools import lru_cache
+from typing import Any, Dict, Optional, Sequence
+
+# IJG (libjpeg) base tables from the JPEG standard, Annex K, natural order
+IJG_LUMINANCE = np.array([
+    16, 11, 10, 16, 24, 40, 51, 61,
+    12, 12, 14, 19, 26, 58, 60, 55,
+    14, 13, 16, 24, 40, 57, 69, 56,
+    14, 17, 22, 29, 51, 87, 80, 62,
+    18, 22, 37, 56, 68, 109, 103, 77,
+    24, 35, 55, 64, 81, 104, 113, 92,
+    49, 64, 78, 87, 103, 121, 120, 101,
+    72, 92, 95, 98, 112, 100, 103, 99
+])
+IJG_CHROMINANCE = np.array([
+    17, 18, 24, 47, 99, 99, 99, 99,
+    18, 21, 26, 66, 99, 99, 99, 99,
+    24, 26, 56, 99, 99, 99, 99, 99,
+    47, 66, 99, 99, 99, 99, 99, 99,
+    99, 99, 99, 99, 99, 99, 99, 99,
+    99, 99, 99, 99, 99, 99, 99, 99,
+    99, 99, 99, 99, 99, 99, 99, 99,
+    99, 99, 99, 99, 99, 99, 99, 99
+])
+
+# Natural-order index of each zigzag position
+ZIGZAG = np.array(sorted(
+    range(64),
+    key=lambda i: (i // 8 + i % 8, i % 8 if (i // 8 + i % 8) % 2 == 0 else i // 8)
+))
+
+# Low-frequency AC coefficients: populated enough for double quantization to show
+HISTOGRAM_POSITIONS = ZIGZAG[1:10]
+
+# Histograms cover |quantized coefficient| 0..HISTOGRAM_BINS - 1
+HISTOGRAM_BINS = 42
+
+# Blocks transformed per batch, bounding the float32 working set (~16 MB)
+BLOCKS_PER_BATCH = 65536
+
+def ijg_table(base: np.ndarray, quality: int) -> np.ndarray:
+    """Quantization table libjpeg writes for `quality` (1-100)"""
+    scale = 5000 // quality if quality < 50 else 200 - 2 * quality
+    return np.clip((base * scale + 50) // 100, 1, 255)
+
+@lru_cache(maxsize=1)
+def _ijg_tables() -> np.ndarray:
+    """(100, 2, 64) luminance and chrominance tables for qualities 1..100"""
+    return np.array([[ijg_table(IJG_LUMINANCE, q), ijg_table(IJG_CHROMINANCE, q)]
+                     for q in range(1, 101)])
+
+def estimate_quality(quantization: Dict[int, Sequence[int]]) -> Dict[str, Any]:
+    """IJG quality closest to the file's quantization tables
+
+    `standard` is True when the tables are exactly libjpeg's for that
+    quality (typical of software encoders); cameras and some editors use
+    their own tables, for which the nearest quality is an approximation.
+    """
+    tables = _ijg_tables()
+    luminance = np.asarray(quantization[0])
+    error = np.abs(tables[:, 0] - luminance).mean(axis=1)
+    if 1 in quantization:
+        error = (error + np.abs(tables[:, 1] - np.asarray(quantization[1])).mean(axis=1)) / 2
+    best = int(np.argmin(error))
+    return {
+        "quality": best + 1,
+        "standard": bool(error[best] == 0),
+        "mean_abs_error": round(float(error[best]), 3)
+    }
+
+def _dct_basis() -> np.ndarray:
+    """(len(HISTOGRAM_POSITIONS), 64) rows of the orthonormal 8x8 DCT-II"""
+    n = np.arange(8)
+    dct = np.sqrt(2 / 8) * np.cos((2 * n[None, :] + 1) * n[:, None] * np.pi / 16)
+    dct[0] /= np.sqrt(2)
+    rows, cols = HISTOGRAM_POSITIONS // 8, HISTOGRAM_POSITIONS % 8
+    return np.einsum('pm,pn->pmn', dct[rows], dct[cols]).reshape(len(HISTOGRAM_POSITIONS), 64)
+
+DCT_BASIS = _dct_basis().astype(np.float32)
+
+def luma(image_array: np.ndarray) -> np.ndarray:
+    """JPEG luma (Y, level-shifted by -128) of an RGB or grayscale decode
+
+    BT.601 weights are the exact inverse of the decoder's YCbCr to RGB
+    conversion, so this recovers the decoded Y up to rounding.
+    """
+    if image_array.ndim == 2:
+        return image_array.astype(np.float32) - 128
+    weights = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    return image_array[..., :3].astype(np.float32) @ weights - 128
+
+def dct_histograms(image_array: np.ndarray, luminance_table: Sequence[int]) -> np.ndarray:
+    """Histograms of |quantized DCT coefficient| for HISTOGRAM_POSITIONS
+
+    `image_array` must start on the JPEG 8x8 block grid; trailing partial
+    blocks are ignored. Coefficients are divided by the file's own
+    quantization steps, so a singly compressed image yields its exact
+    quantized values. Only the tracked coefficients are computed: one
+    (blocks x 64) @ (64 x 9) product per batch of blocks.
+    """
+    steps = np.asarray(luminance_table, dtype=np.float32)[HISTOGRAM_POSITIONS]
+    histograms = np.zeros((len(HISTOGRAM_POSITIONS), HISTOGRAM_BINS), dtype=np.int64)
+
+    h, w = (image_array.shape[0] // 8) * 8, (image_array.shape[1] // 8) * 8
+    if h == 0 or w == 0:
+        return histograms
+
+    block_rows = max(1, BLOCKS_PER_BATCH // (w // 8))
+    for top in range(0, h, block_rows * 8):
+        y = luma(image_array[top:min(h, top + block_rows * 8), :w])
+        blocks = y.reshape(y.shape[0] // 8, 8, w // 8, 8).transpose(0, 2, 1, 3).reshape(-1, 64)
+        quantized = np.abs(np.rint((blocks @ DCT_BASIS.T) / steps)).astype(np.int64)
+        np.minimum(quantized, HISTOGRAM_BINS - 1, out=quantized)
+        for index in range(len(HISTOGRAM_POSITIONS)):
+            histograms[index] += np.bincount(quantized[:, index], minlength=HISTOGRAM_BINS)
+    return histograms
+
+def double_quantization_evidence(histograms: np.ndarray, min_count: int = 20) -> Optional[float]:
+    """Share of histogram bins that break the monotonic decay of single compression
+
+    Singly quantized AC coefficients are most frequent near zero and thin
+    out with magnitude (whatever the content: Laplacian for photos,
+    Gaussian for noise). Quantizing twice with a coarser first step empties
+    bins periodically, so a bin ends up clearly below the one after it. A
+    bin counts as anomalous when that rise is both large (> 0.25 in log
+    counts) and well outside Poisson noise (> 4 sigma). Bin 0 holds only
+    zeros while the others fold both signs, so it is not compared.
+    A second save at a lower quality leaves the histogram monotonic and is
+    not detected. Returns None when no bin has enough support (tiny or
+    flat images).
+    """
+    # The last bin collects overflow; leave it out
+    counts = histograms[:, :-1].astype(np.float64)
+    low, mid, high = counts[:, 1:-2], counts[:, 2:-1], counts[:, 3:]
+    support = np.sqrt(low * high)
+    valid = support >= min_count
+    if not valid.any():
+        return None
+
+    rise = np.log1p(high) - np.log1p(mid)
+    sigma = np.sqrt(1 / (mid + 1) + 1 / (high + 1))
+    anomalous = valid & (rise > np.maximum(0.25, 4 * sigma))
+    return float((support * anomalous).sum() / (support * valid).sum())
@@ -1,28 +1,48 @@
 # services/verification/src/algorithms/jpeg_analysis.py
 import numpy as np
-import io
-from PIL import Image, ImageChops
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple, Union
+from .context import AnalysisContext
+from .recompression import RecompressionStage, RecompressionResult
+from .dct_analysis import dct_histograms, double_quantization_evidence, estimate_quality, HISTOGRAM_BINS, HISTOGRAM_POSITIONS
 
 class JPEGQualityAnalyzer:
     """JPEG Compression Quality Consistency Analyzer"""
     
     def __init__(self):
         self.name = "JPEG Quality Analysis"
-        self.version = "1.0"
+        self.version = "2.0"
         self.description = "JPEG compression quality consistency analysis"
         self.test_qualities = [50, 60, 70, 80, 90, 95]
     
-    def analyze(self, image_array: np.ndarray) -> Dict[str, Any]:
-        """Execute JPEG quality analysis"""
+    def analyze(self, context: Union[AnalysisContext, np.ndarray],
+                recompression: Optional[RecompressionResult] = None,
+                quantization: Optional[Dict[int, List[int]]] = None) -> Dict[str, Any]:
+        """Execute JPEG quality analysis
+
+        `quantization` holds the source file's JPEG tables (PIL's
+        `image.quantization`). With them the analysis runs in the DCT domain
+        and needs no recompression; `context` must then be the
+        full-resolution decode. Otherwise `recompression` is the engine's
+        shared recompression stage output, and when it is omitted the
+        analyzer recompresses the image itself.
+        """
         try:
-            image = Image.fromarray(image_array)
+            context = AnalysisContext.of(context)
+            if self.uses_quantization(quantization):
+                return self._analyze_dct(context.pixels, quantization)
+            
+            if recompression is None:
+                recompression = RecompressionStage().run(context.pixels, self.test_qualities,
+                                                         context.image)
+            
+            # Mean difference per quality, shared by both checks
+            quality_scores = self._quality_differences(recompression)
             
             # Analyze quality consistency
-            inconsistency_score = self._analyze_compression_consistency(image)
+            inconsistency_score = self._analyze_compression_consistency(quality_scores)
             
             # Estimate original quality
-            estimated_quality = self._estimate_original_quality(image)
+            estimated_quality = self._estimate_original_quality(quality_scores)
             
             return {
                 "score": round(inconsistency_score, 3),
@@ -31,6 +51,7 @@ class JPEGQualityAnalyzer:
                 "details": {
                     "estimated_original_quality": estimated_quality,
                     "qualities_tested": self.test_qualities,
+                    "recompression_timings_ms": recompression.timings_for(self.test_qualities),
                     "method": "Multi-quality recompression analysis"
                 }
             }
@@ -42,22 +63,91 @@ class JPEGQualityAnalyzer:
                 "algorithm": self.name
             }
     
-    def _analyze_compression_consistency(self, image: Image.Image) -> float:
-        """Analyze compression quality consistency"""
-        quality_scores = []
+    def uses_quantization(self, quantization: Optional[Dict[int, List[int]]]) -> bool:
+        """Whether the DCT-domain path applies (a luminance table is present)"""
+        return bool(quantization) and 0 in quantization
+    
+    def start_tiles(self, image_shape: Tuple[int, int],
+                    quantization: Optional[Dict[int, List[int]]] = None) -> Dict[str, Any]:
+        """State for tiled analysis: running difference sums per quality,
+        or coefficient histograms when the JPEG tables are known"""
+        return {
+            "sums": {q: 0.0 for q in self.test_qualities},
+            "quantization": quantization if self.uses_quantization(quantization) else None,
+            "histograms": np.zeros((len(HISTOGRAM_POSITIONS), HISTOGRAM_BINS), dtype=np.int64),
+            "pixels": 0,
+            "tiles": 0
+        }
+    
+    def add_tile(self, state: Dict[str, Any], tile,
+                 recompression: Optional[RecompressionResult]) -> float:
+        """Merge one tile's core into the state and return the tile's own score"""
+        if state["quantization"] is not None:
+            # Tile cores start on the 8x8 grid, so block histograms simply add up
+            histograms = dct_histograms(tile.pixels[tile.core], state["quantization"][0])
+            state["histograms"] += histograms
+            state["tiles"] += 1
+            return double_quantization_evidence(histograms) or 0.0
         
+        tile_scores = []
         for quality in self.test_qualities:
-            # Recompress with specified quality
-            buffer = io.BytesIO()
-            image.save(buffer, 'JPEG', quality=quality)
-            buffer.seek(0)
-            compressed = Image.open(buffer)
-            
-            # Calculate difference from original
-            diff = ImageChops.difference(image, compressed)
-            diff_score = np.mean(np.array(diff))
-            quality_scores.append(diff_score)
+            core_diff = recompression.diff(quality)[tile.core]
+            state["sums"][quality] += float(core_diff.sum(dtype=np.float64))
+            tile_scores.append(np.mean(core_diff))
+        state["pixels"] += core_diff.size
+        state["tiles"] += 1
+        return self._analyze_compression_consistency(tile_scores)
+    
+    def finish_tiles(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Whole-image result from the merged tile sums"""
+        if state["quantization"] is not None:
+            result = self._dct_result(state["histograms"], state["quantization"])
+            result["details"]["tiles_analyzed"] = state["tiles"]
+            result["details"]["method"] += " (tiled)"
+            return result
         
+        quality_scores = [state["sums"][q] / state["pixels"] for q in self.test_qualities]
+        return {
+            "score": round(self._analyze_compression_consistency(quality_scores), 3),
+            "success": True,
+            "algorithm": self.name,
+            "details": {
+                "estimated_original_quality": self._estimate_original_quality(quality_scores),
+                "qualities_tested": self.test_qualities,
+                "tiles_analyzed": state["tiles"],
+                "method": "Multi-quality recompression analysis (tiled)"
+            }
+        }
+    
+    def _analyze_dct(self, image_array: np.ndarray,
+                     quantization: Dict[int, List[int]]) -> Dict[str, Any]:
+        """Quality from the quantization tables, double compression from DCT histograms"""
+        return self._dct_result(dct_histograms(image_array, quantization[0]), quantization)
+    
+    def _dct_result(self, histograms: np.ndarray, quantization: Dict[int, List[int]]) -> Dict[str, Any]:
+        # Tables give the last save's quality without re-encoding anything
+        quality = estimate_quality(quantization)
+        evidence = double_quantization_evidence(histograms)
+        return {
+            "score": round(evidence or 0.0, 3),
+            "success": True,
+            "algorithm": self.name,
+            "details": {
+                "estimated_original_quality": quality["quality"],
+                "standard_tables": quality["standard"],
+                "table_mean_abs_error": quality["mean_abs_error"],
+                "double_compression_evidence": None if evidence is None else round(evidence, 3),
+                "blocks_analyzed": int(histograms[0].sum()),
+                "method": "Quantization table and DCT coefficient histogram analysis"
+            }
+        }
+    
+    def _quality_differences(self, recompression: RecompressionResult) -> List[float]:
+        """Mean difference from the original at each tested quality"""
+        return [np.mean(recompression.diff(quality)) for quality in self.test_qualities]
+    
+    def _analyze_compression_consistency(self, quality_scores: List[float]) -> float:
+        """Analyze compression quality consistency"""
         # Find minimum difference quality
         min_diff_index = np.argmin(quality_scores)
         min_diff = quality_scores[min_diff_index]
@@ -67,20 +157,8 @@ class JPEGQualityAnalyzer:
         
         return max(0.0, inconsistency)
     
-    def _estimate_original_quality(self, image: Image.Image) -> int:
+    def _estimate_original_quality(self, quality_scores: List[float]) -> int:
         """Estimate original JPEG quality"""
-        quality_scores = []
-        
-        for quality in self.test_qualities:
-            buffer = io.BytesIO()
-            image.save(buffer, 'JPEG', quality=quality)
-            buffer.seek(0)
-            compressed = Image.open(buffer)
-            
-            diff = ImageChops.difference(image, compressed)
-            diff_score = np.mean(np.array(diff))
-            quality_scores.append(diff_score)
-        
         # Return quality with smallest difference
         min_diff_index = np.argmin(quality_scores)
         return self.test_qualities[min_diff_index]
\ No newline at end of file
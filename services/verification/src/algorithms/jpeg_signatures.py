@@ -0,0 +1,246 @@
+# services/verification/src/algorithms/jpeg_signatures.py
+import gzip
+import hashlib
+import io
+import json
+import os
+import struct
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+from PIL import Image
+from .dct_analysis import ZIGZAG
+
+# Shipped index: libjpeg tables at every quality, published editor tables and reference encoders
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(__file__), 'jpeg_signatures.json.gz')
+
+INDEX_FORMAT = 1
+
+# Label of the tables libjpeg writes itself, at every quality
+LIBJPEG_LABEL = 'IJG libjpeg'
+
+# Encoders too widespread (cameras, phones, web pipelines, editors) to say anything about editing
+GENERIC_ENCODERS = frozenset({LIBJPEG_LABEL})
+
+# Start-of-frame markers (every SOFn except DHT, JPG and DAC)
+SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+PROGRESSIVE_MARKERS = {0xC2, 0xC6, 0xCA, 0xCE}
+ARITHMETIC_MARKERS = {0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+@dataclass(frozen=True)
+class JpegSignature:
+    """Encoder fingerprint of a JPEG: how it was compressed, not what it shows
+
+    `quantization` maps table slot to its 64 steps in natural order,
+    `components` lists (h, v, table slot) per component, and `huffman` is
+    'standard' (the Annex K tables most encoders default to), 'optimized'
+    (per-image tables) or 'arithmetic'.
+    """
+    quantization: Tuple[Tuple[int, Tuple[int, ...]], ...]
+    components: Tuple[Tuple[int, int, int], ...]
+    huffman: str
+    progressive: bool
+
+    @property
+    def key(self) -> str:
+        """Stable 64-bit hex digest used as the index key"""
+        canonical = ';'.join([
+            '|'.join(f"{slot}:{','.join(map(str, table))}" for slot, table in self.quantization),
+            '|'.join(f"{h}x{v}:{slot}" for h, v, slot in self.components),
+            self.huffman,
+            'progressive' if self.progressive else 'sequential'
+        ])
+        return hashlib.sha1(canonical.encode()).hexdigest()[:16]
+
+    @property
+    def sampling(self) -> str:
+        """Chroma subsampling in the usual notation (4:2:0, 4:4:4, ...)"""
+        if len(self.components) == 1:
+            return 'grayscale'
+        h, v, _ = self.components[0]
+        if all(c[:2] == (1, 1) for c in self.components[1:]):
+            return {(1, 1): '4:4:4', (2, 1): '4:2:2', (2, 2): '4:2:0', (1, 2): '4:4:0',
+                    (4, 1): '4:1:1'}.get((h, v), f"{h}x{v}")
+        return '/'.join(f"{c[0]}x{c[1]}" for c in self.components)
+
+def read_signature(fp: BinaryIO) -> Optional[JpegSignature]:
+    """Encoder signature of the JPEG in `fp`, or None for non-JPEG or truncated input
+
+    Only marker segments up to the first scan are read; entropy-coded data
+    is never touched, so the cost is independent of image size. MPO files
+    yield the signature of their first frame.
+    """
+    header = _scan_header(fp)
+    if header is None or header['components'] is None or not header['quantization']:
+        return None
+
+    if header['arithmetic']:
+        huffman = 'arithmetic'
+    elif header['huffman'] and set(header['huffman']) <= standard_huffman_digests():
+        huffman = 'standard'
+    else:
+        huffman = 'optimized'
+
+    return JpegSignature(
+        quantization=tuple(sorted(header['quantization'].items())),
+        components=header['components'],
+        huffman=huffman,
+        progressive=header['progressive']
+    )
+
+def _scan_header(fp: BinaryIO) -> Optional[Dict[str, Any]]:
+    """Tables and frame layout from the marker segments before the first scan"""
+    fp.seek(0)
+    if fp.read(2) != b'\xff\xd8':
+        return None
+
+    header = {'quantization': {}, 'huffman': [], 'components': None,
+              'progressive': False, 'arithmetic': False}
+    while True:
+        byte = fp.read(1)
+        if not byte:
+            return None
+        if byte != b'\xff':
+            continue
+        marker = fp.read(1)
+        # Fill bytes may pad any marker
+        while marker == b'\xff':
+            marker = fp.read(1)
+        if not marker:
+            return None
+        marker = marker[0]
+        if marker in (0xDA, 0xD9):
+            return header
+        if 0xD0 <= marker <= 0xD7 or marker == 0x01:
+            continue
+
+        length = fp.read(2)
+        if len(length) < 2:
+            return None
+        length = struct.unpack('>H', length)[0] - 2
+        if marker not in SOF_MARKERS and marker not in (0xC4, 0xDB):
+            fp.seek(length, io.SEEK_CUR)
+            continue
+
+        payload = fp.read(length)
+        if len(payload) < length:
+            return None
+        if marker == 0xDB:
+            _parse_dqt(payload, header['quantization'])
+        elif marker == 0xC4:
+            _parse_dht(payload, header['huffman'])
+        else:
+            header['progressive'] = marker in PROGRESSIVE_MARKERS
+            header['arithmetic'] = marker in ARITHMETIC_MARKERS
+            header['components'] = tuple(
+                (payload[7 + 3 * i] >> 4, payload[7 + 3 * i] & 15, payload[8 + 3 * i])
+                for i in range(payload[5])
+            )
+
+def _parse_dqt(payload: bytes, quantization: Dict[int, Tuple[int, ...]]):
+    offset = 0
+    while offset < len(payload):
+        precision, slot = payload[offset] >> 4, payload[offset] & 15
+        size = 128 if precision else 64
+        values = payload[offset + 1:offset + 1 + size]
+        steps = struct.unpack(">64H", values) if precision else tuple(values)
+        # Tables are stored in zigzag order
+        natural = [0] * 64
+        for position, step in enumerate(steps):
+            natural[ZIGZAG[position]] = step
+        quantization[slot] = tuple(natural)
+        offset += 1 + size
+
+def _parse_dht(payload: bytes, digests: List[str]):
+    offset = 0
+    while offset + 17 <= len(payload):
+        table_class = payload[offset] >> 4
+        count = sum(payload[offset + 1:offset + 17])
+        table = payload[offset + 1:offset + 17 + count]
+        digests.append(f"{table_class}:{hashlib.sha1(table).hexdigest()[:16]}")
+        offset += 17 + count
+
+@lru_cache(maxsize=1)
+def standard_huffman_digests() -> frozenset:
+    """Digests of the Annex K Huffman tables, taken from libjpeg itself
+
+    libjpeg writes the standard tables whenever it is not asked to
+    optimize, so one tiny unoptimized color encode yields all four.
+    """
+    buffer = io.BytesIO()
+    Image.new('RGB', (16, 16), (128, 64, 32)).save(buffer, 'JPEG', optimize=False)
+    return frozenset(_scan_header(buffer)['huffman'])
+
+class SignatureIndex:
+    """Known encoder signatures, loaded from disk on first lookup
+
+    The index maps signature keys to labels such as libjpeg at a given
+    quality, an editor preset or a camera model, so each lookup is a single
+    dictionary access.
+    """
+
+    def __init__(self, path: str = DEFAULT_INDEX_PATH):
+        self.path = path
+        self._signatures: Optional[Dict[str, List[int]]] = None
+        self._labels: List[Dict[str, Any]] = []
+        self._fingerprint: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def lookup(self, signature: Optional[JpegSignature]) -> List[Dict[str, Any]]:
+        """Labels of every known encoder producing `signature` (empty if unknown)"""
+        if signature is None:
+            return []
+        if self._signatures is None:
+            self._load()
+        return [self._labels[i] for i in self._signatures.get(signature.key, [])]
+
+    @property
+    def fingerprint(self) -> str:
+        """Digest of the index file, so rebuilt indexes invalidate cached results"""
+        if self._fingerprint is None:
+            try:
+                with open(self.path, 'rb') as f:
+                    self._fingerprint = hashlib.sha1(f.read()).hexdigest()[:12]
+            except OSError:
+                self._fingerprint = 'missing'
+        return self._fingerprint
+
+    def __len__(self) -> int:
+        if self._signatures is None:
+            self._load()
+        return len(self._signatures)
+
+    def _load(self):
+        with self._lock:
+            if self._signatures is not None:
+                return
+            try:
+                with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+                    index = json.load(f)
+            except (OSError, ValueError):
+                # A missing or unreadable index disables the check instead of failing analyses
+                self._labels, self._signatures = [], {}
+                return
+            if index.get('format') != INDEX_FORMAT:
+                self._labels, self._signatures = [], {}
+                return
+            self._labels = index['labels']
+            self._signatures = index['signatures']
+
+def save_index(labels: List[Dict[str, Any]], signatures: Dict[str, List[int]], path: str,
+               sources: Optional[Dict[str, Any]] = None):
+    """Write an index in the compact on-disk format read by SignatureIndex"""
+    index = {
+        'format': INDEX_FORMAT,
+        'sources': sources or {},
+        'labels': labels,
+        'signatures': {key: sorted(set(ids)) for key, ids in sorted(signatures.items())}
+    }
+    with gzip.GzipFile(path, 'wb', mtime=0) as f:
+        f.write(json.dumps(index, separators=(',', ':'), sort_keys=True).encode('utf-8'))
+
+@lru_cache(maxsize=1)
+def default_index() -> SignatureIndex:
+    """Process-wide index; kept out of analyzers so process workers don't pickle it"""
+    return SignatureIndex()
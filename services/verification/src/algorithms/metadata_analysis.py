@@ -1,27 +1,36 @@
 # services/verification/src/algorithms/metadata_analysis.py
 import numpy as np
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple, Union
+from .context import AnalysisContext
+from .jpeg_signatures import GENERIC_ENCODERS, JpegSignature, default_index
 
 class MetadataAnalyzer:
     """EXIF Metadata Consistency Analyzer"""
     
     def __init__(self):
         self.name = "Metadata Consistency"
-        self.version = "1.0"
+        self.version = "1.2"
         self.description = "EXIF metadata consistency and editing software detection"
         self.editing_software = [
             'photoshop', 'gimp', 'lightroom', 'snapseed', 
             'canva', 'pixlr', 'paint.net', 'affinity'
         ]
     
-    def analyze(self, exif_data: Dict, image_array: np.ndarray) -> Dict[str, Any]:
-        """Execute metadata analysis"""
+    def analyze(self, exif_data: Dict, context: Union[AnalysisContext, np.ndarray],
+                original_size: Optional[Tuple[int, int]] = None,
+                signature: Optional[JpegSignature] = None) -> Dict[str, Any]:
+        """Execute metadata analysis
+        
+        `original_size` is the source (width, height); pass it when
+        `context` is a downscaled decode. `signature` is the file's JPEG
+        encoder signature, matched against the index of known encoders.
+        """
         try:
             suspicion_indicators = []
             suspicion_score = 0.0
             
             # Check resolution mismatch
-            resolution_score = self._check_resolution_mismatch(exif_data, image_array)
+            resolution_score = self._check_resolution_mismatch(exif_data, context, original_size)
             if resolution_score > 0:
                 suspicion_score += resolution_score
                 suspicion_indicators.append("Resolution mismatch detected")
@@ -32,6 +41,13 @@ class MetadataAnalyzer:
                 suspicion_score += software_score
                 suspicion_indicators.append("Image editing software detected")
             
+            # Check encoder signature (survives stripping the Software tag)
+            encoders = default_index().lookup(signature)
+            encoder_score, encoder_indicator = self._check_encoder_signature(exif_data, encoders)
+            if encoder_score > 0 and software_score == 0:
+                suspicion_score += encoder_score
+                suspicion_indicators.append(encoder_indicator)
+            
             # Check timestamps
             timestamp_score = self._check_timestamp_inconsistency(exif_data)
             if timestamp_score > 0:
@@ -50,7 +66,14 @@ class MetadataAnalyzer:
                 "algorithm": self.name,
                 "details": {
                     "indicators": suspicion_indicators,
-                    "checks_performed": ["resolution", "software", "timestamp", "orientation"]
+                    "checks_performed": ["resolution", "software", "encoder", "timestamp", "orientation"],
+                    "encoder_matches": encoders,
+                    "encoder_signature": None if signature is None else {
+                        "key": signature.key,
+                        "sampling": signature.sampling,
+                        "huffman": signature.huffman,
+                        "progressive": signature.progressive
+                    }
                 }
             }
         except Exception as e:
@@ -61,14 +84,18 @@ class MetadataAnalyzer:
                 "algorithm": self.name
             }
     
-    def _check_resolution_mismatch(self, exif_data: Dict, image_array: np.ndarray) -> float:
+    def _check_resolution_mismatch(self, exif_data: Dict, context: Union[AnalysisContext, np.ndarray],
+                                   original_size: Optional[Tuple[int, int]] = None) -> float:
         """Check for resolution mismatch"""
         exif_width = exif_data.get('ExifImageWidth')
         exif_height = exif_data.get('ExifImageHeight')
         
         if exif_width and exif_height:
             try:
-                actual_height, actual_width = image_array.shape[:2]
+                if original_size:
+                    actual_width, actual_height = original_size
+                else:
+                    actual_width, actual_height = AnalysisContext.of(context).size
                 if int(exif_width) != actual_width or int(exif_height) != actual_height:
                     return 0.3
             except:
@@ -82,6 +109,32 @@ class MetadataAnalyzer:
             return 0.4
         return 0.0
     
+    def _check_encoder_signature(self, exif_data: Dict,
+                                 encoders: List[Dict[str, Any]]) -> Tuple[float, Optional[str]]:
+        """Compare the encoder identified from the JPEG tables with the EXIF claims"""
+        if not encoders:
+            return 0.0, None
+        
+        make = str(exif_data.get('Make', '')).strip().lower()
+        model = str(exif_data.get('Model', '')).strip().lower()
+        cameras = [e for e in encoders if e['kind'] == 'camera']
+        if any(model and model in e['label'].lower() for e in cameras):
+            return 0.0, None
+        
+        # Generic libjpeg matches stay listed in encoder_matches but are not scored
+        software = [e for e in encoders if e['kind'] == 'software' and e['label'] not in GENERIC_ENCODERS]
+        if software:
+            return 0.4, f"Re-encoded by {self._describe_encoder(software[0])}"
+        if cameras and (make or model):
+            return 0.3, f"Compression matches {cameras[0]['label']}, not the camera in EXIF"
+        return 0.0, None
+    
+    @staticmethod
+    def _describe_encoder(encoder: Dict[str, Any]) -> str:
+        if encoder.get('quality') is not None:
+            return f"{encoder['label']} (quality {encoder['quality']})"
+        return encoder['label']
+    
     def _check_timestamp_inconsistency(self, exif_data: Dict) -> float:
         """Check for timestamp inconsistency"""
         datetime_original = exif_data.get('DateTimeOriginal')
@@ -1,8 +1,8 @@
 # services/verification/src/algorithms/noise_analysis.py
 import numpy as np
-import cv2
-from scipy import ndimage
-from typing import Dict, Any
+from typing import Dict, Any, Tuple, Union
+from .block_stats import laplacian_residual, block_std, block_std_at
+from .context import AnalysisContext
 
 class NoisePatternAnalyzer:
     """Sensor Noise Pattern Consistency Analyzer"""
@@ -14,20 +14,15 @@ class NoisePatternAnalyzer:
         self.block_size = 64
         self.overlap_ratio = 0.5
     
-    def analyze(self, image_array: np.ndarray) -> Dict[str, Any]:
+    def analyze(self, context: Union[AnalysisContext, np.ndarray]) -> Dict[str, Any]:
         """Execute noise pattern analysis"""
         try:
-            # Convert to grayscale
-            if len(image_array.shape) == 3:
-                gray = cv2.cvtColor(image_array, cv2.COLOR_RGB2GRAY)
-            else:
-                gray = image_array
-            
-            # Extract noise and perform analysis
-            raw_score = self._analyze_noise_consistency(gray)
+            # Noise residual of the grayscale image, shared through the context
+            noise = AnalysisContext.of(context).noise_residual
+            raw_score = self._noise_consistency(noise)
             
             # Improved score calculation - map to realistic range
-            normalized_score = self._normalize_noise_score(raw_score, gray.shape)
+            normalized_score = self._normalize_noise_score(raw_score, noise.shape)
             
             return {
                 "score": round(normalized_score, 3),
@@ -35,7 +30,7 @@ class NoisePatternAnalyzer:
                 "algorithm": self.name,
                 "details": {
                     "block_size": self.block_size,
-                    "blocks_analyzed": self._count_blocks(gray.shape),
+                    "blocks_analyzed": self._count_blocks(noise.shape),
                     "raw_coefficient_variation": round(raw_score, 3),
                     "method": "Improved Gaussian filter noise extraction"
                 }
@@ -51,36 +46,32 @@ class NoisePatternAnalyzer:
     def _analyze_noise_consistency(self, gray_image: np.ndarray) -> float:
         """Completely improved noise consistency analysis"""
         
-        # 1. Wavelet-based noise extraction (more precise)
-        from scipy import signal
-        
-        # Extract only high-frequency components
-        kernel = np.array([[-1, -1, -1], [-1, 8, -1], [-1, -1, -1]])
-        noise = signal.convolve2d(gray_image.astype(float), kernel, mode='same')
+        # 1. Extract only high-frequency components (Laplacian residual)
+        return self._noise_consistency(laplacian_residual(gray_image))
+    
+    def _noise_consistency(self, noise: np.ndarray) -> float:
+        """Consistency of block noise levels in a Laplacian residual"""
         
         # 2. Use adaptive block size
-        h, w = gray_image.shape
-        adaptive_block_size = min(64, max(32, min(h, w) // 10))
+        adaptive_block_size = self._adaptive_block_size(noise.shape)
         
-        # 3. Calculate noise variance (more stable)
-        noise_stats = []
+        # 3. Calculate noise standard deviation of every block in one pass
         step = adaptive_block_size // 2
+        block_stds = block_std(noise, adaptive_block_size, step).ravel()
         
-        for i in range(0, h - adaptive_block_size + 1, step):
-            for j in range(0, w - adaptive_block_size + 1, step):
-                block = noise[i:i+adaptive_block_size, j:j+adaptive_block_size]
-                
-                # Use standard deviation (more stable than variance)
-                std = np.std(block)
-                if std > 1e-3:  # More lenient threshold
-                    noise_stats.append(std)
+        # Use standard deviation (more stable than variance)
+        noise_stats = block_stds[block_stds > 1e-3]  # More lenient threshold
         
+        return self._noise_variation(noise_stats)
+    
+    def _noise_variation(self, noise_stats: np.ndarray) -> float:
+        """Normalized median absolute deviation of block noise levels"""
         if len(noise_stats) < 4:
             return 0.0
         
         # 4. Median-based consistency calculation (robust to outliers)
         median_std = np.median(noise_stats)
-        mad = np.median(np.abs(np.array(noise_stats) - median_std))  # Median Absolute Deviation
+        mad = np.median(np.abs(noise_stats - median_std))  # Median Absolute Deviation
         
         if median_std == 0:
             return 0.0
@@ -89,6 +80,62 @@ class NoisePatternAnalyzer:
         normalized_mad = mad / median_std
         return normalized_mad
     
+    def _adaptive_block_size(self, image_shape) -> int:
+        """Block size scaled to the image, between 32 and 64 pixels"""
+        h, w = image_shape[:2]
+        return min(64, max(32, min(h, w) // 10))
+    
+    def start_tiles(self, image_shape: Tuple[int, int]) -> Dict[str, Any]:
+        """State for tiled analysis: block noise levels on the whole-image grid"""
+        block_size = self._adaptive_block_size(image_shape)
+        return {
+            "image_shape": image_shape,
+            "block_size": block_size,
+            "step": block_size // 2,
+            "noise_stats": [],
+            "tiles": 0
+        }
+    
+    def add_tile(self, state: Dict[str, Any], tile, recompression=None) -> float:
+        """Collect the blocks whose top-left corner lies in the tile's core
+        
+        The tile margin covers the rest of each block plus the Laplacian's
+        one-pixel context, so every block matches the whole-image one.
+        """
+        noise = AnalysisContext(tile.pixels).noise_residual
+        
+        height, width = state["image_shape"]
+        block_size, step = state["block_size"], state["step"]
+        
+        starts = []
+        for axis, limit in enumerate((height, width)):
+            first = -(-tile.core_origin[axis] // step) * step
+            last = min(tile.core_end[axis], limit - block_size + 1)
+            starts.append(np.arange(first, last, step) - tile.origin[axis])
+        
+        block_stds = block_std_at(noise, starts[0], starts[1], block_size).ravel()
+        tile_stats = block_stds[block_stds > 1e-3]
+        state["noise_stats"].append(tile_stats)
+        state["tiles"] += 1
+        return self._normalize_noise_score(self._noise_variation(tile_stats), noise.shape)
+    
+    def finish_tiles(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Whole-image result from all collected block noise levels"""
+        raw_score = self._noise_variation(np.concatenate(state["noise_stats"]))
+        normalized_score = self._normalize_noise_score(raw_score, state["image_shape"])
+        return {
+            "score": round(normalized_score, 3),
+            "success": True,
+            "algorithm": self.name,
+            "details": {
+                "block_size": self.block_size,
+                "blocks_analyzed": self._count_blocks(state["image_shape"]),
+                "raw_coefficient_variation": round(raw_score, 3),
+                "tiles_analyzed": state["tiles"],
+                "method": "Improved Gaussian filter noise extraction (tiled)"
+            }
+        }
+    
     def _normalize_noise_score(self, raw_score: float, image_shape) -> float:
         """Normalize noise score to 0-1 range"""
         # Empirical normalization function
@@ -0,0 +1,98 @@
+# services/verification/src/algorithms/recompression.py
+import numpy as np
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import lru_cache, partial
+from PIL import Image
+from typing import Dict, Iterable, List, Optional, Tuple
+
+@dataclass
+class RecompressionResult:
+    """Difference arrays produced by one recompression pass"""
+    qualities: List[int]
+    diffs: Dict[int, np.ndarray] = field(default_factory=dict)
+    timings_ms: Dict[int, float] = field(default_factory=dict)
+
+    def diff(self, quality: int) -> np.ndarray:
+        """Absolute difference between the image and its re-encoding at `quality`"""
+        return self.diffs[quality]
+
+    def timings_for(self, qualities: Iterable[int]) -> Dict[int, float]:
+        """Per-quality encode+decode timings restricted to `qualities`"""
+        return {q: self.timings_ms[q] for q in qualities if q in self.timings_ms}
+
+    def merge(self, other: 'RecompressionResult') -> 'RecompressionResult':
+        """Combined result of two passes over the same image"""
+        return RecompressionResult(
+            qualities=sorted(set(self.qualities) | set(other.qualities)),
+            diffs={**self.diffs, **other.diffs},
+            timings_ms={**self.timings_ms, **other.timings_ms}
+        )
+
+class RecompressionStage:
+    """Shared JPEG recompression stage
+
+    Encodes the image once per requested quality and keeps the difference
+    arrays so every analyzer working on recompression artifacts reuses them.
+    Qualities are processed on a thread pool of up to `max_workers` threads
+    (default: CPU count, at most 4): PIL's JPEG codec and OpenCV release the
+    GIL, so the encodes overlap on multi-core hosts.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.name = "JPEG Recompression Stage"
+        self.version = "1.0"
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+
+    def run(self, image_array: np.ndarray, qualities: Iterable[int],
+            image: Optional[Image.Image] = None) -> RecompressionResult:
+        """Recompress the image at each distinct quality exactly once
+
+        `image` is the PIL image `image_array` was read from, if the caller
+        has it; encoding it directly saves rebuilding one from the array.
+        """
+        result = RecompressionResult(qualities=sorted(set(qualities)))
+        if image is None:
+            image = Image.fromarray(image_array)
+        else:
+            image.load()
+
+        if self.max_workers > 1 and len(result.qualities) > 1:
+            outputs = list(_encode_pool(self.max_workers).map(
+                partial(_recompress, image_array, image=image), result.qualities
+            ))
+        else:
+            outputs = [_recompress(image_array, quality, image) for quality in result.qualities]
+
+        for quality, (diff, elapsed_ms) in zip(result.qualities, outputs):
+            result.diffs[quality] = diff
+            result.timings_ms[quality] = elapsed_ms
+        return result
+
+def _recompress(image_array: np.ndarray, quality: int,
+                image: Image.Image) -> Tuple[np.ndarray, float]:
+    """Absolute difference between the image and its JPEG round trip at `quality`"""
+    start_time = time.perf_counter()
+    # Image.save stores its options on the image, so each encode gets its own
+    # wrapper; it shares the pixel buffer instead of copying it
+    image = image._new(image.im)
+
+    # JPEG recompression
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=quality)
+    buffer.seek(0)
+    compressed = np.asarray(Image.open(buffer))
+
+    # Calculate difference (same values as ImageChops.difference);
+    # OpenCV is imported on first use to keep it out of service start-up
+    import cv2
+    diff = cv2.absdiff(image_array, compressed)
+    return diff, round((time.perf_counter() - start_time) * 1000, 2)
+
+@lru_cache(maxsize=None)
+def _encode_pool(max_workers: int) -> ThreadPoolExecutor:
+    """Process-wide encode threads, shared by every stage of that size"""
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='recompression')
@@ -0,0 +1,118 @@
+# services/verification/src/algorithms/registry.py
+import importlib
+import threading
+import time
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+# Entry point group third-party packages use to contribute analyzers
+ENTRY_POINT_GROUP = "image_verification.analyzers"
+
+@dataclass(frozen=True)
+class AnalyzerSpec:
+    """Where an analyzer lives and how the engine weighs it, known without importing it"""
+    # "package.module:Class"; the class is built without arguments
+    target: str
+    # Share of the final score
+    weight: float
+    # Whether it reads decoded pixels (False for header-only checks)
+    pixel: bool = True
+
+    def load(self) -> Any:
+        module_name, _, class_name = self.target.partition(":")
+        return getattr(importlib.import_module(module_name), class_name)()
+
+BUILTIN_ANALYZERS: Dict[str, AnalyzerSpec] = {
+    'enhanced_ela': AnalyzerSpec('algorithms.ela_analysis:ELAAnalyzer', 0.35),
+    'metadata_consistency': AnalyzerSpec('algorithms.metadata_analysis:MetadataAnalyzer', 0.25,
+                                         pixel=False),
+    'noise_pattern': AnalyzerSpec('algorithms.noise_analysis:NoisePatternAnalyzer', 0.20),
+    'jpeg_quality': AnalyzerSpec('algorithms.jpeg_analysis:JPEGQualityAnalyzer', 0.20)
+}
+
+def discover_plugins() -> Dict[str, AnalyzerSpec]:
+    """AnalyzerSpecs published under ENTRY_POINT_GROUP by installed packages
+
+    Entry points should name an AnalyzerSpec in a module that is cheap to
+    import; the analyzer itself is only imported when first used.
+    """
+    from importlib.metadata import entry_points
+    found = entry_points()
+    # Python < 3.10 returns a dict of groups
+    group = found.select(group=ENTRY_POINT_GROUP) if hasattr(found, 'select') else found.get(ENTRY_POINT_GROUP, [])
+    plugins = {}
+    for entry in group:
+        spec = entry.load()
+        if not isinstance(spec, AnalyzerSpec):
+            raise TypeError(f"Entry point '{entry.name}' must name an AnalyzerSpec, got {type(spec).__name__}")
+        plugins[entry.name] = spec
+    return plugins
+
+class AnalyzerRegistry(Mapping):
+    """Analyzers by name, each imported and built on first access
+
+    Listing names, membership tests and `spec` never import anything, so
+    building an engine is cheap; the first lookup of a name imports its
+    module (and heavy dependencies such as OpenCV) and caches the instance.
+    `load_all` does that up front, for warm-up.
+    """
+
+    def __init__(self, specs: Optional[Dict[str, AnalyzerSpec]] = None, plugins: bool = True):
+        self._specs = dict(BUILTIN_ANALYZERS if specs is None else specs)
+        if plugins:
+            self._specs.update(discover_plugins())
+        self._instances: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, spec: AnalyzerSpec):
+        """Add or replace an analyzer; replacing drops an already built instance"""
+        with self._lock:
+            self._specs[name] = spec
+            self._instances.pop(name, None)
+
+    def select(self, names: Iterable[str]) -> 'AnalyzerRegistry':
+        """Registry restricted to `names`, in that order"""
+        names = list(names)
+        unknown = [name for name in names if name not in self._specs]
+        if unknown:
+            raise ValueError(f"Unknown analyzers {unknown}, expected some of {list(self._specs)}")
+        return AnalyzerRegistry({name: self._specs[name] for name in names}, plugins=False)
+
+    def spec(self, name: str) -> AnalyzerSpec:
+        return self._specs[name]
+
+    def __getitem__(self, name: str) -> Any:
+        instance = self._instances.get(name)
+        if instance is None:
+            spec = self._specs[name]
+            with self._lock:
+                instance = self._instances.get(name)
+                if instance is None:
+                    instance = self._instances[name] = spec.load()
+        return instance
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._specs)
+
+    def __len__(self) -> int:
+        return len(self._specs)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._specs
+
+    @property
+    def loaded(self) -> List[str]:
+        return [name for name in self._specs if name in self._instances]
+
+    def load_all(self) -> Dict[str, float]:
+        """Build every analyzer not built yet; milliseconds each took (imports included)"""
+        timings = {}
+        for name in self._specs:
+            if name in self._instances:
+                continue
+            start_time = time.perf_counter()
+            self[name]
+            timings[name] = round((time.perf_counter() - start_time) * 1000, 2)
+        return timings
+
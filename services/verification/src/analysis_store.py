@@ -0,0 +1,198 @@
+# services/verification/src/analysis_store.py
+import asyncio
+import hashlib
+import json
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Set
+from sqlalchemy import (JSON, Boolean, Column, Float, Index, Integer, MetaData, String, Table,
+                        create_engine, event, insert, select)
+from sqlalchemy.engine import Engine
+
+metadata = MetaData()
+
+# One row per computed verdict; cache hits are not recorded again
+analyses = Table(
+    'analyses', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('sha256', String(64), nullable=False),
+    # Unix time, seconds
+    Column('analyzed_at', Float, nullable=False),
+    Column('filename', String(512)),
+    Column('final_score', Float, nullable=False),
+    Column('risk_level', String(16), nullable=False),
+    Column('is_potentially_edited', Boolean, nullable=False),
+    # individual_scores: analyzer name -> score
+    Column('scores', JSON, nullable=False),
+    Column('analyzers_skipped', JSON),
+    Column('timings_ms', JSON),
+    Column('budget_ms', Float),
+    Column('engine_fingerprint', String(16), nullable=False),
+    Index('ix_analyses_sha256_analyzed_at', 'sha256', 'analyzed_at'),
+    Index('ix_analyses_risk_level_analyzed_at', 'risk_level', 'analyzed_at'),
+    Index('ix_analyses_analyzed_at', 'analyzed_at')
+)
+
+# Engine and analyzer versions, stored once per configuration
+engine_versions = Table(
+    'engine_versions', metadata,
+    Column('fingerprint', String(16), primary_key=True),
+    Column('versions', JSON, nullable=False),
+    Column('first_seen', Float, nullable=False)
+)
+
+def engine_fingerprint(versions: Dict[str, str]) -> str:
+    """Short, stable identifier of an engine configuration"""
+    return hashlib.sha256(json.dumps(versions, sort_keys=True).encode()).hexdigest()[:16]
+
+class AnalysisStore:
+    """Persistent record of analysis verdicts, written in the background
+
+    `record` only queues the row, so the request path never waits on the
+    database. A single writer task drains the queue and inserts up to
+    `batch_size` rows per transaction, at the latest `flush_interval`
+    seconds after the first of them arrived. When the queue holds
+    `max_pending` rows (the database is down or too slow), new rows are
+    dropped rather than buffered without bound.
+
+    Any SQLAlchemy URL works; SQLite (sqlite:///path/to/analyses.db) needs
+    no server. Tables are created when missing. Create the store inside the
+    event loop that will run it.
+    """
+
+    def __init__(self, url: str, batch_size: int = 500, flush_interval: float = 1.0,
+                 max_pending: int = 10000,
+                 on_flush: Optional[Callable[[int, float, Optional[Exception]], None]] = None):
+        self.url = url
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush
+        self._engine = _create_engine(url)
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self._writer: Optional[asyncio.Task] = None
+        self._known_fingerprints: Set[str] = set()
+
+    async def start(self):
+        await asyncio.to_thread(metadata.create_all, self._engine)
+        self._writer = asyncio.create_task(self._write_batches())
+
+    async def stop(self):
+        """Write what is still queued, then close the connections"""
+        if self._writer is not None:
+            await self._queue.put(None)
+            await self._writer
+            self._writer = None
+        await asyncio.to_thread(self._engine.dispose)
+
+    def record(self, digest: str, result: Dict[str, Any], versions: Dict[str, str],
+               filename: Optional[str] = None, budget_ms: Optional[float] = None) -> bool:
+        """Queue one engine result for writing; False if it was dropped"""
+        fingerprint = engine_fingerprint(versions)
+        row = {
+            'sha256': digest,
+            'analyzed_at': time.time(),
+            'filename': filename,
+            'final_score': float(result['final_score']),
+            'risk_level': result['risk_level'],
+            'is_potentially_edited': bool(result['is_potentially_edited']),
+            'scores': {name: float(score) for name, score in result['individual_scores'].items()},
+            'analyzers_skipped': result.get('analyzers_skipped') or None,
+            'timings_ms': result.get('stage_timings_ms'),
+            'budget_ms': budget_ms,
+            'engine_fingerprint': fingerprint
+        }
+        try:
+            self._queue.put_nowait((row, versions))
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    async def query(self, sha256: Optional[str] = None, risk_level: Optional[str] = None,
+                    since: Optional[datetime] = None, until: Optional[datetime] = None,
+                    limit: int = 100) -> List[Dict[str, Any]]:
+        """Stored verdicts matching every given filter, newest first"""
+        statement = select(analyses).order_by(analyses.c.analyzed_at.desc()).limit(limit)
+        if sha256 is not None:
+            statement = statement.where(analyses.c.sha256 == sha256)
+        if risk_level is not None:
+            statement = statement.where(analyses.c.risk_level == risk_level)
+        if since is not None:
+            statement = statement.where(analyses.c.analyzed_at >= since.timestamp())
+        if until is not None:
+            statement = statement.where(analyses.c.analyzed_at < until.timestamp())
+
+        def run() -> List[Dict[str, Any]]:
+            with self._engine.connect() as connection:
+                return [dict(row) for row in connection.execute(statement).mappings()]
+        return await asyncio.to_thread(run)
+
+    async def versions(self, fingerprint: str) -> Optional[Dict[str, str]]:
+        """Engine and analyzer versions recorded under a fingerprint"""
+        statement = select(engine_versions.c.versions).where(engine_versions.c.fingerprint == fingerprint)
+
+        def run() -> Optional[Dict[str, str]]:
+            with self._engine.connect() as connection:
+                return connection.execute(statement).scalar()
+        return await asyncio.to_thread(run)
+
+    async def _write_batches(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            # Collect more rows until the batch is full or its first row has waited long enough
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    if loop.time() >= deadline:
+                        break
+                    await asyncio.sleep(min(0.05, deadline - loop.time()))
+                    continue
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            start_time = time.perf_counter()
+            error = None
+            try:
+                await asyncio.to_thread(self._insert, batch)
+            except Exception as e:
+                # The rows are lost; the service keeps answering regardless
+                error = e
+            if self.on_flush is not None:
+                self.on_flush(len(batch), time.perf_counter() - start_time, error)
+
+    def _insert(self, batch: List[tuple]):
+        """Insert a batch in one transaction, registering unseen engine versions first"""
+        new_versions = {}
+        for row, versions in batch:
+            if row['engine_fingerprint'] not in self._known_fingerprints:
+                new_versions[row['engine_fingerprint']] = versions
+        with self._engine.begin() as connection:
+            for fingerprint, versions in new_versions.items():
+                exists = connection.execute(
+                    select(engine_versions.c.fingerprint).where(engine_versions.c.fingerprint == fingerprint)
+                ).first()
+                if exists is None:
+                    connection.execute(insert(engine_versions),
+                                       {'fingerprint': fingerprint, 'versions': versions, 'first_seen': time.time()})
+            connection.execute(insert(analyses), [row for row, _ in batch])
+        self._known_fingerprints.update(new_versions)
+
+def _create_engine(url: str) -> Engine:
+    engine = create_engine(url)
+    if engine.dialect.name == 'sqlite':
+        @event.listens_for(engine, 'connect')
+        def _sqlite_pragmas(connection, _):
+            # Readers don't block the writer; fsync per checkpoint instead of per commit
+            cursor = connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.close()
+    return engine
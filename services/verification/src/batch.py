@@ -0,0 +1,153 @@
+# services/verification/src/batch.py
+import asyncio
+import tarfile
+import zipfile
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, BinaryIO, Callable, Dict, Iterable
+from fastapi import UploadFile
+from ingest import BytesSource, ImageSource, source_for_upload
+
+TAR_SUFFIXES = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+
+@dataclass
+class BatchItem:
+    """One image of a batch; `open` loads its source only when it is scheduled"""
+    filename: str
+    open: Callable[[], Awaitable[ImageSource]]
+
+async def iter_batch_items(files: Iterable[UploadFile], max_member_bytes: int) -> AsyncIterator[BatchItem]:
+    """Lazily expand uploaded files, unpacking zip and tar archives
+
+    Archive members larger than `max_member_bytes` once decompressed are
+    reported as failed items rather than read. Archives are read in worker
+    threads, one read at a time per archive.
+    """
+    for upload in files:
+        name = upload.filename or ''
+        lowered = name.lower()
+        try:
+            if lowered.endswith('.zip'):
+                async for item in _zip_items(name, upload, max_member_bytes):
+                    yield item
+            elif lowered.endswith(TAR_SUFFIXES):
+                async for item in _tar_items(name, upload, max_member_bytes):
+                    yield item
+            else:
+                yield BatchItem(name, _upload_opener(upload))
+        except (zipfile.BadZipFile, tarfile.TarError) as e:
+            yield BatchItem(name, _raise(ValueError(f"Unreadable archive: {e}")))
+
+async def stream_batch(
+    items: AsyncIterator[BatchItem],
+    analyze: Callable[[BatchItem], Awaitable[Dict[str, Any]]],
+    max_concurrency: int
+) -> AsyncIterator[Dict[str, Any]]:
+    """Run `analyze` over items with bounded concurrency, yielding in completion order
+
+    Every yielded dict carries the item's submission `index`; failures are
+    reported per item as {"index", "filename", "error"} instead of aborting
+    the batch.
+    """
+    pending: Dict[asyncio.Task, tuple] = {}
+    submitted = 0
+    exhausted = False
+
+    try:
+        while True:
+            # Keep at most max_concurrency items in flight
+            while not exhausted and len(pending) < max_concurrency:
+                try:
+                    item = await items.__anext__()
+                except StopAsyncIteration:
+                    exhausted = True
+                    break
+                pending[asyncio.ensure_future(analyze(item))] = (submitted, item)
+                submitted += 1
+
+            if not pending:
+                return
+
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                index, item = pending.pop(task)
+                try:
+                    yield {"index": index, **task.result()}
+                except Exception as e:
+                    yield {"index": index, "filename": item.filename, "error": str(e)}
+    finally:
+        # Client went away or the generator was closed early
+        for task in pending:
+            task.cancel()
+        await items.aclose()
+
+async def _zip_items(archive_name: str, upload: UploadFile, max_member_bytes: int) -> AsyncIterator[BatchItem]:
+    archive = await asyncio.to_thread(zipfile.ZipFile, upload.file)
+    lock = asyncio.Lock()
+
+    def read(info: zipfile.ZipInfo) -> bytes:
+        with archive.open(info) as f:
+            return _read_bounded(f, max_member_bytes)
+
+    for info in archive.infolist():
+        if info.is_dir() or _is_hidden(info.filename):
+            continue
+        yield _member_item(f"{archive_name}/{info.filename}", info.file_size, max_member_bytes,
+                           _member_reader(lock, read, info))
+
+async def _tar_items(archive_name: str, upload: UploadFile, max_member_bytes: int) -> AsyncIterator[BatchItem]:
+    archive = await asyncio.to_thread(tarfile.open, fileobj=upload.file, mode='r:*')
+    lock = asyncio.Lock()
+
+    def read(member: tarfile.TarInfo) -> bytes:
+        with archive.extractfile(member) as f:
+            return _read_bounded(f, max_member_bytes)
+
+    while True:
+        # Headers are read lazily, one member at a time, from the same file as the members
+        async with lock:
+            member = await asyncio.to_thread(archive.next)
+        if member is None:
+            return
+        if not member.isfile() or _is_hidden(member.name):
+            continue
+        yield _member_item(f"{archive_name}/{member.name}", member.size, max_member_bytes,
+                           _member_reader(lock, read, member))
+
+def _member_item(filename: str, size: int, max_member_bytes: int,
+                 opener: Callable[[], Awaitable[ImageSource]]) -> BatchItem:
+    if size > max_member_bytes:
+        return BatchItem(filename, _raise(ValueError(_too_large(max_member_bytes))))
+    return BatchItem(filename, opener)
+
+def _upload_opener(upload: UploadFile) -> Callable[[], Awaitable[ImageSource]]:
+    async def opener() -> ImageSource:
+        return source_for_upload(upload)
+    return opener
+
+def _member_reader(lock: asyncio.Lock, read: Callable[[Any], bytes],
+                   member: Any) -> Callable[[], Awaitable[ImageSource]]:
+    # Archive members share one file position, so reads from worker threads
+    # take turns
+    async def opener() -> ImageSource:
+        async with lock:
+            return BytesSource(await asyncio.to_thread(read, member))
+    return opener
+
+def _read_bounded(f: BinaryIO, max_bytes: int) -> bytes:
+    """Read at most `max_bytes`, whatever the archive header claimed"""
+    data = f.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        raise ValueError(_too_large(max_bytes))
+    return data
+
+def _too_large(max_bytes: int) -> str:
+    return f"Archive member is larger than the {max_bytes}-byte upload limit"
+
+def _raise(error: Exception) -> Callable[[], Awaitable[ImageSource]]:
+    async def opener() -> ImageSource:
+        raise error
+    return opener
+
+def _is_hidden(path: str) -> bool:
+    """Skip macOS resource forks and dotfiles bundled into archives"""
+    return any(part.startswith('.') or part == '__MACOSX' for part in path.split('/'))
@@ -0,0 +1,444 @@
+# services/verification/src/bulk_scan.py
+"""
+Offline bulk scan
+
+Runs the forensics engine directly over directory trees and/or a list of
+files, without going through the HTTP service, and writes one row per image
+to SQLite or Parquet. Files are analyzed on a process pool (one engine per
+process); inside each worker the next file is read and decoded while the
+current one is analyzed. Rows are written in batched transactions, and
+written rows double as the checkpoint: rerunning the same command after an
+interruption skips every file already recorded.
+
+Usage (from services/verification/src):
+    python bulk_scan.py /archive/photos --output scan.sqlite
+    python bulk_scan.py --file-list paths.txt --output scan.parquet --workers 16
+    find /archive -name '*.jpg' | python bulk_scan.py --file-list - --output scan.sqlite
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sqlite3
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from multiprocessing import get_context
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from analysis_store import engine_fingerprint
+from decoding import DecodedImage, decode_for_analysis
+from executor import AnalysisExecutor
+from forensics_engine import AdvancedForensicsEngine
+from frames import analyze_frames, iter_sampled_frames
+from ingest import BytesSource, ImageSource, MappedFileSource
+from algorithms.recompression import RecompressionStage
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.jpe', '.mpo', '.png', '.tif', '.tiff', '.webp', '.gif', '.bmp')
+
+OUTPUT_FORMATS = ('sqlite', 'parquet')
+
+# Columns before the per-analyzer scores; the scores are named score_<analyzer>
+COLUMNS = (
+    ('path', 'TEXT'),
+    ('sha256', 'TEXT'),
+    ('size_bytes', 'INTEGER'),
+    ('format', 'TEXT'),
+    ('width', 'INTEGER'),
+    ('height', 'INTEGER'),
+    ('frame_count', 'INTEGER'),
+    ('final_score', 'REAL'),
+    ('risk_level', 'TEXT'),
+    ('is_potentially_edited', 'INTEGER'),
+    ('analyzers_run', 'TEXT'),
+    ('decode_ms', 'REAL'),
+    ('analysis_ms', 'REAL'),
+    ('error', 'TEXT'),
+    ('engine_fingerprint', 'TEXT'),
+    ('scanned_at', 'REAL')
+)
+
+def build_engine(early_exit: bool = True) -> AdvancedForensicsEngine:
+    """Engine for one scan process: parallelism comes from the processes, so everything inside is serial"""
+    return AdvancedForensicsEngine(executor=AnalysisExecutor('inline'),
+                                   recompression_stage=RecompressionStage(max_workers=1),
+                                   early_exit=early_exit)
+
+def iter_paths(roots: Iterable[str], file_list: Optional[str] = None,
+               extensions: Tuple[str, ...] = IMAGE_EXTENSIONS) -> Iterator[str]:
+    """Absolute paths of the images to scan, in a stable order
+
+    Directories are walked lazily (sorted, so reruns visit files in the same
+    order); files named explicitly, on the command line or in `file_list`
+    ('-' for stdin), are taken whatever their extension.
+    """
+    for root in roots:
+        if not os.path.isdir(root):
+            yield os.path.abspath(root)
+            continue
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if filename.lower().endswith(extensions):
+                    yield os.path.abspath(os.path.join(dirpath, filename))
+    if file_list:
+        lines = sys.stdin if file_list == '-' else open(file_list)
+        try:
+            for line in lines:
+                path = line.strip()
+                if path:
+                    yield os.path.abspath(path)
+        finally:
+            if lines is not sys.stdin:
+                lines.close()
+
+# Per-process state of scan workers, set up by _init_worker
+_engine: Optional[AdvancedForensicsEngine] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_prefetch: Optional[ThreadPoolExecutor] = None
+_fingerprint: Optional[str] = None
+
+def _init_worker(early_exit: bool):
+    global _engine, _loop, _prefetch, _fingerprint
+    # Ctrl-C goes to the whole process group; the parent decides what happens
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _engine = build_engine(early_exit)
+    _loop = asyncio.new_event_loop()
+    _loop.run_until_complete(_engine.warm_up())
+    _fingerprint = engine_fingerprint(_engine.versions)
+    _prefetch = ThreadPoolExecutor(max_workers=1, thread_name_prefix='prefetch')
+
+def scan_files(paths: List[str]) -> List[Dict[str, Any]]:
+    """Worker entry point: analyze `paths` in order, decoding each file during the previous analysis"""
+    rows = []
+    pending = _prefetch.submit(_load, paths[0])
+    for index, path in enumerate(paths):
+        loaded = pending
+        if index + 1 < len(paths):
+            pending = _prefetch.submit(_load, paths[index + 1])
+        rows.append(_analyze(path, loaded))
+        # Drop the pixels before the next file is analyzed
+        loaded = None
+    return rows
+
+def _load(path: str) -> Tuple[ImageSource, str, DecodedImage, float]:
+    """Open, hash and decode a file at the resolutions the engine needs"""
+    start_time = time.perf_counter()
+    fileobj = open(path, 'rb')
+    source: Optional[ImageSource] = None
+    try:
+        if os.fstat(fileobj.fileno()).st_size == 0:
+            # Empty files cannot be memory-mapped
+            fileobj.close()
+            source = BytesSource(b'')
+        else:
+            # Mapping fails on some special files; the file is then closed below
+            source = _FileSource(fileobj)
+        digest = source.sha256()
+        decoded = decode_for_analysis(source, _engine.resolution_policy, _engine.pixel_analyzers,
+                                      frame_policy=_engine.frame_policy)
+    except BaseException:
+        if source is not None:
+            source.close()
+        fileobj.close()
+        raise
+    return source, digest, decoded, (time.perf_counter() - start_time) * 1000
+
+def _analyze(path: str, loaded: Future) -> Dict[str, Any]:
+    row: Dict[str, Any] = {'path': path, 'engine_fingerprint': _fingerprint, 'scanned_at': time.time()}
+    try:
+        size = os.path.getsize(path)
+        row['size_bytes'] = size
+        source, digest, decoded, decode_ms = loaded.result()
+    except Exception as e:
+        row['error'] = f"{type(e).__name__}: {e}"
+        return row
+
+    with source:
+        row.update(sha256=digest, format=decoded.format, frame_count=decoded.frame_count,
+                   width=decoded.original_size[0], height=decoded.original_size[1],
+                   decode_ms=round(decode_ms, 2))
+        start_time = time.perf_counter()
+        try:
+            result = _loop.run_until_complete(_run_engine(source, decoded))
+        except Exception as e:
+            row['error'] = f"{type(e).__name__}: {e}"
+            return row
+        row['analysis_ms'] = round((time.perf_counter() - start_time) * 1000, 2)
+
+    row.update(final_score=float(result['final_score']), risk_level=result['risk_level'],
+               is_potentially_edited=int(result['is_potentially_edited']),
+               analyzers_run=','.join(result['analyzers_run']))
+    for name, score in result['individual_scores'].items():
+        row[f"score_{name}"] = float(score)
+    return row
+
+async def _run_engine(source: ImageSource, decoded: DecodedImage) -> Dict[str, Any]:
+    """Same dispatch as the service: sampled frames for animations, one pass for stills"""
+    if decoded.frame_count > 1:
+        frames = iter_sampled_frames(source, _engine.frame_policy, _engine.resolution_policy,
+                                     _engine.pixel_analyzers)
+        return await analyze_frames(_engine, frames, decoded.exif_data, decoded.original_size,
+                                    decoded.frame_count)
+    return await _engine.analyze_image(decoded.full, decoded.exif_data,
+                                       reduced_image=decoded.reduced,
+                                       original_size=decoded.original_size,
+                                       quantization=decoded.quantization,
+                                       signature=decoded.signature)
+
+class _FileSource(MappedFileSource):
+    """Mapped source that owns its file"""
+
+    def __init__(self, fileobj):
+        super().__init__(fileobj)
+        self._fileobj = fileobj
+
+    def close(self):
+        super().close()
+        self._fileobj.close()
+
+class SQLiteOutput:
+    """Rows in the `results` table of a SQLite database, keyed by path
+
+    Each batch is one transaction, so a scan killed mid-write loses at most
+    the rows not committed yet; committed rows are the checkpoint. Engine
+    versions are kept in the `engines` table, by fingerprint.
+    """
+
+    def __init__(self, path: str, analyzers: List[str], versions: Dict[str, str]):
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._columns = [name for name, _ in COLUMNS] + [f"score_{name}" for name in analyzers]
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                + ", ".join(f"{name} {kind}" for name, kind in COLUMNS)
+                + ", PRIMARY KEY (path))"
+            )
+            existing = {row[1] for row in self._db.execute("PRAGMA table_info(results)")}
+            # Resumed scans may run more analyzers than the first run did
+            for column in self._columns:
+                if column not in existing:
+                    self._db.execute(f"ALTER TABLE results ADD COLUMN {column} REAL")
+            self._db.execute("CREATE INDEX IF NOT EXISTS results_sha256 ON results (sha256)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS results_risk ON results (risk_level, final_score)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS engines (fingerprint TEXT PRIMARY KEY, versions TEXT)")
+            self._db.execute("INSERT OR IGNORE INTO engines VALUES (?, ?)",
+                             (engine_fingerprint(versions), json.dumps(versions, sort_keys=True)))
+
+    def done(self, retry_errors: bool = False) -> Set[str]:
+        """Paths already recorded (those that failed are left out with `retry_errors`)"""
+        query = "SELECT path FROM results" + (" WHERE error IS NULL" if retry_errors else "")
+        return {path for (path,) in self._db.execute(query)}
+
+    def write(self, rows: List[Dict[str, Any]]):
+        placeholders = ", ".join("?" for _ in self._columns)
+        with self._db:
+            self._db.executemany(
+                f"INSERT OR REPLACE INTO results ({', '.join(self._columns)}) VALUES ({placeholders})",
+                [tuple(row.get(column) for column in self._columns) for row in rows]
+            )
+
+    def close(self):
+        self._db.close()
+
+class ParquetOutput:
+    """Part files in a directory, one per batch
+
+    Parts are written to a temporary name and renamed once complete, so the
+    finished parts are the checkpoint. When failed files are retried, their
+    new rows land in a later part: for a path, the row in the highest
+    numbered part wins. Engine versions are in every part's schema metadata.
+    Needs the `pyarrow` package.
+    """
+
+    def __init__(self, directory: str, analyzers: List[str], versions: Dict[str, str]):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self._pa, self._pq = pa, pq
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+        types = {'TEXT': pa.string(), 'INTEGER': pa.int64(), 'REAL': pa.float64()}
+        fields = [pa.field(name, types[kind]) for name, kind in COLUMNS]
+        fields += [pa.field(f"score_{name}", pa.float64()) for name in analyzers]
+        self._schema = pa.schema(fields, metadata={'engine_versions': json.dumps(versions, sort_keys=True)})
+        self._next_part = len(self._parts())
+
+    def done(self, retry_errors: bool = False) -> Set[str]:
+        """Paths already recorded (those that failed are left out with `retry_errors`)"""
+        latest: Dict[str, bool] = {}
+        for part in self._parts():
+            table = self._pq.read_table(part, columns=['path', 'error'])
+            for path, error in zip(table.column('path').to_pylist(), table.column('error').to_pylist()):
+                latest[path] = error is None
+        return {path for path, succeeded in latest.items() if succeeded or not retry_errors}
+
+    def write(self, rows: List[Dict[str, Any]]):
+        table = self._pa.Table.from_pylist(
+            [{field.name: row.get(field.name) for field in self._schema} for row in rows],
+            schema=self._schema
+        )
+        path = os.path.join(self.directory, f"part-{self._next_part:06d}.parquet")
+        temp_path = os.path.join(self.directory, f".part-{self._next_part:06d}.parquet.tmp")
+        self._pq.write_table(table, temp_path)
+        os.replace(temp_path, path)
+        self._next_part += 1
+
+    def close(self):
+        pass
+
+    def _parts(self) -> List[str]:
+        return sorted(
+            os.path.join(self.directory, name) for name in os.listdir(self.directory)
+            if name.startswith('part-') and name.endswith('.parquet')
+        )
+
+def open_output(path: str, output_format: Optional[str], analyzers: List[str],
+                versions: Dict[str, str]):
+    """SQLite or Parquet output; the format follows the extension unless given"""
+    if output_format is None:
+        output_format = 'parquet' if path.endswith('.parquet') else 'sqlite'
+    if output_format == 'parquet':
+        return ParquetOutput(path, analyzers, versions)
+    return SQLiteOutput(path, analyzers, versions)
+
+def _chunks(paths: Iterable[str], size: int) -> Iterator[List[str]]:
+    chunk = []
+    for path in paths:
+        chunk.append(path)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+class _Progress:
+    """Running totals, printed to stderr at most every `interval` seconds"""
+
+    def __init__(self, skipped: int, interval: float = 10.0):
+        self.skipped = skipped
+        self.interval = interval
+        self.scanned = 0
+        self.errors = 0
+        self.flagged = 0
+        self._start = time.perf_counter()
+        self._last_report = self._start
+
+    def add(self, rows: List[Dict[str, Any]]):
+        self.scanned += len(rows)
+        self.errors += sum(1 for row in rows if row.get('error'))
+        self.flagged += sum(1 for row in rows if row.get('is_potentially_edited'))
+        if time.perf_counter() - self._last_report >= self.interval:
+            self.report()
+
+    def report(self, final: bool = False):
+        self._last_report = time.perf_counter()
+        elapsed = self._last_report - self._start
+        rate = self.scanned / elapsed if elapsed > 0 else 0.0
+        print(f"{'done' if final else 'progress'}: {self.scanned} scanned ({rate:.1f}/s), "
+              f"{self.flagged} potentially edited, {self.errors} errors, "
+              f"{self.skipped} already done, {elapsed:.0f}s", file=sys.stderr)
+
+def scan(paths: Iterable[str], output, workers: int, files_per_task: int = 8,
+         commit_rows: int = 1000, commit_seconds: float = 30.0, early_exit: bool = True,
+         retry_errors: bool = False) -> _Progress:
+    """Analyze every path not recorded in `output` yet, writing rows in batches
+
+    At most two tasks per worker are outstanding, so each worker always has
+    its next files queued while paths are still listed lazily: a scan of
+    millions of files never holds the whole list. Results are committed
+    every `commit_rows` rows or `commit_seconds`, whichever comes first. On
+    Ctrl-C (or a failure), finished rows are committed before exiting;
+    files still in flight are scanned again on the next run.
+    """
+    done = output.done(retry_errors)
+    progress = _Progress(skipped=0)
+
+    def remaining() -> Iterator[str]:
+        for path in paths:
+            if path in done:
+                progress.skipped += 1
+            else:
+                yield path
+
+    buffered: List[Dict[str, Any]] = []
+    last_commit = time.perf_counter()
+
+    def collect(finished: Set[Future], force: bool = False):
+        nonlocal last_commit
+        for future in finished:
+            rows = future.result()
+            buffered.extend(rows)
+            progress.add(rows)
+        if buffered and (force or len(buffered) >= commit_rows
+                         or time.perf_counter() - last_commit >= commit_seconds):
+            output.write(buffered)
+            buffered.clear()
+            last_commit = time.perf_counter()
+
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn'),
+                               initializer=_init_worker, initargs=(early_exit,))
+    in_flight: Set[Future] = set()
+    try:
+        for chunk in _chunks(remaining(), files_per_task):
+            in_flight.add(pool.submit(scan_files, chunk))
+            if len(in_flight) >= workers * 2:
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(finished)
+        while in_flight:
+            finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            collect(finished)
+        collect(set(), force=True)
+    except BaseException:
+        # Keep what finished; everything else is scanned again on the next run
+        collect({future for future in in_flight
+                 if future.done() and not future.cancelled() and future.exception() is None}, force=True)
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    pool.shutdown()
+    return progress
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('roots', nargs='*', help='directories (walked recursively) or image files')
+    parser.add_argument('--file-list', help="file with one image path per line ('-' for stdin)")
+    parser.add_argument('--output', required=True,
+                        help='SQLite database, or a directory of Parquet parts when it ends in .parquet')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, help='output format (default: from --output)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='analysis processes')
+    parser.add_argument('--files-per-task', type=int, default=8,
+                        help='files handed to a worker at once (decoded one ahead of the analysis)')
+    parser.add_argument('--commit-rows', type=int, default=1000, help='rows per write batch')
+    parser.add_argument('--commit-seconds', type=float, default=30.0,
+                        help='longest time results wait to be written')
+    parser.add_argument('--extensions', default=','.join(IMAGE_EXTENSIONS),
+                        help='comma-separated file extensions picked up in directories')
+    parser.add_argument('--no-early-exit', action='store_true',
+                        help='run every analyzer even once the verdict is settled')
+    parser.add_argument('--retry-errors', action='store_true', help='scan files that failed before again')
+    args = parser.parse_args()
+    if not args.roots and not args.file_list:
+        parser.error('give directories or files to scan, or --file-list')
+
+    early_exit = not args.no_early_exit
+    engine = build_engine(early_exit)
+    try:
+        output = open_output(args.output, args.format, list(engine.analyzers), engine.versions)
+    except ImportError:
+        parser.error("Parquet output needs the pyarrow package (pip install pyarrow)")
+    extensions = tuple(ext.strip().lower() for ext in args.extensions.split(',') if ext.strip())
+    try:
+        progress = scan(iter_paths(args.roots, args.file_list, extensions), output,
+                        workers=max(1, args.workers), files_per_task=max(1, args.files_per_task),
+                        commit_rows=max(1, args.commit_rows), commit_seconds=args.commit_seconds,
+                        early_exit=early_exit, retry_errors=args.retry_errors)
+    except KeyboardInterrupt:
+        print("interrupted: finished rows are saved, rerun the same command to resume", file=sys.stderr)
+        sys.exit(130)
+    finally:
+        output.close()
+    progress.report(final=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+# services/verification/src/cost_model.py
+from typing import Dict, Optional
+
+# Milliseconds per megapixel measured on a single core; recompression is per quality
+DEFAULT_MS_PER_MEGAPIXEL = {
+    'metadata_consistency': 0.0,
+    'noise_pattern': 20.0,
+    'jpeg_quality': 20.0,
+    'jpeg_quality_tables': 12.0,
+    'enhanced_ela': 20.0,
+    'recompression': 17.0
+}
+
+# Smaller images are dominated by fixed per-call overhead, so their timings say little about the rate
+MIN_OBSERVED_MEGAPIXELS = 0.1
+
+# One observation moves the estimate towards at most this multiple (or fraction) of it
+MAX_OBSERVATION_RATIO = 4.0
+
+class CostModel:
+    """Running estimate of analysis stage costs
+
+    Starts from DEFAULT_MS_PER_MEGAPIXEL and follows observed timings with an
+    exponential moving average, so estimates adapt to the host and its load.
+    Images below MIN_OBSERVED_MEGAPIXELS are not observed, and each observed
+    rate is clamped to within MAX_OBSERVATION_RATIO of the estimate, so one
+    outlier (a tiny image, a stall) can't make later budgets skip analyzers.
+    """
+
+    def __init__(self, smoothing: float = 0.2,
+                 ms_per_megapixel: Optional[Dict[str, float]] = None):
+        self.smoothing = smoothing
+        self.ms_per_megapixel = dict(DEFAULT_MS_PER_MEGAPIXEL)
+        self.ms_per_megapixel.update(ms_per_megapixel or {})
+
+    def estimate(self, stage: str, megapixels: float) -> float:
+        """Expected milliseconds for `stage` on an image of `megapixels`"""
+        return self.ms_per_megapixel.get(stage, 0.0) * megapixels
+
+    def observe(self, stage: str, megapixels: float, elapsed_ms: float):
+        """Fold one measured run into the estimate"""
+        if megapixels < MIN_OBSERVED_MEGAPIXELS:
+            return
+        rate = elapsed_ms / megapixels
+        previous = self.ms_per_megapixel.get(stage)
+        if previous is None:
+            self.ms_per_megapixel[stage] = rate
+        else:
+            if previous > 0:
+                rate = min(max(rate, previous / MAX_OBSERVATION_RATIO), previous * MAX_OBSERVATION_RATIO)
+            self.ms_per_megapixel[stage] = previous + self.smoothing * (rate - previous)
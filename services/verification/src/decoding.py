@@ -0,0 +1,189 @@
+# services/verification/src/decoding.py
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+from PIL import Image
+from ingest import ImageSource
+from algorithms.jpeg_signatures import JpegSignature, read_signature
+
+@dataclass
+class ResolutionPolicy:
+    """Which analyzers may run on a reduced-resolution decode
+
+    Analyzers listed in `reduced_analyzers` get an image of at most
+    `max_megapixels`, produced with libjpeg DCT scaling (PIL `draft`) for
+    JPEGs and box reduction for other formats. Everything else keeps the
+    full resolution: ELA and JPEG quality analysis measure artifacts on the
+    original 8x8 compression grid, which scaling destroys.
+    """
+    max_megapixels: float = 16.0
+    reduced_analyzers: Tuple[str, ...] = ('noise_pattern',)
+
+    def scale_for(self, size: Tuple[int, int]) -> int:
+        """Power-of-two downscale factor needed to fit `size` within max_megapixels
+
+        Powers of two map directly onto libjpeg's 1/2, 1/4 and 1/8 DCT scaling.
+        """
+        megapixels = size[0] * size[1] / 1e6
+        if self.max_megapixels <= 0 or megapixels <= self.max_megapixels:
+            return 1
+        return 2 ** math.ceil(math.log(megapixels / self.max_megapixels, 4))
+
+    def uses_reduced(self, algo_name: str) -> bool:
+        return algo_name in self.reduced_analyzers
+
+    def needs_full(self, pixel_analyzers: Iterable[str], size: Tuple[int, int]) -> bool:
+        """Whether any pixel analyzer still needs the full-resolution decode"""
+        if self.scale_for(size) == 1:
+            return True
+        return any(not self.uses_reduced(name) for name in pixel_analyzers)
+
+@dataclass
+class FrameSamplingPolicy:
+    """Which frames of animated and multi-page images are analyzed
+
+    Frame 0 is always analyzed, then every `every_nth` frame and every frame
+    whose content jumps from the one before (mean absolute difference of
+    32x32 grayscale thumbnails above `scene_change` gray levels; 0 disables
+    the test), until `max_frames` have been analyzed. A `max_frames` of 1
+    analyzes the first frame only, like a still image. MPO files are left
+    out: their extra frames are camera previews, not content.
+    """
+    every_nth: int = 10
+    scene_change: float = 20.0
+    max_frames: int = 16
+
+    def streams(self, image: Image.Image) -> bool:
+        """Whether `image` (opened, not decoded) is analyzed frame by frame"""
+        return self.max_frames > 1 and image.format != "MPO" and getattr(image, "n_frames", 1) > 1
+
+    @property
+    def key(self) -> str:
+        return f"{self.every_nth}:{self.scene_change}:{self.max_frames}"
+
+@dataclass
+class DecodedImage:
+    """Decoded upload with the resolutions requested by the policy"""
+    original_size: Tuple[int, int]
+    format: Optional[str]
+    exif_data: Dict[str, str] = field(default_factory=dict)
+    full: Optional[Image.Image] = None
+    reduced: Optional[Image.Image] = None
+    # JPEG quantization tables by slot (0 = luminance), for DCT-domain analysis
+    quantization: Optional[Dict[int, List[int]]] = None
+    # Encoder fingerprint (tables, sampling, Huffman coding) of JPEG uploads
+    signature: Optional[JpegSignature] = None
+    # Frames of an animated or multi-page image left undecoded for frame-by-frame analysis
+    frame_count: int = 1
+    timings_ms: Dict[str, float] = field(default_factory=dict)
+
+def decode_for_analysis(source: ImageSource, policy: ResolutionPolicy,
+                        pixel_analyzers: Iterable[str],
+                        exif_data: Optional[Dict[str, str]] = None,
+                        frame_policy: Optional[FrameSamplingPolicy] = None) -> DecodedImage:
+    """Decode an upload at the resolutions the analyzers need
+
+    The full-resolution decode is skipped entirely when every pixel analyzer
+    accepts the reduced image. Decoders read straight from the source (a
+    memory map for spooled uploads) instead of a private copy of the bytes.
+    EXIF tags already parsed elsewhere (`exif_data`) are not parsed again.
+    Images that `frame_policy` streams get no pixel decode here; their
+    frames are decoded one at a time during analysis.
+    """
+    pixel_analyzers = list(pixel_analyzers)
+    with source.open() as fp:
+        # Marker segments only; returns None straight away for other formats
+        start_time = time.perf_counter()
+        signature = read_signature(fp)
+        fp.seek(0)
+        signature_ms = _elapsed_ms(start_time)
+
+        start_time = time.perf_counter()
+        header = Image.open(fp)
+        decoded = DecodedImage(original_size=header.size, format=header.format, signature=signature)
+        decoded.timings_ms['decode_header'] = _elapsed_ms(start_time)
+        decoded.timings_ms['signature'] = signature_ms
+
+        if exif_data is not None:
+            decoded.exif_data = exif_data
+        else:
+            start_time = time.perf_counter()
+            decoded.exif_data = extract_exif(header)
+            decoded.timings_ms['exif'] = _elapsed_ms(start_time)
+        decoded.quantization = read_quantization(header)
+
+        if frame_policy is not None and frame_policy.streams(header):
+            decoded.frame_count = header.n_frames
+            return decoded
+
+        scale = policy.scale_for(header.size)
+        if scale > 1 and any(policy.uses_reduced(name) for name in pixel_analyzers):
+            start_time = time.perf_counter()
+            decoded.reduced = _decode_reduced(source, header.size, scale)
+            decoded.timings_ms['decode_reduced'] = _elapsed_ms(start_time)
+
+        if policy.needs_full(pixel_analyzers, header.size):
+            start_time = time.perf_counter()
+            decoded.full = header.convert("RGB")
+            decoded.timings_ms['decode_full'] = _elapsed_ms(start_time)
+
+    return decoded
+
+def read_size(source: ImageSource) -> Optional[Tuple[int, int]]:
+    """(width, height) from the image header, without decoding any pixels
+
+    None when the header can't be read; the decode reports the error.
+    """
+    try:
+        with source.open() as fp:
+            return Image.open(fp).size
+    except Exception:
+        return None
+
+def extract_exif(image: Image.Image) -> Dict[str, str]:
+    """EXIF tags by name, read from the file before any conversion"""
+    exif_data = {}
+    try:
+        exif_dict = image._getexif()
+        if exif_dict:
+            from PIL.ExifTags import TAGS
+            for tag_id, value in exif_dict.items():
+                tag = TAGS.get(tag_id, tag_id)
+                exif_data[str(tag)] = str(value)
+    except:
+        exif_data = {}
+    return exif_data
+
+def read_quantization(image: Image.Image) -> Optional[Dict[int, List[int]]]:
+    """Quantization tables of a JPEG, or None when DCT analysis can't use them
+
+    Only grayscale and YCbCr files qualify: their luma is recoverable from
+    the RGB decode. CMYK and YCCK JPEGs are left to the pixel analyzers.
+    MPO files (many camera JPEGs) are read from their first frame.
+    """
+    if image.format not in ("JPEG", "MPO") or image.mode not in ("L", "RGB"):
+        return None
+    quantization = getattr(image, "quantization", None)
+    if not quantization or 0 not in quantization:
+        return None
+    return {slot: list(table) for slot, table in quantization.items()}
+
+def _decode_reduced(source: ImageSource, size: Tuple[int, int], scale: int) -> Image.Image:
+    """Downscaled decode, using DCT scaling when the codec supports it"""
+    target = (max(1, size[0] // scale), max(1, size[1] // scale))
+    with source.open() as fp:
+        image = Image.open(fp)
+
+        # JPEG: libjpeg decodes straight to 1/2, 1/4 or 1/8 scale (no-op elsewhere)
+        image.draft("RGB", target)
+        image = image.convert("RGB")
+
+    remaining = min(image.size[0] // target[0], image.size[1] // target[1])
+    if remaining > 1:
+        # Formats without DCT scaling, or beyond libjpeg's 1/8 limit
+        image = image.reduce(remaining)
+    return image
+
+def _elapsed_ms(start_time: float) -> float:
+    return round((time.perf_counter() - start_time) * 1000, 2)
@@ -0,0 +1,162 @@
+# services/verification/src/executor.py
+import asyncio
+import dataclasses
+import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import partial
+from multiprocessing import get_context, shared_memory
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+
+EXECUTOR_MODES = ('inline', 'thread', 'process')
+
+@dataclass(frozen=True)
+class SharedArray:
+    """Picklable handle to an ndarray living in a shared memory segment"""
+    name: str
+    shape: Tuple[int, ...]
+    dtype: str
+
+class AnalysisExecutor:
+    """Runs analyzer work off the event loop
+
+    Modes:
+    - inline: call directly on the event loop (previous behaviour)
+    - thread: run in a thread pool; numpy and PIL release the GIL for most work
+    - process: run in a process pool; arrays are handed over via shared memory
+    """
+
+    def __init__(self, mode: str = 'thread', max_workers: Optional[int] = None):
+        if mode not in EXECUTOR_MODES:
+            raise ValueError(f"Unknown executor mode '{mode}', expected one of {EXECUTOR_MODES}")
+
+        self.mode = mode
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._threads = None
+        self._processes = None
+
+        if mode in ('thread', 'process'):
+            self._threads = ThreadPoolExecutor(max_workers=self.max_workers,
+                                               thread_name_prefix='analysis')
+        if mode == 'process':
+            # spawn avoids forking a process that already runs the event loop's threads
+            self._processes = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                  mp_context=get_context('spawn'))
+
+    async def run(self, func: Callable, *args, releases_gil: bool = False) -> Any:
+        """Run `func(*args)` according to the executor mode
+
+        `releases_gil` marks work that spends its time in GIL-free C code
+        (PIL codecs); it stays on threads in process mode so its outputs
+        don't have to travel back through shared memory.
+        """
+        if self.mode == 'inline':
+            return func(*args)
+
+        loop = asyncio.get_running_loop()
+        if self.mode == 'thread' or releases_gil:
+            return await loop.run_in_executor(self._threads, partial(func, *args))
+
+        return await loop.run_in_executor(self._processes, partial(_call_with_shared, func, args))
+
+    @contextmanager
+    def shared(self, *values):
+        """Expose values to the workers for the duration of the block
+
+        In process mode every ndarray (including those nested in dataclasses,
+        dicts, lists and tuples) is copied once into shared memory and replaced
+        by a SharedArray handle; an array reachable several times (one
+        context shared by several analyzers) gets a single segment. The
+        segments are released on exit. Other modes yield the values unchanged.
+        """
+        if self.mode != 'process':
+            yield values
+            return
+
+        segments: List[shared_memory.SharedMemory] = []
+        exported: Dict[int, SharedArray] = {}
+        try:
+            yield tuple(_export(value, segments, exported) for value in values)
+        finally:
+            for segment in segments:
+                segment.close()
+                segment.unlink()
+
+    async def warm_up(self, func: Callable, *args):
+        """Start the process workers now, each running `func(*args)` (e.g. imports)
+
+        Workers otherwise start, and import everything from scratch, on the
+        first request that needs them. No-op in the other modes, whose
+        threads share the parent's modules.
+        """
+        if self.mode != 'process':
+            return
+        loop = asyncio.get_running_loop()
+        # Imports keep every worker busy long enough for each to take one call
+        await asyncio.gather(*(loop.run_in_executor(self._processes, partial(func, *args))
+                               for _ in range(self.max_workers)))
+
+    def shutdown(self):
+        """Release worker pools"""
+        if self._processes is not None:
+            self._processes.shutdown(wait=True)
+        if self._threads is not None:
+            self._threads.shutdown(wait=True)
+
+def _export(value: Any, segments: List[shared_memory.SharedMemory],
+            exported: Dict[int, SharedArray]) -> Any:
+    """Replace ndarrays in `value` with shared memory handles
+
+    `exported` maps the id of every array already copied to its handle.
+    """
+    if isinstance(value, np.ndarray):
+        if id(value) not in exported:
+            segment = shared_memory.SharedMemory(create=True, size=max(value.nbytes, 1))
+            segments.append(segment)
+            np.ndarray(value.shape, dtype=value.dtype, buffer=segment.buf)[...] = value
+            exported[id(value)] = SharedArray(segment.name, value.shape, value.dtype.str)
+        return exported[id(value)]
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        changes = {f.name: _export(getattr(value, f.name), segments, exported)
+                   for f in dataclasses.fields(value) if f.init}
+        return dataclasses.replace(value, **changes)
+    if isinstance(value, dict):
+        return {k: _export(v, segments, exported) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(_export(v, segments, exported) for v in value)
+    return value
+
+def _import(value: Any, segments: List[shared_memory.SharedMemory]) -> Any:
+    """Inverse of _export, run inside the worker process"""
+    if isinstance(value, SharedArray):
+        # The parent owns the segment and unlinks it once the call completes
+        segment = shared_memory.SharedMemory(name=value.name)
+        segments.append(segment)
+        return np.ndarray(value.shape, dtype=np.dtype(value.dtype), buffer=segment.buf)
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        changes = {f.name: _import(getattr(value, f.name), segments)
+                   for f in dataclasses.fields(value) if f.init}
+        return dataclasses.replace(value, **changes)
+    if isinstance(value, dict):
+        return {k: _import(v, segments) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(_import(v, segments) for v in value)
+    return value
+
+def _call_with_shared(func: Callable, args: tuple) -> Any:
+    """Worker entry point: attach shared arrays, call, detach"""
+    segments: List[shared_memory.SharedMemory] = []
+    try:
+        attached = _import(args, segments)
+        result = func(*attached)
+        del attached
+        return result
+    finally:
+        for segment in segments:
+            try:
+                segment.close()
+            except BufferError:
+                # A view escaped into the result; the OS reclaims it at exit
+                pass
@@ -1,55 +1,207 @@
 # services/verification/src/forensics_engine.py
-from typing import Dict, Any, List
+import asyncio
+import copy
+import importlib
+import time
+from typing import Dict, Any, List, Optional, Tuple
 import numpy as np
 from PIL import Image
 
-# Import algorithm modules
-from algorithms.ela_analysis import ELAAnalyzer
-from algorithms.metadata_analysis import MetadataAnalyzer
-from algorithms.noise_analysis import NoisePatternAnalyzer
-from algorithms.jpeg_analysis import JPEGQualityAnalyzer
+# Analyzer modules are imported by the registry on first use
+from algorithms.registry import AnalyzerRegistry
+from algorithms.context import AnalysisContext
+from algorithms.jpeg_signatures import JpegSignature, default_index
+from algorithms.recompression import RecompressionResult, RecompressionStage
+from allocation_tracker import AllocationTracker
+from cost_model import CostModel
+from executor import AnalysisExecutor
+from decoding import FrameSamplingPolicy, ResolutionPolicy
+from tiling import TilingPolicy, iter_tiles
+
+# Smallest edge a budget downscale may produce; below it noise blocks lose meaning
+MIN_BUDGET_SIDE = 256
+
+# With early exit or a budget, analyzers costing at most this multiple of a stage's cheapest join it
+SIMILAR_COST_RATIO = 2.0
 
 class AdvancedForensicsEngine:
     """Modular Image Forensics Engine"""
     
-    def __init__(self):
-        # Initialize each algorithm as independent objects
-        self.analyzers = {
-            'enhanced_ela': ELAAnalyzer(),
-            'metadata_consistency': MetadataAnalyzer(),
-            'noise_pattern': NoisePatternAnalyzer(),
-            'jpeg_quality': JPEGQualityAnalyzer()
-        }
+    def __init__(self, executor: Optional[AnalysisExecutor] = None,
+                 resolution_policy: Optional[ResolutionPolicy] = None,
+                 tiling_policy: Optional[TilingPolicy] = None,
+                 early_exit: bool = True,
+                 cost_model: Optional[CostModel] = None,
+                 recompression_stage: Optional[RecompressionStage] = None,
+                 frame_policy: Optional[FrameSamplingPolicy] = None,
+                 analyzers: Optional[AnalyzerRegistry] = None,
+                 allocation_tracker: Optional[AllocationTracker] = None):
+        # Bump when weighting or risk thresholds change
+        self.version = "1.3"
         
-        # Set weights for algorithms
-        self.weights = {
-            'enhanced_ela': 0.35,
-            'metadata_consistency': 0.25,
-            'noise_pattern': 0.20,
-            'jpeg_quality': 0.20
-        }
+        # Analyzers by name; each is imported and built on first use (or by warm_up)
+        self.analyzers = analyzers if analyzers is not None else AnalyzerRegistry()
+        
+        # Shared stage: every quality is encoded once and reused by all analyzers
+        self.recompression_stage = recompression_stage or RecompressionStage()
+        
+        # Where analyzer work runs; inline keeps everything on the caller's thread
+        self.executor = executor or AnalysisExecutor('inline')
+        
+        # Which analyzers may run on a downscaled decode of oversized images
+        self.resolution_policy = resolution_policy or ResolutionPolicy()
+        
+        # When full-resolution analyzers switch to bounded-memory tiles
+        self.tiling_policy = tiling_policy or TilingPolicy()
+        
+        # Which frames of animated and multi-page images are analyzed
+        self.frame_policy = frame_policy or FrameSamplingPolicy()
+        
+        # Stop once the remaining analyzers can no longer change the verdict
+        self.early_exit = early_exit
+        
+        # Orders analyzers by cost and sizes work to latency budgets
+        self.cost_model = cost_model or CostModel()
+        
+        # Set weights for algorithms, as registered with them
+        self.weights = {name: self.analyzers.spec(name).weight for name in self.analyzers}
+        
+        # Reports each analysis's peak allocation when set (tracing has a cost)
+        self.allocation_tracker = allocation_tracker
     
-    async def analyze_image(self, image: Image.Image, exif_data: Dict) -> Dict[str, Any]:
-        """Comprehensive image analysis"""
-        image_array = np.array(image)
+    async def warm_up(self) -> Dict[str, Any]:
+        """Do the one-off work of the first request ahead of time
+        
+        Imports and builds every analyzer, starts process workers (each
+        importing the analyzers), loads the JPEG signature index and runs one
+        small synthetic analysis through every analyzer, so first requests
+        don't pay for imports, pool start-up or lazily built tables. Returns
+        per-step timings in milliseconds.
+        """
+        timings: Dict[str, Any] = {}
+        timings['analyzers'] = await asyncio.to_thread(self.analyzers.load_all)
+        
+        step_time = time.perf_counter()
+        await self.executor.warm_up(_import_analyzers,
+                                    [self.analyzers.spec(name).target for name in self.analyzers])
+        timings['executor'] = round((time.perf_counter() - step_time) * 1000, 2)
+        
+        step_time = time.perf_counter()
+        await asyncio.to_thread(default_index)
+        timings['signature_index'] = round((time.perf_counter() - step_time) * 1000, 2)
+        
+        step_time = time.perf_counter()
+        # A copy that runs every analyzer and keeps the live cost model out of it
+        probe = copy.copy(self)
+        probe.early_exit = False
+        probe.cost_model = copy.deepcopy(self.cost_model)
+        # Noise blocks need a few hundred pixels per side
+        gradient = np.linspace(0, 255, 512 * 512 * 3).reshape(512, 512, 3).astype(np.uint8)
+        await probe.analyze_image(Image.fromarray(gradient), {})
+        timings['synthetic_analysis'] = round((time.perf_counter() - step_time) * 1000, 2)
+        return timings
+    
+    async def analyze_image(self, image: Optional[Image.Image], exif_data: Dict,
+                            reduced_image: Optional[Image.Image] = None,
+                            original_size: Optional[Tuple[int, int]] = None,
+                            budget_ms: Optional[float] = None,
+                            quantization: Optional[Dict[int, List[int]]] = None,
+                            signature: Optional[JpegSignature] = None) -> Dict[str, Any]:
+        """Comprehensive image analysis
+        
+        `reduced_image` is an optional downscaled decode used by the analyzers
+        the resolution policy allows; `image` (full resolution) may be None
+        when none of them need it. `original_size` is the (width, height) of
+        the source file for metadata checks. `quantization` holds the
+        source JPEG's quantization tables; analyzers that can read them work
+        on the full-resolution decode without recompressing it. `signature`
+        is the source JPEG's encoder signature for the metadata checks.
+        
+        Analyzers run cheapest first. With early exit enabled, the rest are
+        skipped once they can no longer change the risk level or the edited
+        verdict. With `budget_ms`, pixel analyzers whose estimated cost
+        exceeds the time left are downsampled (where the resolution policy
+        allows it) or skipped. Skipped analyzers are reported with the reason.
+        
+        Every analyzer gets the AnalysisContext of its resolution, so views
+        such as the grayscale image are computed once per request. With an
+        allocation tracker, `peak_allocation` reports the bytes allocated at
+        most during the analysis.
+        """
+        if self.allocation_tracker is None:
+            return await self._analyze_image(image, exif_data, reduced_image, original_size,
+                                             budget_ms, quantization, signature)
+        with self.allocation_tracker.track() as peak_allocation:
+            result = await self._analyze_image(image, exif_data, reduced_image, original_size,
+                                               budget_ms, quantization, signature)
+        result['peak_allocation'] = peak_allocation
+        return result
+    
+    async def _analyze_image(self, image: Optional[Image.Image], exif_data: Dict,
+                             reduced_image: Optional[Image.Image],
+                             original_size: Optional[Tuple[int, int]],
+                             budget_ms: Optional[float],
+                             quantization: Optional[Dict[int, List[int]]],
+                             signature: Optional[JpegSignature]) -> Dict[str, Any]:
+        start_time = time.perf_counter()
+        images = {'full': image, 'reduced': reduced_image}
+        sizes = {resolution: img.size if img is not None else None for resolution, img in images.items()}
+        if original_size is None:
+            original_size = sizes['full'] or sizes['reduced']
         results = {}
+        skipped = {}
         
-        # Execute each algorithm
-        for algo_name, analyzer in self.analyzers.items():
-            try:
-                if algo_name == 'metadata_consistency':
-                    result = analyzer.analyze(exif_data, image_array)
-                else:
-                    result = analyzer.analyze(image_array)
-                
-                results[algo_name] = result
-            except Exception as e:
-                results[algo_name] = {
-                    "score": 0.0,
-                    "success": False,
-                    "error": str(e),
-                    "algorithm": analyzer.name
-                }
+        # Pick the decode each analyzer runs on
+        resolutions = {name: self._resolution_for(name, sizes) for name in self.analyzers}
+        
+        # Very large full-resolution decodes are consumed tile by tile
+        tiled = []
+        if sizes['full'] and self.tiling_policy.applies(sizes['full']):
+            tiled = [name for name in self.pixel_analyzers
+                     if resolutions[name] == 'full' and hasattr(self.analyzers[name], 'add_tile')]
+        
+        # Analysis contexts and recompressions are built per resolution as stages need them
+        contexts = {}
+        recompressions = {}
+        timings = {}
+        tile_grid = None
+        
+        stages = self._analysis_stages(resolutions, sizes, tiled, quantization,
+                                       sequential=self.early_exit or budget_ms is not None)
+        for index, stage in enumerate(stages):
+            pending = [name for later in stages[index:] for name in later]
+            if self.early_exit:
+                low, high = self._score_bounds(results, pending)
+                if self._decision(low) == self._decision(high):
+                    for name in pending:
+                        skipped[name] = {
+                            'reason': 'early_exit',
+                            'detail': f"final score is within [{low:.3f}, {high:.3f}], "
+                                      f"risk level {self._determine_risk_level(low)} either way"
+                        }
+                    break
+            
+            if budget_ms is not None:
+                left_ms = budget_ms - (time.perf_counter() - start_time) * 1000
+                stage = self._fit_budget(stage, left_ms, resolutions, images, sizes,
+                                         recompressions, tiled, skipped, quantization)
+                if not stage:
+                    continue
+            
+            if stage[0] in tiled:
+                tiles_start = time.perf_counter()
+                stage_results, tile_grid = await self._analyze_tiles(image, stage, quantization)
+                timings['tiles'] = round((time.perf_counter() - tiles_start) * 1000, 2)
+            else:
+                stage_results = await self._run_stage(stage, resolutions, images, contexts,
+                                                      recompressions, exif_data, original_size,
+                                                      timings, quantization, signature)
+            results.update(stage_results)
+            # Views serve the analyzers of one stage; later stages have their own peaks
+            for context in contexts.values():
+                context.release_views()
+        
+        results = {name: results[name] for name in self.analyzers if name in results}
         
         # Calculate final weighted score
         final_score = self._calculate_weighted_score(results)
@@ -62,9 +214,373 @@ class AdvancedForensicsEngine:
             'algorithm_details': results,
             'final_score': round(final_score, 3),
             'risk_level': risk_level,
-            'is_potentially_edited': final_score > 0.4
+            'is_potentially_edited': final_score > 0.4,
+            'analyzers_run': list(results),
+            'analyzers_skipped': {name: skipped[name] for name in self.analyzers if name in skipped},
+            'stage_timings_ms': timings,
+            'recompression_timings_ms': {
+                resolution: recompression.timings_ms
+                for resolution, recompression in recompressions.items()
+            },
+            'analysis_resolution': self._describe_resolutions(
+                {name: resolutions[name] for name in results}, sizes, original_size, tiled
+            ),
+            'tile_grid': tile_grid
         }
     
+    async def _run_stage(self, stage: List[str], resolutions: Dict[str, str],
+                         images: Dict[str, Optional[Image.Image]], contexts: Dict[str, AnalysisContext],
+                         recompressions: Dict[str, RecompressionResult], exif_data: Dict,
+                         original_size: Tuple[int, int], timings: Dict[str, float],
+                         quantization: Optional[Dict[int, List[int]]] = None,
+                         signature: Optional[JpegSignature] = None) -> Dict[str, Dict]:
+        """Run whole-image analyzers concurrently
+        
+        Qualities already encoded by an earlier stage are reused; only the
+        missing ones are recompressed. Analyzers that read the quantization
+        tables need no recompression. Wall times are added to `timings`.
+        """
+        for resolution in sorted(set(resolutions[name] for name in stage if name in self.pixel_analyzers)):
+            if resolution not in contexts:
+                contexts[resolution] = AnalysisContext.from_image(images[resolution])
+            context = contexts[resolution]
+            done = recompressions.get(resolution)
+            qualities = [
+                quality for quality in self._recompression_qualities(
+                    [name for name in stage if resolutions[name] == resolution
+                     and not self._reads_tables(name, resolution, quantization)]
+                )
+                if done is None or quality not in done.qualities
+            ]
+            if not qualities:
+                continue
+            try:
+                start_time = time.perf_counter()
+                recompression = await self.executor.run(
+                    self.recompression_stage.run, context.pixels, qualities, context.image,
+                    releases_gil=True
+                )
+                elapsed_ms = (time.perf_counter() - start_time) * 1000
+                timings['recompression'] = round(timings.get('recompression', 0.0) + elapsed_ms, 2)
+                self.cost_model.observe('recompression', self._megapixels(context),
+                                        elapsed_ms / len(qualities))
+                recompressions[resolution] = done.merge(recompression) if done else recompression
+            except Exception:
+                # Analyzers fall back to their own recompression and report the error
+                pass
+        
+        stage_contexts = {name: contexts.get(resolutions[name]) for name in stage}
+        stage_recompressions = {name: recompressions.get(resolutions[name]) for name in stage}
+        tables = {name: quantization if self._reads_tables(name, resolutions[name], quantization) else None
+                  for name in stage}
+        with self.executor.shared(stage_contexts, stage_recompressions) as (shared_contexts, shared_recompressions):
+            outputs = await asyncio.gather(
+                *(self._timed_run(algo_name, shared_contexts[algo_name],
+                                  shared_recompressions[algo_name], exif_data, original_size,
+                                  self._megapixels(stage_contexts[algo_name]), timings, tables[algo_name],
+                                  signature)
+                  for algo_name in stage),
+                return_exceptions=True
+            )
+        
+        results = {}
+        for algo_name, output in zip(stage, outputs):
+            if isinstance(output, Exception):
+                output = self._error_result(algo_name, output)
+            results[algo_name] = output
+        return results
+    
+    async def _timed_run(self, algo_name: str, context, recompression, exif_data: Dict,
+                         original_size: Tuple[int, int], megapixels: float,
+                         timings: Dict[str, float],
+                         quantization: Optional[Dict[int, List[int]]] = None,
+                         signature: Optional[JpegSignature] = None) -> Dict[str, Any]:
+        """Run one analyzer, recording its wall time and feeding it to the cost model"""
+        start_time = time.perf_counter()
+        output = await self.executor.run(_run_analyzer, algo_name, self.analyzers[algo_name],
+                                         context, recompression, exif_data, original_size,
+                                         quantization, signature)
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+        timings[algo_name] = round(elapsed_ms, 2)
+        if output.get('success', False):
+            self.cost_model.observe(self._cost_key(algo_name, quantization is not None),
+                                    megapixels, elapsed_ms)
+        return output
+    
+    async def _analyze_tiles(self, image: Image.Image, analyzer_names: List[str],
+                             quantization: Optional[Dict[int, List[int]]] = None
+                             ) -> Tuple[Dict[str, Dict], Dict[str, Any]]:
+        """Run analyzers over overlapping tiles, merging statistics as they go
+        
+        Only one tile and its recompressions are held at a time, so memory
+        is bounded by the tile size. Returns the per-analyzer results and a
+        coarse grid of per-tile suspicion scores.
+        """
+        width, height = image.size
+        rows, cols = self.tiling_policy.grid_shape(image.size)
+        table_readers = [name for name in analyzer_names if self._reads_tables(name, 'full', quantization)]
+        states = {
+            name: (self.analyzers[name].start_tiles((height, width), quantization)
+                   if name in table_readers else self.analyzers[name].start_tiles((height, width)))
+            for name in analyzer_names
+        }
+        grids = {name: np.zeros((rows, cols)) for name in analyzer_names}
+        errors: Dict[str, Exception] = {}
+        qualities = self._recompression_qualities(
+            [name for name in analyzer_names if name not in table_readers]
+        )
+        
+        def process_tile(tile):
+            recompression = self.recompression_stage.run(tile.pixels, qualities) if qualities else None
+            for name in analyzer_names:
+                if name in errors:
+                    continue
+                try:
+                    grids[name][tile.row, tile.col] = self.analyzers[name].add_tile(
+                        states[name], tile, recompression
+                    )
+                except Exception as e:
+                    errors[name] = e
+        
+        for tile in iter_tiles(image, self.tiling_policy):
+            # Tile state lives in this process, so keep the work on threads
+            await self.executor.run(process_tile, tile, releases_gil=True)
+        
+        results = {}
+        for name in analyzer_names:
+            if name in errors:
+                results[name] = self._error_result(name, errors[name])
+                continue
+            results[name] = self.analyzers[name].finish_tiles(states[name])
+            results[name]['details']['tile_scores'] = np.round(grids[name], 3).tolist()
+        
+        # Combine per-analyzer tile scores with the engine weights
+        succeeded = [name for name in analyzer_names if name not in errors]
+        total_weight = sum(self.weights[name] for name in succeeded)
+        combined = sum(grids[name] * self.weights[name] for name in succeeded)
+        if total_weight > 0:
+            combined = combined / total_weight
+        
+        tile_grid = {
+            'tile_size': self.tiling_policy.tile_size,
+            'rows': rows,
+            'cols': cols,
+            'scores': np.round(combined, 3).tolist() if succeeded else []
+        }
+        return results, tile_grid
+    
+    def _error_result(self, algo_name: str, error: Exception) -> Dict[str, Any]:
+        return {
+            "score": 0.0,
+            "success": False,
+            "error": str(error),
+            "algorithm": self.analyzers[algo_name].name
+        }
+    
+    def _resolution_for(self, algo_name: str, sizes: Dict[str, Optional[Tuple[int, int]]]) -> str:
+        """'reduced' if the policy allows it and it was decoded, else 'full'"""
+        if sizes['reduced'] is not None and (
+            sizes['full'] is None or self.resolution_policy.uses_reduced(algo_name)
+        ):
+            return 'reduced'
+        return 'full'
+    
+    def _describe_resolutions(self, resolutions: Dict[str, str],
+                              sizes: Dict[str, Optional[Tuple[int, int]]],
+                              original_size: Tuple[int, int],
+                              tiled: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Width, height and downscale factor each analyzer actually used"""
+        described = {}
+        for algo_name, resolution in resolutions.items():
+            if algo_name in self.pixel_analyzers:
+                width, height = sizes[resolution]
+            else:
+                # Metadata checks compare EXIF against the source dimensions
+                resolution = 'header'
+                width, height = original_size
+            described[algo_name] = {
+                'resolution': resolution,
+                'width': width,
+                'height': height,
+                'scale': round(original_size[0] / width, 3),
+                'tiled': algo_name in tiled
+            }
+        return described
+    
+    def _recompression_qualities(self, analyzer_names: List[str]) -> List[int]:
+        """Union of JPEG qualities requested by the given analyzers"""
+        qualities = set()
+        for name in analyzer_names:
+            qualities.update(getattr(self.analyzers[name], 'test_qualities', []))
+        return sorted(qualities)
+    
+    def _reads_tables(self, algo_name: str, resolution: str,
+                      quantization: Optional[Dict[int, List[int]]]) -> bool:
+        """Whether an analyzer works from the file's quantization tables
+        
+        Tables only describe the original 8x8 grid, so this needs the
+        full-resolution decode.
+        """
+        uses_quantization = getattr(self.analyzers[algo_name], 'uses_quantization', None)
+        return resolution == 'full' and uses_quantization is not None and uses_quantization(quantization)
+    
+    @staticmethod
+    def _cost_key(algo_name: str, reads_tables: bool) -> str:
+        """Cost model entry; the table-driven path has its own, much lower cost"""
+        return f"{algo_name}_tables" if reads_tables else algo_name
+    
+    def _analysis_stages(self, resolutions: Dict[str, str], sizes: Dict[str, Optional[Tuple[int, int]]],
+                         tiled: List[str],
+                         quantization: Optional[Dict[int, List[int]]] = None,
+                         sequential: bool = True) -> List[List[str]]:
+        """Analyzers grouped into stages, cheapest first
+        
+        Stages run one after another and the analyzers of a stage run
+        concurrently. Splitting only pays off when early exit or a budget
+        can stop between stages; then analyzers of similar cost (within
+        SIMILAR_COST_RATIO of the cheapest in the stage) still share one.
+        Otherwise every whole-image analyzer runs in a single stage. Tiled
+        analyzers share one pass over the tiles, so they form a single stage
+        at the position of the cheapest of them.
+        """
+        def cost(name: str) -> float:
+            if name not in self.pixel_analyzers:
+                return 0.0
+            return self._estimate_ms(name, resolutions[name], sizes, {}, quantization)
+        
+        ordered = sorted(self.analyzers, key=cost)
+        tiled_stage = [name for name in ordered if name in tiled]
+        if not sequential:
+            return [stage for stage in ([name for name in ordered if name not in tiled], tiled_stage) if stage]
+        
+        stages = []
+        stage_cost = None
+        for name in ordered:
+            if name in tiled:
+                if name == tiled_stage[0]:
+                    stages.append(tiled_stage)
+                    # The next whole-image analyzer starts a new stage
+                    stage_cost = None
+            elif stage_cost is not None and cost(name) <= stage_cost * SIMILAR_COST_RATIO:
+                stages[-1].append(name)
+            else:
+                stages.append([name])
+                stage_cost = cost(name)
+        return stages
+    
+    def _estimate_ms(self, algo_name: str, resolution: str, sizes: Dict[str, Optional[Tuple[int, int]]],
+                     recompressions: Dict[str, RecompressionResult],
+                     quantization: Optional[Dict[int, List[int]]] = None) -> float:
+        """Expected cost of an analyzer, including recompressions not done yet"""
+        width, height = sizes[resolution]
+        megapixels = width * height / 1e6
+        if self._reads_tables(algo_name, resolution, quantization):
+            return self.cost_model.estimate(self._cost_key(algo_name, True), megapixels)
+        done = recompressions.get(resolution)
+        missing = set(getattr(self.analyzers[algo_name], 'test_qualities', []))
+        if done is not None:
+            missing -= set(done.qualities)
+        return (self.cost_model.estimate(algo_name, megapixels)
+                + len(missing) * self.cost_model.estimate('recompression', megapixels))
+    
+    def _fit_budget(self, stage: List[str], left_ms: float, resolutions: Dict[str, str],
+                    images: Dict[str, Optional[Image.Image]], sizes: Dict[str, Optional[Tuple[int, int]]],
+                    recompressions: Dict[str, RecompressionResult], tiled: List[str],
+                    skipped: Dict[str, Dict[str, str]],
+                    quantization: Optional[Dict[int, List[int]]] = None) -> List[str]:
+        """Analyzers of `stage` that fit in `left_ms`, downsampling where allowed
+        
+        Downsampled analyzers are switched to the 'budget' resolution; the
+        rest that don't fit are recorded in `skipped`.
+        """
+        fitted = []
+        spent_ms = 0.0
+        for name in stage:
+            if name not in self.pixel_analyzers:
+                # Header-only checks cost next to nothing
+                fitted.append(name)
+                continue
+            
+            # Tile passes recompress every tile, nothing is reused
+            estimate = self._estimate_ms(name, resolutions[name], sizes,
+                                         {} if name in tiled else recompressions, quantization)
+            if spent_ms + estimate <= left_ms:
+                fitted.append(name)
+                spent_ms += estimate
+                continue
+            
+            if name not in tiled and self.resolution_policy.uses_reduced(name):
+                downsampled = self._downsample_for_budget(name, left_ms - spent_ms, images, sizes,
+                                                          recompressions)
+                if downsampled is not None:
+                    resolutions[name] = 'budget'
+                    fitted.append(name)
+                    spent_ms += downsampled
+                    continue
+            
+            width, height = sizes[resolutions[name]]
+            skipped[name] = {
+                'reason': 'budget',
+                'detail': f"estimated {estimate:.0f} ms at {width * height / 1e6:.1f} MP, "
+                          f"{max(left_ms - spent_ms, 0.0):.0f} ms left"
+            }
+        return fitted
+    
+    def _downsample_for_budget(self, algo_name: str, left_ms: float,
+                               images: Dict[str, Optional[Image.Image]],
+                               sizes: Dict[str, Optional[Tuple[int, int]]],
+                               recompressions: Dict[str, RecompressionResult]) -> Optional[float]:
+        """Provide a 'budget' image small enough for `algo_name` to fit in `left_ms`
+        
+        Returns the analyzer's estimate on it, or None if even the smallest
+        useful downscale doesn't fit. One budget image is made per request.
+        """
+        if 'budget' in images:
+            estimate = self._estimate_ms(algo_name, 'budget', sizes, recompressions)
+            return estimate if estimate <= left_ms else None
+        
+        base = 'reduced' if images['reduced'] is not None else 'full'
+        width, height = sizes[base]
+        scale = 2
+        while min(width, height) // scale >= MIN_BUDGET_SIDE:
+            sizes['budget'] = (width // scale, height // scale)
+            estimate = self._estimate_ms(algo_name, 'budget', sizes, recompressions)
+            if estimate <= left_ms:
+                images['budget'] = images[base].reduce(scale)
+                sizes['budget'] = images['budget'].size
+                return estimate
+            scale *= 2
+        sizes.pop('budget', None)
+        return None
+    
+    def _score_bounds(self, results: Dict[str, Dict], pending: List[str]) -> Tuple[float, float]:
+        """Range the final score can still take once `pending` analyzers finish
+        
+        Pending scores lie in [0, 1]; an analyzer that fails drops out of the
+        weighted average, which keeps the score inside the same range.
+        """
+        weighted = 0.0
+        done_weight = 0.0
+        for algo_name, result in results.items():
+            if result.get('success', False):
+                weighted += result.get('score', 0.0) * self.weights[algo_name]
+                done_weight += self.weights[algo_name]
+        pending_weight = sum(self.weights[name] for name in pending)
+        total_weight = done_weight + pending_weight
+        if total_weight == 0:
+            return 0.0, 0.0
+        return weighted / total_weight, (weighted + pending_weight) / total_weight
+    
+    def _decision(self, score: float) -> Tuple[str, bool]:
+        """What the response reports for a final score: risk level and edited verdict"""
+        return self._determine_risk_level(score), score > 0.4
+    
+    @staticmethod
+    def _megapixels(context: Optional[AnalysisContext]) -> float:
+        if context is None:
+            return 0.0
+        return context.shape[0] * context.shape[1] / 1e6
+    
     def _calculate_weighted_score(self, results: Dict[str, Dict]) -> float:
         """Calculate weighted average score"""
         total_score = 0.0
@@ -90,4 +606,43 @@ class AdvancedForensicsEngine:
     @property
     def algorithms(self) -> Dict[str, str]:
         """Get list of available algorithms"""
-        return {name: analyzer.name for name, analyzer in self.analyzers.items()}
\ No newline at end of file
+        return {name: analyzer.name for name, analyzer in self.analyzers.items()}
+    
+    @property
+    def pixel_analyzers(self) -> List[str]:
+        """Analyzers that read decoded pixels (metadata only needs the size)"""
+        return [name for name in self.analyzers if self.analyzers.spec(name).pixel]
+    
+    @property
+    def versions(self) -> Dict[str, str]:
+        """Engine and analyzer versions, used to key cached results"""
+        versions = {name: analyzer.version for name, analyzer in self.analyzers.items()}
+        versions['engine'] = self.version
+        versions['early_exit'] = str(self.early_exit)
+        versions['recompression'] = self.recompression_stage.version
+        versions['signature_index'] = default_index().fingerprint
+        versions['frame_sampling'] = self.frame_policy.key
+        versions['resolution_policy'] = (
+            f"{self.resolution_policy.max_megapixels}:"
+            f"{','.join(sorted(self.resolution_policy.reduced_analyzers))}"
+        )
+        return versions
+
+def _import_analyzers(targets: List[str]):
+    """Process worker warm-up: import every analyzer module"""
+    for target in targets:
+        importlib.import_module(target.partition(':')[0])
+
+def _run_analyzer(algo_name: str, analyzer, context: Optional[AnalysisContext],
+                  recompression, exif_data: Dict, original_size: Tuple[int, int],
+                  quantization: Optional[Dict[int, List[int]]] = None,
+                  signature: Optional[JpegSignature] = None) -> Dict[str, Any]:
+    """Dispatch one analyzer; module-level so process workers can unpickle it"""
+    if algo_name == 'metadata_consistency':
+        return analyzer.analyze(exif_data, context, original_size, signature)
+    elif quantization is not None:
+        return analyzer.analyze(context, recompression, quantization)
+    elif hasattr(analyzer, 'test_qualities'):
+        return analyzer.analyze(context, recompression)
+    else:
+        return analyzer.analyze(context)
\ No newline at end of file
@@ -0,0 +1,181 @@
+# services/verification/src/ingest.py
+import hashlib
+import io
+import mmap
+from typing import BinaryIO, Dict, Optional
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+
+class ImageSource:
+    """Uploaded image bytes that can be opened several times without copying"""
+
+    size: int = 0
+
+    def open(self) -> BinaryIO:
+        """Independent reader positioned at the start"""
+        raise NotImplementedError
+
+    def sha256(self) -> str:
+        raise NotImplementedError
+
+    def read_bytes(self) -> bytes:
+        with self.open() as f:
+            return f.read()
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class BytesSource(ImageSource):
+    """Source for bytes already in memory (archive members, small payloads)"""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.size = len(data)
+
+    def open(self) -> BinaryIO:
+        return io.BytesIO(self.data)
+
+    def sha256(self) -> str:
+        return hashlib.sha256(self.data).hexdigest()
+
+class MappedFileSource(ImageSource):
+    """Source backed by a file on disk, read through memory maps
+
+    Pages come from the page cache on demand, so concurrent uploads no
+    longer each hold a private copy of their bytes in process memory.
+    """
+
+    def __init__(self, fileobj: BinaryIO):
+        self._fileno = fileobj.fileno()
+        self._maps = []
+        fileobj.seek(0, io.SEEK_END)
+        self.size = fileobj.tell()
+
+    def open(self) -> BinaryIO:
+        # Each reader has its own file position, so decoders don't interfere
+        view = mmap.mmap(self._fileno, 0, access=mmap.ACCESS_READ)
+        self._maps.append(view)
+        return _MappedReader(view)
+
+    def sha256(self) -> str:
+        view = mmap.mmap(self._fileno, 0, access=mmap.ACCESS_READ)
+        try:
+            return hashlib.sha256(view).hexdigest()
+        finally:
+            view.close()
+
+    def close(self):
+        for view in self._maps:
+            view.close()
+        self._maps.clear()
+
+class _MappedReader(io.RawIOBase):
+    """File semantics over a memory map
+
+    Unlike mmap.seek, seeking past the end is allowed and later reads return
+    b"", which is what PIL's format probes expect from a regular file.
+    """
+
+    def __init__(self, view: mmap.mmap):
+        self._view = view
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        chunk = self._view[self._position:self._position + len(buffer)]
+        buffer[:len(chunk)] = chunk
+        self._position += len(chunk)
+        return len(chunk)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        if offset < 0:
+            raise ValueError("negative seek position")
+        self._position = offset
+        return offset
+
+    def tell(self) -> int:
+        return self._position
+
+    def close(self):
+        if not self.closed:
+            self._view.close()
+        super().close()
+
+def source_for_upload(upload: UploadFile) -> ImageSource:
+    """Wrap an upload without reading it into memory
+
+    Starlette's multipart parser has already streamed the part into a
+    SpooledTemporaryFile; asking for its fileno moves any small in-memory
+    remainder to disk so it can be mapped like the rest.
+    """
+    fileobj = upload.file
+    fileobj.seek(0, io.SEEK_END)
+    if fileobj.tell() == 0:
+        # Empty files cannot be memory-mapped
+        return BytesSource(b"")
+    return MappedFileSource(fileobj)
+
+class UploadLimitMiddleware:
+    """Reject request bodies above a size cap before they are spooled
+
+    Requests announcing a larger Content-Length get 413 without any body
+    being read; chunked bodies are counted as they stream and aborted as
+    soon as they cross the cap.
+    """
+
+    def __init__(self, app, max_bytes: int, path_limits: Optional[Dict[str, int]] = None):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_limits = path_limits or {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.path_limits.get(scope["path"], self.max_bytes)
+        if limit <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            await _too_large(limit)(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # HTTPException passes through FastAPI's body parsing untouched
+                    raise HTTPException(status_code=413, detail=_too_large_message(limit))
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+def _too_large(limit: int) -> JSONResponse:
+    # Same body as the HTTPException raised for chunked uploads
+    return JSONResponse(content={"detail": _too_large_message(limit)}, status_code=413)
+
+def _too_large_message(limit: int) -> str:
+    return f"Upload exceeds the {limit} byte limit"
@@ -0,0 +1,387 @@
+# services/verification/src/jobs.py
+import asyncio
+import ipaddress
+import json
+import math
+import shutil
+import socket
+import tempfile
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import Any, Awaitable, Callable, Collection, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+import httpx
+from ingest import BytesSource, ImageSource, MappedFileSource
+
+JOB_BACKENDS = ('memory', 'redis')
+
+@dataclass
+class Job:
+    """One queued analysis and, once finished, its result"""
+    id: str
+    filename: str
+    budget_ms: Optional[float] = None
+    callback_url: Optional[str] = None
+    status: str = 'queued'  # queued | running | done | failed
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    callback: Optional[Dict[str, Any]] = None
+
+    @staticmethod
+    def new(filename: str, budget_ms: Optional[float] = None,
+            callback_url: Optional[str] = None) -> 'Job':
+        return Job(id=uuid.uuid4().hex, filename=filename, budget_ms=budget_ms,
+                   callback_url=callback_url)
+
+    def to_dict(self) -> Dict[str, Any]:
+        job = asdict(self)
+        # Seconds spent waiting for a worker and analyzing, once known
+        job['queue_seconds'] = (round(self.started_at - self.created_at, 3)
+                                if self.started_at is not None else None)
+        job['run_seconds'] = (round(self.finished_at - self.started_at, 3)
+                              if self.finished_at is not None and self.started_at is not None else None)
+        return job
+
+class QueueFull(Exception):
+    """The job queue is at capacity; retry after `retry_after` seconds"""
+
+    def __init__(self, retry_after: int = 0):
+        super().__init__("Job queue is full")
+        self.retry_after = retry_after
+
+class BlockedCallback(Exception):
+    """callback_url is not a public http(s) URL"""
+
+class JobBackend:
+    """Queue of pending jobs plus the job records
+
+    `put` must refuse new jobs with QueueFull once `max_queued` are waiting.
+    Records of finished jobs are kept for `result_ttl` seconds.
+    """
+
+    max_queued: int = 0
+
+    async def put(self, job: Job, source: ImageSource):
+        raise NotImplementedError
+
+    async def take(self, timeout: float) -> Optional[Tuple[Job, Optional[ImageSource]]]:
+        """Next queued job and its upload, or None after `timeout` seconds
+
+        The upload is None when it expired or went missing while the job
+        was queued; the job is then failed.
+        """
+        raise NotImplementedError
+
+    async def save(self, job: Job):
+        raise NotImplementedError
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        raise NotImplementedError
+
+    async def depth(self) -> int:
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+class InProcessJobBackend(JobBackend):
+    """Jobs queued in this process; uploads wait in private temporary files
+
+    Uploads are copied out of the request's spool file (which is deleted
+    when the request ends) and memory-mapped again when a worker picks the
+    job up, so queued images don't sit in process memory.
+    """
+
+    def __init__(self, max_queued: int = 64, result_ttl: float = 3600.0):
+        self.max_queued = max_queued
+        self.result_ttl = result_ttl
+        self._queue: "asyncio.Queue[str]" = asyncio.Queue(maxsize=max_queued)
+        self._jobs: Dict[str, Job] = {}
+        self._uploads: Dict[str, Any] = {}
+
+    async def put(self, job: Job, source: ImageSource):
+        if self._queue.full():
+            raise QueueFull()
+        spool = await asyncio.to_thread(_copy_to_tempfile, source)
+        if self._queue.full():
+            spool.close()
+            raise QueueFull()
+        self._sweep()
+        self._jobs[job.id] = job
+        self._uploads[job.id] = spool
+        self._queue.put_nowait(job.id)
+
+    async def take(self, timeout: float) -> Optional[Tuple[Job, Optional[ImageSource]]]:
+        try:
+            job_id = await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        spool = self._uploads.pop(job_id)
+        return self._jobs[job_id], _SpooledSource(spool)
+
+    async def save(self, job: Job):
+        self._jobs[job.id] = job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        self._sweep()
+        return self._jobs.get(job_id)
+
+    async def depth(self) -> int:
+        return self._queue.qsize()
+
+    async def close(self):
+        for spool in self._uploads.values():
+            spool.close()
+        self._uploads.clear()
+
+    def _sweep(self):
+        """Forget finished jobs older than the result TTL"""
+        expired = time.time() - self.result_ttl
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished_at is not None and job.finished_at < expired]:
+            del self._jobs[job_id]
+
+class RedisJobBackend(JobBackend):
+    """Jobs shared through a Redis-compatible server (Redis, Valkey, KeyDB, ...)
+
+    Every node submitting to or working on the same `prefix` shares one
+    queue, so any node can accept a job, run it, or answer for its status.
+    Uploads travel through the server, which bounds practical image sizes
+    by its memory. Needs the `redis` package.
+    """
+
+    def __init__(self, url: str, max_queued: int = 64, result_ttl: float = 3600.0,
+                 prefix: str = 'verification:jobs'):
+        # Imported here so the default in-process backend doesn't need it
+        import redis.asyncio as redis
+        self._redis = redis.Redis.from_url(url)
+        self.max_queued = max_queued
+        self.result_ttl = int(result_ttl)
+        self._queue_key = f"{prefix}:queue"
+        self._prefix = prefix
+
+    async def put(self, job: Job, source: ImageSource):
+        # Cheap early refusal before shipping the upload
+        if await self._redis.llen(self._queue_key) >= self.max_queued:
+            raise QueueFull()
+        data = await asyncio.to_thread(source.read_bytes)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            # Pending uploads and records expire too, should no worker ever take them
+            pipe.set(self._data_key(job.id), data, ex=self.result_ttl)
+            pipe.set(self._job_key(job.id), json.dumps(asdict(job)), ex=self.result_ttl)
+            await pipe.execute()
+        # RPUSH reports the new length atomically: back out if it went over the cap
+        if await self._redis.rpush(self._queue_key, job.id) > self.max_queued:
+            await self._redis.lrem(self._queue_key, 1, job.id)
+            await self._redis.delete(self._data_key(job.id), self._job_key(job.id))
+            raise QueueFull()
+
+    async def take(self, timeout: float) -> Optional[Tuple[Job, Optional[ImageSource]]]:
+        item = await self._redis.blpop([self._queue_key], timeout=max(1, math.ceil(timeout)))
+        if item is None:
+            return None
+        job_id = item[1].decode()
+        job = await self.get(job_id)
+        data = await self._redis.getdel(self._data_key(job_id))
+        if job is None:
+            # The record expired while queued: nobody can ask for this job any more
+            return None
+        return job, BytesSource(data) if data is not None else None
+
+    async def save(self, job: Job):
+        await self._redis.set(self._job_key(job.id), json.dumps(asdict(job)), ex=self.result_ttl)
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        record = await self._redis.get(self._job_key(job_id))
+        return Job(**json.loads(record)) if record is not None else None
+
+    async def depth(self) -> int:
+        return await self._redis.llen(self._queue_key)
+
+    async def close(self):
+        await self._redis.aclose()
+
+    def _job_key(self, job_id: str) -> str:
+        return f"{self._prefix}:job:{job_id}"
+
+    def _data_key(self, job_id: str) -> str:
+        return f"{self._prefix}:data:{job_id}"
+
+class JobQueue:
+    """Bounded job queue drained by a fixed pool of analysis workers
+
+    `analyze(job, source)` runs one job and returns its JSON-ready result.
+    When the backend is full, submissions fail with QueueFull carrying a
+    Retry-After estimate: queued jobs times the average job duration,
+    spread over the workers.
+
+    Jobs whose upload expired while queued, and jobs still running when
+    the queue stops, are marked failed (with their callback delivered),
+    so no record stays queued or running for good.
+    """
+
+    def __init__(self, backend: JobBackend,
+                 analyze: Callable[[Job, ImageSource], Awaitable[Dict[str, Any]]],
+                 workers: int = 1, callback_timeout: float = 10.0,
+                 callback_allowed_hosts: Collection[str] = (),
+                 on_finish: Optional[Callable[[Job], None]] = None):
+        self.backend = backend
+        self.analyze = analyze
+        self.workers = workers
+        self.callback_timeout = callback_timeout
+        self.callback_allowed_hosts = {host.lower() for host in callback_allowed_hosts}
+        self.on_finish = on_finish
+        # Seconds per job, seeded with a guess and then an exponential moving average
+        self.average_seconds = 5.0
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = False
+        # Jobs taken by this node's workers and not finished yet
+        self._running: Dict[str, Job] = {}
+
+    async def submit(self, job: Job, source: ImageSource) -> Job:
+        """Queue `job`; BlockedCallback or QueueFull if it can't be"""
+        if job.callback_url is not None:
+            await check_callback_url(job.callback_url, self.callback_allowed_hosts)
+        try:
+            await self.backend.put(job, source)
+        except QueueFull:
+            raise QueueFull(await self.retry_after())
+        return job
+
+    async def retry_after(self) -> int:
+        depth = await self.backend.depth()
+        return max(1, math.ceil(depth * self.average_seconds / max(self.workers, 1)))
+
+    def start(self):
+        self._stopping = False
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._running:
+            async with httpx.AsyncClient(timeout=self.callback_timeout) as client:
+                for job in list(self._running.values()):
+                    if job.status == 'running':
+                        self._fail(job, "Interrupted by a service shutdown; submit the image again")
+                    await self._finish(job, client)
+            self._running.clear()
+        await self.backend.close()
+
+    async def _work(self):
+        async with httpx.AsyncClient(timeout=self.callback_timeout) as client:
+            while not self._stopping:
+                taken = await self.backend.take(timeout=1.0)
+                if taken is None:
+                    continue
+                job, source = taken
+                if source is None:
+                    job.started_at = time.time()
+                    self._fail(job, "The upload expired before a worker took the job")
+                    await self._finish(job, client)
+                    continue
+                await self._run(job, source, client)
+
+    async def _run(self, job: Job, source: ImageSource, client: httpx.AsyncClient):
+        job.status = 'running'
+        job.started_at = time.time()
+        self._running[job.id] = job
+        await self.backend.save(job)
+        try:
+            with source:
+                job.result = await self.analyze(job, source)
+            job.status = 'done'
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+        job.finished_at = time.time()
+        elapsed = job.finished_at - job.started_at
+        self.average_seconds += 0.2 * (elapsed - self.average_seconds)
+
+        await self._finish(job, client)
+        # Left in place when cancelled, for stop() to settle
+        del self._running[job.id]
+
+    @staticmethod
+    def _fail(job: Job, error: str):
+        job.status = 'failed'
+        job.error = error
+        job.finished_at = time.time()
+
+    async def _finish(self, job: Job, client: httpx.AsyncClient):
+        """Deliver the callback of a finished job and store its final record"""
+        if job.callback_url and job.callback is None:
+            job.callback = await _deliver(client, job, self.callback_allowed_hosts)
+        await self.backend.save(job)
+        if self.on_finish is not None:
+            self.on_finish(job)
+
+async def check_callback_url(url: str, allowed_hosts: Collection[str] = ()):
+    """Reject callback URLs that would reach this service's own network
+
+    Loopback, private, link-local (cloud metadata), reserved and multicast
+    addresses are refused unless the host is in `allowed_hosts`. As in the
+    gateway's check of image URLs, a DNS server that answers differently
+    at delivery can still get through; restrict egress as well.
+    """
+    parsed = urlparse(url)
+    if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+        raise BlockedCallback("callback_url must be an http(s) URL")
+    host = parsed.hostname.lower()
+    if host in allowed_hosts:
+        return
+    try:
+        addresses = [str(ipaddress.ip_address(host))]
+    except ValueError:
+        port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        except socket.gaierror:
+            raise BlockedCallback(f"callback_url host {host} does not resolve")
+        addresses = [info[4][0] for info in infos]
+    for address in addresses:
+        # Drop the IPv6 zone (fe80::1%eth0)
+        ip = ipaddress.ip_address(address.split('%')[0])
+        if not ip.is_global or ip.is_multicast:
+            raise BlockedCallback(f"callback_url host {host} is not a public address")
+
+async def _deliver(client: httpx.AsyncClient, job: Job,
+                   allowed_hosts: Collection[str] = ()) -> Dict[str, Any]:
+    """POST the finished job to its callback URL; failures are recorded, not retried
+
+    The URL is checked again, since its host may resolve elsewhere by now,
+    and redirects are not followed: a 3xx is recorded as the outcome.
+    """
+    try:
+        await check_callback_url(job.callback_url, allowed_hosts)
+        response = await client.post(job.callback_url, json=job.to_dict(), follow_redirects=False)
+        return {'status_code': response.status_code, 'delivered_at': time.time()}
+    except BlockedCallback as e:
+        return {'error': str(e)}
+    except httpx.HTTPError as e:
+        return {'error': str(e) or type(e).__name__}
+
+def _copy_to_tempfile(source: ImageSource):
+    spool = tempfile.TemporaryFile()
+    with source.open() as f:
+        shutil.copyfileobj(f, spool)
+    spool.flush()
+    return spool
+
+class _SpooledSource(MappedFileSource):
+    """Mapped source that owns its (non-empty) temporary file"""
+
+    def __init__(self, spool):
+        super().__init__(spool)
+        self._spool = spool
+
+    def close(self):
+        super().close()
+        self._spool.close()
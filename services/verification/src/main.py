@@ -1,14 +1,49 @@
-from fastapi import FastAPI, UploadFile, File
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from PIL import Image
-import io
-from typing import Dict, Any, List
+import asyncio
+import json
+import os
+import time
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Tuple
+from admission import AdmissionController, AdmissionRejected
 from forensics_engine import AdvancedForensicsEngine
+from executor import AnalysisExecutor
+from result_cache import ResultCache
+from blobstore import DEFAULT_BLOB_DIR, BlobStore
+from batch import BatchItem, iter_batch_items, stream_batch
+from decoding import FrameSamplingPolicy, ResolutionPolicy, decode_for_analysis, read_size
+from frames import analyze_frames, iter_sampled_frames
+from tiling import TilingPolicy
+from similarity import NearDuplicateIndex, hash_source
+from algorithms.recompression import RecompressionStage
+from algorithms.registry import AnalyzerRegistry
+from allocation_tracker import AllocationTracker
+from ingest import ImageSource, UploadLimitMiddleware, source_for_upload
+from jobs import BlockedCallback, InProcessJobBackend, Job, JobQueue, QueueFull, RedisJobBackend
+from metrics import (ADMISSION_MEGAPIXELS_IN_USE, ADMISSION_WAITING, ADMISSIONS, ANALYSES_IN_PROGRESS,
+                     ANALYSIS_STORE_ROWS, CACHE_LOOKUPS, IMAGE_BYTES, IMAGE_MEGAPIXELS, JOBS, NEAR_DUPLICATE_LOOKUPS,
+                     STAGE_SECONDS, MetricsMiddleware, metrics_response, record_analysis, record_job,
+                     record_store_flush)
+
+if TYPE_CHECKING:
+    from analysis_store import AnalysisStore
 
 app = FastAPI(title="Advanced Image Analysis Service")
 
+# MAX_UPLOAD_BYTES: request body cap for /analyze and /jobs, and for each archive member in a batch,
+# MAX_BATCH_UPLOAD_BYTES: cap for /analyze/batch and /similarity/search
+upload_bytes = int(os.getenv("MAX_UPLOAD_BYTES", str(256 * 1024 * 1024)))
+batch_upload_bytes = int(os.getenv("MAX_BATCH_UPLOAD_BYTES", str(4 * 1024 ** 3)))
+app.add_middleware(
+    UploadLimitMiddleware,
+    max_bytes=upload_bytes,
+    path_limits={"/analyze/batch": batch_upload_bytes, "/similarity/search": batch_upload_bytes}
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -17,6 +52,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so rejected uploads are counted too
+app.add_middleware(MetricsMiddleware)
+
 class HealthResponse(BaseModel):
     service: str
     status: str
@@ -29,47 +67,568 @@ class EnhancedAnalysisResult(BaseModel):
     analysis_details: Dict[str, Any]
     detection_methods: List[str]
     recommendations: List[str]
+    algorithm_details: Dict[str, Any] = {}
+    cache_status: Optional[str] = None
+    analysis_resolution: Dict[str, Any] = {}
+    tile_grid: Optional[Dict[str, Any]] = None
+    analyzers_run: List[str] = []
+    analyzers_skipped: Dict[str, Any] = {}
+    near_duplicate: Optional[Dict[str, Any]] = None
+    frame_timeline: Optional[Dict[str, Any]] = None
+    # Time this request waited for admission and then spent decoding and analyzing
+    # (only when it computed the result, not on cache hits)
+    queue_wait_ms: Optional[float] = None
+    compute_ms: Optional[float] = None
+    # Wall time of each stage and analyzer, and with ANALYSIS_TRACE_ALLOCATIONS the peak bytes
+    # allocated (an upper bound when other analyses overlapped); likewise only when computed
+    stage_timings_ms: Dict[str, float] = {}
+    peak_allocation_bytes: Optional[int] = None
+    peak_allocation_overlapped: Optional[bool] = None
 
 # Initialize forensics engine
-forensics_engine = AdvancedForensicsEngine()
+# ANALYSIS_EXECUTOR: inline | thread | process, ANALYSIS_WORKERS: pool size (default: CPU count)
+analysis_executor = AnalysisExecutor(
+    mode=os.getenv("ANALYSIS_EXECUTOR", "thread"),
+    max_workers=int(os.getenv("ANALYSIS_WORKERS", "0")) or None
+)
+# ANALYSIS_MAX_MEGAPIXELS: size of the downscaled decode (0 disables it),
+# ANALYSIS_REDUCED_ANALYZERS: comma-separated analyzers allowed to use it
+resolution_policy = ResolutionPolicy(
+    max_megapixels=float(os.getenv("ANALYSIS_MAX_MEGAPIXELS", "16")),
+    reduced_analyzers=tuple(
+        name.strip() for name in os.getenv("ANALYSIS_REDUCED_ANALYZERS", "noise_pattern").split(",")
+        if name.strip()
+    )
+)
+# ANALYSIS_TILE_MEGAPIXELS: full-resolution analysis switches to tiles above this size (0 disables),
+# ANALYSIS_TILE_SIZE: tile edge in pixels (multiple of 16)
+tiling_policy = TilingPolicy(
+    min_megapixels=float(os.getenv("ANALYSIS_TILE_MEGAPIXELS", "64")),
+    tile_size=int(os.getenv("ANALYSIS_TILE_SIZE", "1024"))
+)
+# RECOMPRESSION_THREADS: parallel JPEG re-encodes per image (default: CPU count, at most 4)
+recompression_stage = RecompressionStage(
+    max_workers=int(os.getenv("RECOMPRESSION_THREADS", "0")) or None
+)
+# FRAME_MAX_FRAMES: frames analyzed per animated or multi-page image (1: first frame only),
+# FRAME_SAMPLE_EVERY: also analyze every Nth frame, FRAME_SCENE_CHANGE: mean gray-level jump
+# between consecutive frames that marks a scene change worth analyzing (0 disables)
+frame_policy = FrameSamplingPolicy(
+    every_nth=int(os.getenv("FRAME_SAMPLE_EVERY", "10")),
+    scene_change=float(os.getenv("FRAME_SCENE_CHANGE", "20")),
+    max_frames=int(os.getenv("FRAME_MAX_FRAMES", "16"))
+)
+# Built-in analyzers plus those of installed plugins (entry point group image_verification.analyzers)
+# ANALYSIS_ANALYZERS: comma-separated names of the analyzers to run (default: all registered)
+analyzer_registry = AnalyzerRegistry()
+enabled_analyzers = [name.strip() for name in os.getenv("ANALYSIS_ANALYZERS", "").split(",") if name.strip()]
+if enabled_analyzers:
+    analyzer_registry = analyzer_registry.select(enabled_analyzers)
+# ANALYSIS_TRACE_ALLOCATIONS: report each analysis's peak allocation (tracemalloc; slows analysis)
+allocation_tracker = (AllocationTracker()
+                      if os.getenv("ANALYSIS_TRACE_ALLOCATIONS", "false").lower() == "true" else None)
+# ANALYSIS_EARLY_EXIT: skip analyzers that can no longer change the verdict
+forensics_engine = AdvancedForensicsEngine(executor=analysis_executor,
+                                           resolution_policy=resolution_policy,
+                                           tiling_policy=tiling_policy,
+                                           early_exit=os.getenv("ANALYSIS_EARLY_EXIT", "true").lower() == "true",
+                                           recompression_stage=recompression_stage,
+                                           frame_policy=frame_policy,
+                                           analyzers=analyzer_registry,
+                                           allocation_tracker=allocation_tracker)
+
+# Admission control: every analysis holds its image's megapixels while it decodes and runs
+# ADMISSION_MEGAPIXELS: megapixels analyzed at once (0 disables admission control),
+# ADMISSION_QUEUE: /analyze requests waiting for capacity before new ones get 503,
+# ADMISSION_MAX_WAIT: seconds an /analyze request may wait (or is expected to) before it gets 503
+admission_megapixels = float(os.getenv("ADMISSION_MEGAPIXELS", "48"))
+admission: Optional[AdmissionController] = None
+if admission_megapixels > 0:
+    admission = AdmissionController(admission_megapixels,
+                                    max_waiting=int(os.getenv("ADMISSION_QUEUE", "32")),
+                                    max_wait=float(os.getenv("ADMISSION_MAX_WAIT", "10")))
+    ADMISSION_MEGAPIXELS_IN_USE.set_function(lambda: admission.in_use)
+    ADMISSION_WAITING.set_function(lambda: admission.waiting)
+
+# Content-addressed result cache
+# RESULT_CACHE_SIZE: in-memory entries (0 disables), RESULT_CACHE_DIR: optional on-disk tier
+result_cache = ResultCache(
+    max_entries=int(os.getenv("RESULT_CACHE_SIZE", "1024")),
+    disk_dir=os.getenv("RESULT_CACHE_DIR") or None
+)
+
+# Perceptual hashes of analyzed images, for near-duplicate lookups
+# SIMILARITY_INDEX: true | false, SIMILARITY_MAX_DISTANCE: differing pHash/dHash bits still counted
+# as a near-duplicate, SIMILARITY_MAX_ENTRIES: index capacity,
+# SIMILARITY_INDEX_PATH: file the index is loaded from during warm-up and saved to at shutdown
+similarity_enabled = os.getenv("SIMILARITY_INDEX", "true").lower() == "true"
+# Built during warm-up: its fingerprint needs the analyzer versions
+similarity_index: Optional[NearDuplicateIndex] = None
+
+# Uploads stored by the api service's /upload
+# BLOB_STORE_DIR: content-addressed store shared with the api service,
+# BLOB_STORE_MAX_AGE: seconds an unused upload is kept (0 keeps them forever)
+blob_store = BlobStore(
+    root=os.getenv("BLOB_STORE_DIR", DEFAULT_BLOB_DIR),
+    max_age=float(os.getenv("BLOB_STORE_MAX_AGE", "86400"))
+)
+
+# Asynchronous jobs, started with the event loop
+# JOB_BACKEND: memory | redis (JOB_REDIS_URL), JOB_QUEUE_SIZE: queued jobs before 429,
+# JOB_WORKERS: jobs analyzed at once on this node (default: ANALYSIS_WORKERS; 0 only accepts jobs),
+# JOB_RESULT_TTL: seconds finished jobs stay queryable, JOB_CALLBACK_TIMEOUT: callback POST timeout,
+# JOB_CALLBACK_ALLOWED_HOSTS: comma-separated callback hosts exempt from the public-address check
+job_queue: Optional[JobQueue] = None
+
+@app.on_event("startup")
+async def start_jobs():
+    """Create the job backend and start its workers"""
+    global job_queue
+    max_queued = int(os.getenv("JOB_QUEUE_SIZE", "64"))
+    result_ttl = float(os.getenv("JOB_RESULT_TTL", "3600"))
+    if os.getenv("JOB_BACKEND", "memory") == "redis":
+        backend = RedisJobBackend(os.getenv("JOB_REDIS_URL", "redis://localhost:6379/0"),
+                                  max_queued=max_queued, result_ttl=result_ttl)
+    else:
+        backend = InProcessJobBackend(max_queued=max_queued, result_ttl=result_ttl)
+    job_queue = JobQueue(
+        backend,
+        run_job,
+        workers=int(os.getenv("JOB_WORKERS", str(analysis_executor.max_workers))),
+        callback_timeout=float(os.getenv("JOB_CALLBACK_TIMEOUT", "10")),
+        callback_allowed_hosts=[host.strip() for host in os.getenv("JOB_CALLBACK_ALLOWED_HOSTS", "").split(",")
+                                if host.strip()],
+        on_finish=record_job
+    )
+    job_queue.start()
+
+# Persistent record of every computed verdict, written in batches off the request path
+# ANALYSIS_STORE_URL: SQLAlchemy URL, e.g. sqlite:////data/analyses.db (unset disables the store),
+# ANALYSIS_STORE_BATCH: rows per transaction, ANALYSIS_STORE_FLUSH_SECONDS: longest wait before a write,
+# ANALYSIS_STORE_QUEUE: rows waiting to be written before new ones are dropped
+analysis_store: Optional["AnalysisStore"] = None
+
+@app.on_event("startup")
+async def start_analysis_store():
+    """Create missing tables and start the background writer"""
+    global analysis_store
+    url = os.getenv("ANALYSIS_STORE_URL")
+    if not url:
+        return
+    # SQLAlchemy is only imported when the store is used
+    from analysis_store import AnalysisStore
+    analysis_store = AnalysisStore(
+        url,
+        batch_size=int(os.getenv("ANALYSIS_STORE_BATCH", "500")),
+        flush_interval=float(os.getenv("ANALYSIS_STORE_FLUSH_SECONDS", "1")),
+        max_pending=int(os.getenv("ANALYSIS_STORE_QUEUE", "10000")),
+        on_flush=record_store_flush
+    )
+    await analysis_store.start()
+
+# Readiness: analyzers, worker processes and indexes are loaded in the background
+# after startup, so /health answers at once and /ready only once requests will be fast
+# ANALYSIS_WARM_UP: false skips it (everything loads on first use; /ready is immediate)
+warm_up_task: Optional[asyncio.Task] = None
+warm_up_report: Dict[str, Any] = {}
+
+@app.on_event("startup")
+async def start_warm_up():
+    """Start warming up the engine without holding up startup"""
+    global warm_up_task
+    if os.getenv("ANALYSIS_WARM_UP", "true").lower() == "true":
+        warm_up_task = asyncio.create_task(warm_up())
+    else:
+        create_similarity_index()
+
+async def warm_up():
+    """Load everything the first requests would otherwise wait for"""
+    start_time = time.perf_counter()
+    try:
+        timings = await forensics_engine.warm_up()
+        step_time = time.perf_counter()
+        await asyncio.to_thread(create_similarity_index)
+        timings['similarity_index'] = round((time.perf_counter() - step_time) * 1000, 2)
+        warm_up_report.update(status="ready", timings_ms=timings)
+    except Exception as e:
+        warm_up_report.update(status="failed", error=str(e))
+    warm_up_report['seconds'] = round(time.perf_counter() - start_time, 3)
+
+def create_similarity_index():
+    """Load (or start) the near-duplicate index when SIMILARITY_INDEX is enabled"""
+    global similarity_index
+    if similarity_enabled:
+        similarity_index = NearDuplicateIndex(
+            max_distance=int(os.getenv("SIMILARITY_MAX_DISTANCE", "6")),
+            max_entries=int(os.getenv("SIMILARITY_MAX_ENTRIES", "5000000")),
+            path=os.getenv("SIMILARITY_INDEX_PATH") or None,
+            fingerprint=json.dumps(forensics_engine.versions, sort_keys=True)
+        )
+
+@app.on_event("shutdown")
+async def shutdown_executor():
+    """Stop job workers and release analysis worker pools"""
+    if job_queue is not None:
+        await job_queue.stop()
+    analysis_executor.shutdown()
+
+@app.on_event("shutdown")
+async def stop_analysis_store():
+    """Write the verdicts still queued"""
+    if analysis_store is not None:
+        await analysis_store.stop()
+
+@app.on_event("shutdown")
+async def save_similarity_index():
+    """Persist the near-duplicate index when SIMILARITY_INDEX_PATH is set"""
+    if similarity_index is not None:
+        await asyncio.to_thread(similarity_index.save)
 
 @app.post("/analyze", response_model=EnhancedAnalysisResult)
-async def enhanced_analyze_image(file: UploadFile = File(...)):
-    """Analyze image using advanced multi-algorithm techniques"""
+async def enhanced_analyze_image(file: UploadFile = File(...),
+                                 budget_ms: Optional[float] = Query(None, gt=0),
+                                 reuse_near_duplicate: bool = Query(False)):
+    """Analyze image using advanced multi-algorithm techniques
+    
+    `budget_ms` caps the analysis latency: expensive analyzers are
+    downsampled or skipped when they would not finish in time. With
+    `reuse_near_duplicate`, a resized or re-encoded copy of an analyzed
+    image gets that image's verdict instead of a new analysis. Over
+    capacity, the request waits for admission up to ADMISSION_MAX_WAIT
+    (time spent counts against the budget) or gets 503 with Retry-After.
+    """
+    start_time = time.perf_counter()
     try:
-        contents = await file.read()
-        image = Image.open(io.BytesIO(contents)).convert("RGB")
-        
-        # Extract EXIF data
-        exif_data = {}
+        with source_for_upload(file) as source:
+            return await analyze_upload(file.filename, source, budget_ms, start_time,
+                                        reuse_near_duplicate=reuse_near_duplicate, shed=True)
+    except AdmissionRejected as e:
+        raise over_capacity(e)
+    except Exception as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+
+@app.post("/analyze/stored/{handle}", response_model=EnhancedAnalysisResult)
+async def analyze_stored_image(handle: str, budget_ms: Optional[float] = Query(None, gt=0),
+                               reuse_near_duplicate: bool = Query(False)):
+    """Analyze an image already uploaded to the api service's /upload
+    
+    The stored bytes and the EXIF tags parsed at upload are reused, so the
+    image crosses the network once and its EXIF is parsed once.
+    """
+    start_time = time.perf_counter()
+    source = await asyncio.to_thread(blob_store.open, handle)
+    if source is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired handle")
+    metadata = await asyncio.to_thread(blob_store.metadata, handle) or {}
+    try:
+        with source:
+            return await analyze_upload(metadata.get("filename") or handle, source, budget_ms,
+                                        start_time, exif_data=metadata.get("exif"),
+                                        reuse_near_duplicate=reuse_near_duplicate, shed=True)
+    except AdmissionRejected as e:
+        raise over_capacity(e)
+    except Exception as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+
+def over_capacity(rejection: AdmissionRejected) -> HTTPException:
+    """503 for a request shed by admission control"""
+    ADMISSIONS.labels(f'rejected_{rejection.reason}').inc()
+    return HTTPException(status_code=503, detail=str(rejection),
+                         headers={"Retry-After": str(rejection.retry_after)})
+
+@app.post("/analyze/batch")
+async def batch_analyze_images(files: List[UploadFile] = File(...)):
+    """Analyze many images (or zip/tar archives of images) in one request
+    
+    Streams one JSON line per image as soon as its analysis finishes, so
+    lines arrive in completion order; `index` gives the submission order.
+    """
+    async def analyze_item(item: BatchItem) -> Dict[str, Any]:
+        with await item.open() as source:
+            result = await analyze_upload(item.filename, source)
+        return jsonable_encoder(result)
+    
+    async def ndjson_lines():
+        async for line in stream_batch(iter_batch_items(files, upload_bytes), analyze_item,
+                                       max_concurrency=analysis_executor.max_workers):
+            yield json.dumps(line) + "\n"
+    
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+@app.post("/similarity/search")
+async def similarity_search(files: List[UploadFile] = File(...),
+                            max_distance: Optional[int] = Query(None, ge=0, le=16),
+                            limit: int = Query(10, ge=1, le=1000)):
+    """Look up analyzed near-duplicates of many images (or zip/tar archives of images)
+    
+    Images are only hashed, never analyzed. Streams one JSON line per image
+    in completion order, with its hashes and up to `limit` matches, nearest
+    first.
+    """
+    if similarity_index is None:
+        detail = "Near-duplicate index is disabled" if not similarity_enabled else "Near-duplicate index is loading"
+        raise HTTPException(status_code=503, detail=detail)
+    
+    async def search_item(item: BatchItem) -> Dict[str, Any]:
+        with await item.open() as source:
+            hashes = await asyncio.to_thread(hash_source, source)
+        if hashes is None:
+            # Blank images have no perceptual hash
+            return {"filename": item.filename, "phash": None, "dhash": None, "matches": []}
+        return {
+            "filename": item.filename,
+            "phash": f"{hashes[0]:016x}",
+            "dhash": f"{hashes[1]:016x}",
+            "matches": similarity_index.lookup(hashes, max_distance, limit)
+        }
+    
+    async def ndjson_lines():
+        async for line in stream_batch(iter_batch_items(files, upload_bytes), search_item,
+                                       max_concurrency=analysis_executor.max_workers):
+            yield json.dumps(line) + "\n"
+    
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+@app.post("/jobs", status_code=202)
+async def submit_job(file: UploadFile = File(...),
+                     budget_ms: Optional[float] = Query(None, gt=0),
+                     callback_url: Optional[str] = Query(None)):
+    """Queue an analysis and return its job id right away
+    
+    Poll `GET /jobs/{job_id}` for the result, or pass `callback_url` to
+    have the finished job POSTed there; it must be a public http(s) URL
+    unless its host is in JOB_CALLBACK_ALLOWED_HOSTS. A full queue answers
+    429 with a Retry-After estimate.
+    """
+    job = Job.new(file.filename, budget_ms, callback_url)
+    with source_for_upload(file) as source:
+        if source.size == 0:
+            raise HTTPException(status_code=400, detail="Empty upload")
         try:
-            exif_dict = image._getexif()
-            if exif_dict:
-                from PIL.ExifTags import TAGS
-                for tag_id, value in exif_dict.items():
-                    tag = TAGS.get(tag_id, tag_id)
-                    exif_data[str(tag)] = str(value)
-        except:
-            exif_data = {}
-        
-        # Perform forensic analysis
-        analysis_result = await forensics_engine.analyze_image(image, exif_data)
+            await job_queue.submit(job, source)
+        except BlockedCallback as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except QueueFull as e:
+            JOBS.labels('rejected').inc()
+            raise HTTPException(status_code=429, detail=str(e),
+                                headers={"Retry-After": str(e.retry_after)})
+    JOBS.labels('queued').inc()
+    
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.id}",
+        "queue_depth": await job_queue.backend.depth()
+    }
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status of a job, with its analysis result once done"""
+    job = await job_queue.backend.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job")
+    return job.to_dict()
+
+async def run_job(job: Job, source: ImageSource) -> Dict[str, Any]:
+    """Analyze one queued upload; the latency budget starts when a worker picks it up"""
+    return jsonable_encoder(await analyze_upload(job.filename, source, job.budget_ms))
+
+async def analyze_upload(filename: str, source: ImageSource, budget_ms: Optional[float] = None,
+                         start_time: Optional[float] = None,
+                         exif_data: Optional[Dict[str, str]] = None,
+                         reuse_near_duplicate: bool = False,
+                         shed: bool = False) -> EnhancedAnalysisResult:
+    """Analyze one uploaded image, going through the result cache
+    
+    With `budget_ms`, time already spent since `start_time` (default: now)
+    counts against the budget. `exif_data` holds tags parsed earlier, which
+    are then not parsed again. Images missing from the result cache are
+    looked up in the near-duplicate index; with `reuse_near_duplicate` a
+    match's verdict is returned without analyzing. With `shed`, an analysis
+    that admission control can't start in time raises AdmissionRejected.
+    """
+    start_time = start_time or time.perf_counter()
+    
+    # Identical uploads share one computation and its cached result
+    hash_start = time.perf_counter()
+    digest = await asyncio.to_thread(source.sha256)
+    STAGE_SECONDS.labels('hash').observe(time.perf_counter() - hash_start)
+    IMAGE_BYTES.observe(source.size)
+    cache_key = ResultCache.key_for_digest(digest, forensics_engine.versions)
+    
+    def is_complete(result: Dict[str, Any]) -> bool:
+        return all(details.get('success', False) for details in result['algorithm_details'].values())
+    
+    # A cached complete result is immediate, whatever the budget
+    analysis_result, cache_status = await result_cache.get(cache_key)
+    near_duplicate = None
+    if analysis_result is None:
+        # Resized or re-encoded copies of analyzed images miss the byte-level cache
+        hashes = await perceptual_hashes(source)
+        if hashes is not None:
+            near_duplicate = find_near_duplicate(hashes)
+        if near_duplicate is not None and reuse_near_duplicate:
+            CACHE_LOOKUPS.labels('near_duplicate').inc()
+            return near_duplicate_result(filename, near_duplicate)
         
-        # Generate recommendations
-        recommendations = generate_recommendations(analysis_result)
+        if budget_ms is None:
+            analysis_result, cache_status = await result_cache.get_or_compute(
+                cache_key,
+                lambda: analyze_contents(source, exif_data=exif_data, shed=shed),
+                should_store=is_complete
+            )
+            if cache_status == 'miss' and hashes is not None and is_complete(analysis_result):
+                similarity_index.add(digest, hashes, analysis_result['final_score'],
+                                     analysis_result['risk_level'],
+                                     analysis_result['is_potentially_edited'])
+        else:
+            # Budgeted results depend on timing, so they are coalesced but never stored or indexed
+            budget_key = ResultCache.key_for_digest(
+                digest, {**forensics_engine.versions, 'budget_ms': str(budget_ms)}
+            )
+            analysis_result, cache_status = await result_cache.get_or_compute(
+                budget_key,
+                lambda: analyze_contents(source, budget_ms, start_time, exif_data, shed),
+                should_store=lambda result: False
+            )
+    
+    CACHE_LOOKUPS.labels(cache_status).inc()
+    if cache_status == 'miss':
+        record_analysis(analysis_result)
+        if analysis_store is not None and not analysis_store.record(
+            digest, analysis_result, forensics_engine.versions, filename, budget_ms
+        ):
+            ANALYSIS_STORE_ROWS.labels('dropped').inc()
+    
+    # Generate recommendations
+    recommendations = generate_recommendations(analysis_result)
+    timings = analysis_result['stage_timings_ms'] if cache_status == 'miss' else {}
+    peak_allocation = (analysis_result.get('peak_allocation') if cache_status == 'miss' else None) or {}
+    
+    return EnhancedAnalysisResult(
+        filename=filename,
+        is_potentially_edited=analysis_result['is_potentially_edited'],
+        confidence_score=analysis_result['final_score'],
+        risk_level=analysis_result['risk_level'],
+        analysis_details=analysis_result['individual_scores'],
+        detection_methods=analysis_result['analyzers_run'],
+        recommendations=recommendations,
+        algorithm_details=analysis_result['algorithm_details'],
+        cache_status=cache_status,
+        analysis_resolution=analysis_result['analysis_resolution'],
+        tile_grid=analysis_result.get('tile_grid'),
+        analyzers_run=analysis_result['analyzers_run'],
+        analyzers_skipped=analysis_result['analyzers_skipped'],
+        near_duplicate=near_duplicate,
+        frame_timeline=analysis_result.get('frame_timeline'),
+        queue_wait_ms=timings.get('admission_wait'),
+        compute_ms=timings.get('compute'),
+        stage_timings_ms=timings,
+        peak_allocation_bytes=peak_allocation.get('peak_bytes'),
+        peak_allocation_overlapped=peak_allocation.get('overlapped')
+    )
+
+async def perceptual_hashes(source: ImageSource) -> Optional[Tuple[int, int]]:
+    """pHash and dHash of an upload; None when the index is disabled or the image is blank"""
+    if similarity_index is None:
+        return None
+    start_time = time.perf_counter()
+    try:
+        return await asyncio.to_thread(hash_source, source)
+    except Exception:
+        # Undecodable images are reported by the analysis itself
+        return None
+    finally:
+        STAGE_SECONDS.labels('perceptual_hash').observe(time.perf_counter() - start_time)
+
+def find_near_duplicate(hashes: Tuple[int, int]) -> Optional[Dict[str, Any]]:
+    """Closest analyzed image within SIMILARITY_MAX_DISTANCE, if any"""
+    start_time = time.perf_counter()
+    matches = similarity_index.lookup(hashes)
+    STAGE_SECONDS.labels('similarity_lookup').observe(time.perf_counter() - start_time)
+    NEAR_DUPLICATE_LOOKUPS.labels('match' if matches else 'none').inc()
+    return matches[0] if matches else None
+
+def near_duplicate_result(filename: str, match: Dict[str, Any]) -> EnhancedAnalysisResult:
+    """Response carrying the verdict of an already analyzed near-duplicate"""
+    recommendations = [
+        f"Near-duplicate of previously analyzed image {match['digest']} "
+        f"({match['distance']} differing hash bits) - verdict reused without analyzing this copy"
+    ]
+    recommendations += generate_recommendations({'individual_scores': {}, 'risk_level': match['risk_level']})
+    return EnhancedAnalysisResult(
+        filename=filename,
+        is_potentially_edited=match['is_potentially_edited'],
+        confidence_score=match['score'],
+        risk_level=match['risk_level'],
+        analysis_details={},
+        detection_methods=[],
+        recommendations=recommendations,
+        cache_status='near_duplicate',
+        near_duplicate=match
+    )
+
+async def analyze_contents(source: ImageSource, budget_ms: Optional[float] = None,
+                           start_time: Optional[float] = None,
+                           exif_data: Optional[Dict[str, str]] = None,
+                           shed: bool = False) -> Dict[str, Any]:
+    """Decode an uploaded image and run the forensics engine on it, once admitted
+    
+    Admission is charged the megapixels from the image header, read before
+    anything is decoded. The wait is reported as the `admission_wait` stage,
+    apart from `compute` (decoding and analysis).
+    """
+    if admission is None:
+        return await decode_and_analyze(source, budget_ms, start_time, exif_data)
+    
+    size = await asyncio.to_thread(read_size, source)
+    megapixels = size[0] * size[1] / 1e6 if size else 0.0
+    async with admission.admit(megapixels, shed) as wait_seconds:
+        ADMISSIONS.labels('queued' if wait_seconds > 0 else 'admitted').inc()
+        analysis_result = await decode_and_analyze(source, budget_ms, start_time, exif_data)
+    analysis_result['stage_timings_ms']['admission_wait'] = round(wait_seconds * 1000, 2)
+    return analysis_result
+
+async def decode_and_analyze(source: ImageSource, budget_ms: Optional[float] = None,
+                             start_time: Optional[float] = None,
+                             exif_data: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """Decode an uploaded image and run the forensics engine on it"""
+    compute_start = time.perf_counter()
+    with ANALYSES_IN_PROGRESS.track_inprogress():
+        # Decode at the resolutions the analyzers need (EXIF is read before conversion)
+        decoded = await asyncio.to_thread(decode_for_analysis, source,
+                                          forensics_engine.resolution_policy,
+                                          forensics_engine.pixel_analyzers,
+                                          exif_data, forensics_engine.frame_policy)
+        width, height = decoded.original_size
+        IMAGE_MEGAPIXELS.observe(width * height / 1e6)
         
-        return EnhancedAnalysisResult(
-            filename=file.filename,
-            is_potentially_edited=analysis_result['is_potentially_edited'],
-            confidence_score=analysis_result['final_score'],
-            risk_level=analysis_result['risk_level'],
-            analysis_details=analysis_result['individual_scores'],
-            detection_methods=list(forensics_engine.algorithms.keys()),
-            recommendations=recommendations
-        )
+        # Hashing and decoding already used part of the budget
+        if budget_ms is not None:
+            budget_ms -= (time.perf_counter() - start_time) * 1000
         
-    except Exception as e:
-        return JSONResponse(content={"error": str(e)}, status_code=400)
+        # Perform forensic analysis
+        if decoded.frame_count > 1:
+            # Animated and multi-page images: sampled frames, decoded one at a time
+            frames = iter_sampled_frames(source, forensics_engine.frame_policy,
+                                         forensics_engine.resolution_policy,
+                                         forensics_engine.pixel_analyzers)
+            analysis_result = await analyze_frames(forensics_engine, frames, decoded.exif_data,
+                                                   decoded.original_size, decoded.frame_count,
+                                                   budget_ms)
+        else:
+            analysis_result = await forensics_engine.analyze_image(
+                decoded.full, decoded.exif_data,
+                reduced_image=decoded.reduced,
+                original_size=decoded.original_size,
+                budget_ms=budget_ms,
+                quantization=decoded.quantization,
+                signature=decoded.signature
+            )
+    
+    analysis_result['stage_timings_ms'] = {**decoded.timings_ms, **analysis_result['stage_timings_ms'],
+                                           'compute': round((time.perf_counter() - compute_start) * 1000, 2)}
+    return analysis_result
 
 def generate_recommendations(analysis_result: Dict[str, Any]) -> List[str]:
     """Generate recommendations based on analysis results"""
@@ -102,6 +661,57 @@ async def health_check():
     """Advanced verification service health check"""
     return HealthResponse(service="verification-service", status="healthy")
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness: 200 once warm-up has finished, 503 while it runs or after it failed"""
+    if warm_up_task is None:
+        return {"service": "verification-service", "status": "ready", "warm_up": "disabled"}
+    if not warm_up_task.done():
+        return JSONResponse(status_code=503,
+                            content={"service": "verification-service", "status": "warming_up"})
+    return JSONResponse(status_code=200 if warm_up_report["status"] == "ready" else 503,
+                        content={"service": "verification-service", **warm_up_report})
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: stage and analyzer latencies, image sizes, errors"""
+    return metrics_response()
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Result cache hit/miss/eviction counters"""
+    return result_cache.stats
+
+@app.get("/similarity/stats")
+async def similarity_stats():
+    """Near-duplicate index occupancy"""
+    if similarity_index is None:
+        return {"enabled": False}
+    return {"enabled": True, **similarity_index.stats}
+
+@app.get("/analyses")
+async def list_analyses(sha256: Optional[str] = Query(None, min_length=64, max_length=64),
+                        risk_level: Optional[str] = Query(None),
+                        since: Optional[datetime] = Query(None),
+                        until: Optional[datetime] = Query(None),
+                        limit: int = Query(100, ge=1, le=1000)):
+    """Stored verdicts, newest first, by content hash, risk level and/or time range"""
+    if analysis_store is None:
+        raise HTTPException(status_code=503, detail="Analysis store is disabled")
+    if risk_level is not None and risk_level not in ("low", "medium", "high"):
+        raise HTTPException(status_code=400, detail="risk_level must be low, medium or high")
+    return {"analyses": await analysis_store.query(sha256, risk_level, since, until, limit)}
+
+@app.get("/analyses/engines/{fingerprint}")
+async def analysis_engine_versions(fingerprint: str):
+    """Engine and analyzer versions behind stored verdicts with this engine_fingerprint"""
+    if analysis_store is None:
+        raise HTTPException(status_code=503, detail="Analysis store is disabled")
+    versions = await analysis_store.versions(fingerprint)
+    if versions is None:
+        raise HTTPException(status_code=404, detail="Unknown engine fingerprint")
+    return {"fingerprint": fingerprint, "versions": versions}
+
 @app.get("/algorithms")
 async def list_algorithms():
     """List available forensic algorithms"""
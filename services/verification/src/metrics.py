@@ -0,0 +1,170 @@
+# services/verification/src/metrics.py
+import time
+from typing import Any, Dict, Optional
+from fastapi import Response
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+# Seconds, from header parsing up to tiled analyses of very large images
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+MEGAPIXEL_BUCKETS = (0.3, 1, 2, 4, 8, 12, 16, 24, 50, 100, 200)
+BYTE_BUCKETS = tuple(64 * 1024 * 4 ** i for i in range(8))  # 64 KiB .. 1 GiB
+
+REQUEST_SECONDS = Histogram(
+    'http_request_duration_seconds', 'HTTP request latency',
+    ['method', 'route', 'status'], buckets=LATENCY_BUCKETS
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    'http_requests_in_progress', 'HTTP requests currently being served', ['method', 'route']
+)
+
+STAGE_SECONDS = Histogram(
+    'verification_stage_duration_seconds',
+    'Pipeline stage latency (hash, decode, analysis, recompression, tiles)',
+    ['stage'], buckets=LATENCY_BUCKETS
+)
+ANALYZER_SECONDS = Histogram(
+    'verification_analyzer_duration_seconds', 'Latency of each forensic analyzer',
+    ['algorithm'], buckets=LATENCY_BUCKETS
+)
+JPEG_ENCODE_SECONDS = Histogram(
+    'verification_jpeg_encode_duration_seconds', 'JPEG re-encode and diff latency per quality',
+    ['quality'], buckets=LATENCY_BUCKETS
+)
+ANALYZER_ERRORS = Counter(
+    'verification_analyzer_errors_total', 'Analyzer runs that failed', ['algorithm']
+)
+ANALYZERS_SKIPPED = Counter(
+    'verification_analyzers_skipped_total', 'Analyzers skipped by early exit or latency budget',
+    ['algorithm', 'reason']
+)
+CACHE_LOOKUPS = Counter(
+    'verification_cache_lookups_total', 'Result cache outcomes', ['status']
+)
+NEAR_DUPLICATE_LOOKUPS = Counter(
+    'verification_near_duplicate_lookups_total', 'Near-duplicate index lookups (match, none)', ['outcome']
+)
+IMAGE_MEGAPIXELS = Histogram(
+    'verification_image_megapixels', 'Source image size in megapixels', buckets=MEGAPIXEL_BUCKETS
+)
+IMAGE_BYTES = Histogram(
+    'verification_image_bytes', 'Uploaded image size in bytes', buckets=BYTE_BUCKETS
+)
+ANALYSES_IN_PROGRESS = Gauge(
+    'verification_analyses_in_progress', 'Images currently being decoded or analyzed'
+)
+ADMISSIONS = Counter(
+    'verification_admissions_total',
+    'Admission control decisions (admitted, queued, rejected_queue_full, rejected_wait, rejected_timeout)',
+    ['outcome']
+)
+ADMISSION_MEGAPIXELS_IN_USE = Gauge(
+    'verification_admission_megapixels_in_use', 'Megapixels held by running analyses'
+)
+ADMISSION_WAITING = Gauge(
+    'verification_admission_waiting', 'Analyses waiting for admission'
+)
+ANALYSIS_PEAK_ALLOCATION_BYTES = Histogram(
+    'verification_analysis_peak_allocation_bytes',
+    'Peak bytes allocated by one analysis (ANALYSIS_TRACE_ALLOCATIONS); overlapped ones are upper bounds',
+    ['overlapped'], buckets=BYTE_BUCKETS
+)
+
+JOBS = Counter(
+    'verification_jobs_total', 'Asynchronous jobs by outcome (queued, rejected, done, failed)', ['status']
+)
+JOB_QUEUE_SECONDS = Histogram(
+    'verification_job_queue_seconds', 'Time jobs waited for a worker', buckets=LATENCY_BUCKETS
+)
+JOB_RUN_SECONDS = Histogram(
+    'verification_job_run_seconds', 'Time workers spent on each job', buckets=LATENCY_BUCKETS
+)
+
+ANALYSIS_STORE_ROWS = Counter(
+    'verification_analysis_store_rows_total', 'Verdicts sent to the analysis store (written, failed, dropped)',
+    ['outcome']
+)
+ANALYSIS_STORE_FLUSH_SECONDS = Histogram(
+    'verification_analysis_store_flush_seconds', 'Latency of one batched analysis store write',
+    buckets=LATENCY_BUCKETS
+)
+
+def record_analysis(result: Dict[str, Any]):
+    """Observe the stage timings and outcomes of one computed analysis"""
+    for stage, elapsed_ms in result.get('stage_timings_ms', {}).items():
+        if stage in result['algorithm_details']:
+            ANALYZER_SECONDS.labels(stage).observe(elapsed_ms / 1000)
+        else:
+            STAGE_SECONDS.labels(stage).observe(elapsed_ms / 1000)
+    for timings in result.get('recompression_timings_ms', {}).values():
+        for quality, elapsed_ms in timings.items():
+            JPEG_ENCODE_SECONDS.labels(str(quality)).observe(elapsed_ms / 1000)
+    for algo_name, details in result['algorithm_details'].items():
+        if not details.get('success', False):
+            ANALYZER_ERRORS.labels(algo_name).inc()
+    for algo_name, skip in result.get('analyzers_skipped', {}).items():
+        ANALYZERS_SKIPPED.labels(algo_name, skip['reason']).inc()
+    peak_allocation = result.get('peak_allocation')
+    if peak_allocation:
+        ANALYSIS_PEAK_ALLOCATION_BYTES.labels(str(peak_allocation['overlapped']).lower()).observe(
+            peak_allocation['peak_bytes'])
+
+def record_job(job):
+    """Observe the outcome and timings of one finished job"""
+    JOBS.labels(job.status).inc()
+    JOB_QUEUE_SECONDS.observe(job.started_at - job.created_at)
+    JOB_RUN_SECONDS.observe(job.finished_at - job.started_at)
+
+def record_store_flush(rows: int, seconds: float, error: Optional[Exception]):
+    """Observe one batch written (or lost) by the analysis store"""
+    ANALYSIS_STORE_ROWS.labels('failed' if error else 'written').inc(rows)
+    ANALYSIS_STORE_FLUSH_SECONDS.observe(seconds)
+
+def metrics_response() -> Response:
+    """Current metrics in the Prometheus text format"""
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+class MetricsMiddleware:
+    """Request latency and in-flight gauges, labelled by route template
+
+    Route templates (not raw paths) keep label cardinality bounded;
+    unmatched paths are grouped under "other".
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        method = scope["method"]
+        in_progress = REQUESTS_IN_PROGRESS.labels(method, _route_for(scope))
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start_time = time.perf_counter()
+        in_progress.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_progress.dec()
+            # Streaming responses are timed until their last chunk
+            REQUEST_SECONDS.labels(method, _route_for(scope), str(status)).observe(
+                time.perf_counter() - start_time
+            )
+
+def _route_for(scope) -> str:
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    # Before routing, fall back to the raw path of known endpoints
+    app = scope.get("app")
+    if app is not None and any(getattr(r, "path", None) == scope["path"] for r in app.routes):
+        return scope["path"]
+    return "other"
@@ -0,0 +1,173 @@
+# services/verification/src/result_cache.py
+import asyncio
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import numpy as np
+
+class ResultCache:
+    """Content-addressed cache of analysis results
+
+    Results are keyed on the uploaded bytes plus the analyzer versions, kept
+    in a bounded in-memory LRU and optionally mirrored to a directory so they
+    survive restarts. Concurrent requests for the same key share a single
+    computation.
+    """
+
+    def __init__(self, max_entries: int = 1024, disk_dir: Optional[str] = None):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._counters = {
+            "hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "evictions": 0
+        }
+
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(contents: bytes, versions: Dict[str, str]) -> str:
+        """SHA-256 of the content, salted with the analyzer versions"""
+        digest = hashlib.sha256(contents).hexdigest()
+        return ResultCache.key_for_digest(digest, versions)
+
+    @staticmethod
+    def key_for_digest(digest: str, versions: Dict[str, str]) -> str:
+        """Cache key for an already computed content digest"""
+        salt = json.dumps(versions, sort_keys=True)
+        return hashlib.sha256(f"{digest}:{salt}".encode()).hexdigest()
+
+    async def get(self, key: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """Return (result, status) for a stored result, (None, None) otherwise
+        
+        Never computes and doesn't count misses; get_or_compute does that.
+        """
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return self._entries[key], "hit"
+
+        result = await self._load_from_disk(key)
+        if result is None:
+            return None, None
+        self._counters["disk_hits"] += 1
+        self._store(key, result)
+        return result, "disk_hit"
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Dict[str, Any]]],
+        should_store: Callable[[Dict[str, Any]], bool] = lambda result: True
+    ) -> Tuple[Dict[str, Any], str]:
+        """Return (result, status) where status is hit, disk_hit, coalesced or miss"""
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return self._entries[key], "hit"
+
+        if key in self._in_flight:
+            self._counters["coalesced"] += 1
+            return await asyncio.shield(self._in_flight[key]), "coalesced"
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            result = await self._load_from_disk(key)
+            if result is not None:
+                status = "disk_hit"
+                self._counters["disk_hits"] += 1
+            else:
+                status = "miss"
+                self._counters["misses"] += 1
+                result = await compute()
+                if not should_store(result):
+                    future.set_result(result)
+                    return result, status
+                await self._save_to_disk(key, result)
+
+            self._store(key, result)
+            future.set_result(result)
+            return result, status
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody may be waiting; don't let the loop log an unretrieved exception
+            future.exception()
+            raise
+        finally:
+            del self._in_flight[key]
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters and current occupancy"""
+        lookups = self._counters["hits"] + self._counters["disk_hits"] + self._counters["misses"]
+        return {
+            **self._counters,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "in_flight": len(self._in_flight),
+            "hit_ratio": round((lookups - self._counters["misses"]) / lookups, 3) if lookups else 0.0,
+            "disk_tier": self.disk_dir is not None
+        }
+
+    def _store(self, key: str, result: Dict[str, Any]):
+        """Insert into the LRU, evicting the least recently used entries"""
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    async def _load_from_disk(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.disk_dir:
+            return None
+        return await asyncio.to_thread(self._read_json, self._disk_path(key))
+
+    async def _save_to_disk(self, key: str, result: Dict[str, Any]):
+        if not self.disk_dir:
+            return
+        try:
+            await asyncio.to_thread(self._write_json, self._disk_path(key), result)
+        except OSError:
+            # The disk tier is best effort; the in-memory entry still serves hits
+            pass
+
+    @staticmethod
+    def _read_json(path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write_json(path: str, result: Dict[str, Any]):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(result, f, default=_to_builtin)
+        # Atomic rename so readers never see a partial file
+        os.replace(tmp_path, path)
+
+def _to_builtin(value: Any) -> Any:
+    """JSON fallback for numpy scalars and arrays in analysis results"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
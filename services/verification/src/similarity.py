@@ -0,0 +1,251 @@
+# services/verification/src/similarity.py
+import itertools
+import json
+import os
+import threading
+from array import array
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from PIL import Image, ImageOps
+from ingest import ImageSource
+
+HASH_BITS = 64
+
+# Multi-index hashing: every pHash is split into 4 substrings of 16 bits
+SUBSTRINGS = 4
+SUBSTRING_BITS = HASH_BITS // SUBSTRINGS
+
+RISK_LEVELS = ('low', 'medium', 'high')
+
+INDEX_FORMAT = 1
+
+# Below this pixel spread a thumbnail has no structure to hash (blank frames)
+MIN_THUMBNAIL_STD = 2.0
+
+# Set bits per 16-bit value, for Hamming distances on numpy < 2.0 (no bitwise_count)
+_POPCOUNT = np.array([bin(i).count('1') for i in range(1 << 16)], dtype=np.uint8)
+
+def hash_source(source: ImageSource) -> Optional[Tuple[int, int]]:
+    """pHash and dHash of an upload, from a cheap thumbnail decode
+
+    JPEGs are decoded straight at 1/8 scale by libjpeg; the hashes only
+    look at 32x32 pixels. EXIF orientation is applied first, so copies whose
+    rotation was baked in by a re-encode hash the same.
+    """
+    with source.open() as fp:
+        image = Image.open(fp)
+        image.draft('L', (64, 64))
+        image = ImageOps.exif_transpose(image).convert('L')
+    return perceptual_hashes(image)
+
+def perceptual_hashes(gray: Image.Image) -> Optional[Tuple[int, int]]:
+    """(pHash, dHash) of a grayscale image as 64-bit integers, None for blank images
+
+    pHash keeps the signs of the 8x8 lowest DCT frequencies of a 32x32
+    thumbnail around their median; dHash the horizontal brightness gradient
+    of a 9x8 one. Both survive resizing and recompression.
+    """
+    # Imported on first use, like the analyzers, to keep it out of start-up
+    import cv2
+    pixels = np.asarray(gray, dtype=np.float32)
+    thumbnail = cv2.resize(pixels, (32, 32), interpolation=cv2.INTER_AREA)
+    if thumbnail.std() < MIN_THUMBNAIL_STD:
+        return None
+    low = cv2.dct(thumbnail)[:8, :8].ravel()
+    gradient = cv2.resize(pixels, (9, 8), interpolation=cv2.INTER_AREA)
+    return _pack(low > np.median(low)), _pack((gradient[:, 1:] > gradient[:, :-1]).ravel())
+
+def _pack(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+def hamming_distances(hashes: np.ndarray, value: int) -> np.ndarray:
+    """Bits differing between each uint64 in `hashes` and `value`"""
+    differing = np.ascontiguousarray(hashes ^ np.uint64(value))
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(differing)
+    return _POPCOUNT[differing.view(np.uint16)].reshape(-1, 4).sum(axis=1)
+
+@lru_cache(maxsize=None)
+def _probe_masks(radius: int) -> Tuple[int, ...]:
+    """Every SUBSTRING_BITS-bit mask with at most `radius` bits set"""
+    return tuple(
+        sum(1 << bit for bit in bits)
+        for flipped in range(radius + 1)
+        for bits in itertools.combinations(range(SUBSTRING_BITS), flipped)
+    )
+
+class NearDuplicateIndex:
+    """Perceptual hashes of analyzed images, with their verdicts
+
+    Lookups use multi-index hashing: each pHash is split into four 16-bit
+    substrings, each with its own table. A hash within Hamming distance r of
+    the query matches it in at least one substring to within r // 4 bits,
+    so a query probes only those buckets (17 per table for r of 4 to 7) and
+    checks the candidates exactly. The cost follows bucket sizes rather than
+    the number of entries, which keeps lookups far below a millisecond with
+    millions of images. Matches must also be close in dHash, which rejects
+    chance pHash collisions between unrelated images.
+
+    Verdicts depend on the analyzers, so an index saved under a different
+    `fingerprint` (engine and analyzer versions) is not loaded.
+    """
+
+    def __init__(self, max_distance: int = 6, max_entries: int = 5_000_000,
+                 path: Optional[str] = None, fingerprint: str = ''):
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self.path = path
+        self.fingerprint = fingerprint
+        self._lock = threading.Lock()
+        self._count = 0
+        self._reset(capacity=1024)
+        if path and os.path.exists(path):
+            self._load()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def lookup(self, hashes: Tuple[int, int], max_distance: Optional[int] = None,
+               limit: int = 1) -> List[Dict[str, Any]]:
+        """Closest indexed images within `max_distance` bits, nearest first"""
+        max_distance = self.max_distance if max_distance is None else max_distance
+        phash, dhash = hashes
+        with self._lock:
+            ids = self._candidates(phash, max_distance // SUBSTRINGS)
+            if len(ids) == 0:
+                return []
+            distances = hamming_distances(self._phash[ids], phash)
+            close = distances <= max_distance
+            # Entries close in several substrings were found in several buckets
+            ids, first = np.unique(ids[close], return_index=True)
+            distances = distances[close][first]
+            dhash_distances = hamming_distances(self._dhash[ids], dhash)
+            close = dhash_distances <= max_distance
+            ids, distances, dhash_distances = ids[close], distances[close], dhash_distances[close]
+            order = np.lexsort((dhash_distances, distances))[:limit]
+            return [self._entry(ids[i], distances[i], dhash_distances[i]) for i in order]
+
+    def add(self, digest: str, hashes: Tuple[int, int], score: float, risk_level: str,
+            is_potentially_edited: bool) -> bool:
+        """Index an analyzed image; False when full or already indexed"""
+        phash, dhash = hashes
+        raw_digest = bytes.fromhex(digest)
+        with self._lock:
+            if self._count >= self.max_entries:
+                return False
+            # Exact pHash buckets hold any earlier entry for the same bytes
+            ids = self._candidates(phash, 0)
+            if len(ids) and np.any(np.all(self._digest[ids] == np.frombuffer(raw_digest, np.uint8), axis=1)):
+                return False
+            if self._count == len(self._phash):
+                self._grow()
+
+            entry_id = self._count
+            self._phash[entry_id] = phash
+            self._dhash[entry_id] = dhash
+            self._digest[entry_id] = np.frombuffer(raw_digest, np.uint8)
+            self._score[entry_id] = score
+            self._risk[entry_id] = RISK_LEVELS.index(risk_level)
+            self._edited[entry_id] = is_potentially_edited
+            for table, key in zip(self._tables, _substrings(phash)):
+                table.setdefault(key, array('I')).append(entry_id)
+            self._count += 1
+            return True
+
+    def save(self):
+        """Write the index to `path` (atomically), if one is configured"""
+        if not self.path:
+            return
+        with self._lock:
+            count = self._count
+            arrays = {name: getattr(self, f"_{name}")[:count].copy()
+                      for name in ('phash', 'dhash', 'digest', 'score', 'risk', 'edited')}
+        header = json.dumps({'format': INDEX_FORMAT, 'fingerprint': self.fingerprint})
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'wb') as f:
+            np.savez(f, header=np.array(header), **arrays)
+        os.replace(temp_path, self.path)
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            buckets = [len(table) for table in self._tables]
+        return {
+            'entries': self._count,
+            'max_entries': self.max_entries,
+            'max_distance': self.max_distance,
+            'buckets': buckets,
+            'persistent': self.path is not None
+        }
+
+    def _candidates(self, phash: int, radius: int) -> np.ndarray:
+        masks = _probe_masks(radius)
+        buckets = [
+            bucket
+            for table, key in zip(self._tables, _substrings(phash))
+            for bucket in (table.get(key ^ mask) for mask in masks)
+            if bucket
+        ]
+        # May repeat ids; callers deduplicate what survives the distance check
+        return np.frombuffer(b''.join(buckets), dtype=np.uint32)
+
+    def _entry(self, entry_id: int, distance: int, dhash_distance: int) -> Dict[str, Any]:
+        return {
+            'digest': self._digest[entry_id].tobytes().hex(),
+            'distance': int(distance),
+            'dhash_distance': int(dhash_distance),
+            'score': round(float(self._score[entry_id]), 3),
+            'risk_level': RISK_LEVELS[self._risk[entry_id]],
+            'is_potentially_edited': bool(self._edited[entry_id])
+        }
+
+    def _reset(self, capacity: int):
+        self._phash = np.zeros(capacity, dtype=np.uint64)
+        self._dhash = np.zeros(capacity, dtype=np.uint64)
+        # Raw SHA-256 bytes (fixed-width byte strings would drop trailing zeros)
+        self._digest = np.zeros((capacity, 32), dtype=np.uint8)
+        self._score = np.zeros(capacity, dtype=np.float32)
+        self._risk = np.zeros(capacity, dtype=np.uint8)
+        self._edited = np.zeros(capacity, dtype=bool)
+        self._tables: List[Dict[int, array]] = [{} for _ in range(SUBSTRINGS)]
+
+    def _grow(self):
+        """Double the capacity of the per-entry arrays"""
+        for name in ('phash', 'dhash', 'digest', 'score', 'risk', 'edited'):
+            current = getattr(self, f"_{name}")
+            grown = np.zeros((len(current) * 2,) + current.shape[1:], dtype=current.dtype)
+            grown[:len(current)] = current
+            setattr(self, f"_{name}", grown)
+
+    def _load(self):
+        try:
+            with np.load(self.path) as saved:
+                header = json.loads(str(saved['header']))
+                if header.get('format') != INDEX_FORMAT or header.get('fingerprint') != self.fingerprint:
+                    # Verdicts from other analyzer versions would be stale
+                    return
+                arrays = {name: saved[name] for name in ('phash', 'dhash', 'digest', 'score', 'risk', 'edited')}
+        except (OSError, ValueError, KeyError):
+            return
+
+        count = min(len(arrays['phash']), self.max_entries)
+        self._reset(capacity=max(1024, count))
+        for name, values in arrays.items():
+            getattr(self, f"_{name}")[:count] = values[:count]
+        self._count = count
+
+        # Bulk-build the tables: group entry ids by substring value
+        for shift, table in zip(_shifts(), self._tables):
+            keys = ((self._phash[:count] >> np.uint64(shift)) & np.uint64(0xFFFF)).astype(np.int64)
+            order = np.argsort(keys, kind='stable')
+            values, starts = np.unique(keys[order], return_index=True)
+            for key, ids in zip(values, np.split(order.astype(np.uint32), starts[1:])):
+                table[int(key)] = array('I', ids.tobytes())
+
+def _shifts() -> range:
+    return range(HASH_BITS - SUBSTRING_BITS, -1, -SUBSTRING_BITS)
+
+def _substrings(value: int) -> List[int]:
+    mask = (1 << SUBSTRING_BITS) - 1
+    return [(value >> shift) & mask for shift in _shifts()]
@@ -0,0 +1,81 @@
+# services/verification/src/tiling.py
+import math
+from dataclasses import dataclass
+from typing import Iterator, Tuple
+import numpy as np
+from PIL import Image
+
+@dataclass
+class TilingPolicy:
+    """When and how full-resolution analyzers switch to tiled execution
+
+    Tile cores and margins are multiples of 16 so every tile starts on the
+    JPEG MCU grid: re-encoding a tile then yields the same blocks as
+    re-encoding the whole image. The margin also gives the noise analyzer's
+    Laplacian and overlapping blocks the context they need beyond the core.
+    """
+    min_megapixels: float = 64.0
+    tile_size: int = 1024
+    margin: int = 64
+
+    def __post_init__(self):
+        if self.tile_size <= 0 or self.tile_size % 16 or self.margin % 16:
+            raise ValueError("tile_size and margin must be multiples of 16 (the JPEG MCU size)")
+        if self.margin < 64:
+            raise ValueError("margin must cover the largest noise block (64 pixels)")
+
+    def applies(self, size: Tuple[int, int]) -> bool:
+        """Whether an image of (width, height) `size` is analyzed in tiles"""
+        return self.min_megapixels > 0 and size[0] * size[1] / 1e6 > self.min_megapixels
+
+    def grid_shape(self, size: Tuple[int, int]) -> Tuple[int, int]:
+        """(rows, cols) of the tile grid for an image of (width, height) `size`"""
+        return math.ceil(size[1] / self.tile_size), math.ceil(size[0] / self.tile_size)
+
+@dataclass
+class Tile:
+    """One tile: pixels of the core plus margins, and where the core sits"""
+    row: int
+    col: int
+    origin: Tuple[int, int]        # (y, x) of `pixels` in the image
+    core: Tuple[slice, slice]      # core region within `pixels`
+    image_shape: Tuple[int, int]   # (height, width) of the whole image
+    pixels: np.ndarray
+
+    @property
+    def core_origin(self) -> Tuple[int, int]:
+        """(y, x) of the core in the image"""
+        return self.origin[0] + self.core[0].start, self.origin[1] + self.core[1].start
+
+    @property
+    def core_end(self) -> Tuple[int, int]:
+        """(y, x) one past the core's last pixel in the image"""
+        return self.origin[0] + self.core[0].stop, self.origin[1] + self.core[1].stop
+
+def iter_tiles(image: Image.Image, policy: TilingPolicy) -> Iterator[Tile]:
+    """Yield overlapping tiles in row-major order
+
+    Each tile is cropped from the decoded image on demand, so only one
+    tile-sized array exists at a time.
+    """
+    width, height = image.size
+    rows, cols = policy.grid_shape(image.size)
+
+    for row in range(rows):
+        for col in range(cols):
+            core_y, core_x = row * policy.tile_size, col * policy.tile_size
+            core_y_end = min(height, core_y + policy.tile_size)
+            core_x_end = min(width, core_x + policy.tile_size)
+
+            y0, x0 = max(0, core_y - policy.margin), max(0, core_x - policy.margin)
+            y1 = min(height, core_y_end + policy.margin)
+            x1 = min(width, core_x_end + policy.margin)
+
+            yield Tile(
+                row=row,
+                col=col,
+                origin=(y0, x0),
+                core=(slice(core_y - y0, core_y_end - y0), slice(core_x - x0, core_x_end - x0)),
+                image_shape=(height, width),
+                pixels=np.asarray(image.crop((x0, y0, x1, y1)))
+            )
@@ -0,0 +1,104 @@
+# services/verification/tests/test_admission.py
+import asyncio
+import pytest
+
+from admission import MIN_COST_MEGAPIXELS, AdmissionController, AdmissionRejected
+
+async def hold(controller: AdmissionController, megapixels: float, release: asyncio.Event,
+               order: list, shed: bool = False):
+    async with controller.admit(megapixels, shed) as wait_seconds:
+        order.append((megapixels, wait_seconds > 0))
+        await release.wait()
+
+def test_analyses_hold_their_megapixels():
+    async def run():
+        controller = AdmissionController(capacity=12.0)
+        release, order = asyncio.Event(), []
+        tasks = [asyncio.create_task(hold(controller, megapixels, release, order))
+                 for megapixels in (8.0, 4.0, 0.01)]
+        await asyncio.sleep(0.01)
+        # 8 + 4 fill the capacity; the tiny image is charged the minimum and waits
+        held = controller.in_use, controller.waiting
+        release.set()
+        await asyncio.gather(*tasks)
+        return held, order, controller.in_use
+
+    (in_use, waiting), order, released = asyncio.run(run())
+    assert (in_use, waiting) == (12.0, 1)
+    assert order == [(8.0, False), (4.0, False), (0.01, True)]
+    assert released == 0.0
+
+def test_image_larger_than_the_capacity_runs_alone():
+    async def run():
+        controller = AdmissionController(capacity=12.0)
+        async with controller.admit(200.0) as wait_seconds:
+            return wait_seconds, controller.in_use
+
+    assert asyncio.run(run()) == (0.0, 12.0)
+
+def test_queued_large_image_is_not_overtaken():
+    async def run():
+        controller = AdmissionController(capacity=4.0)
+        first, rest, order = asyncio.Event(), asyncio.Event(), []
+        running = asyncio.create_task(hold(controller, 3.0, first, order))
+        await asyncio.sleep(0.01)
+        large = asyncio.create_task(hold(controller, 4.0, rest, order))
+        await asyncio.sleep(0.01)
+        # Fits next to the running analysis, but arrived after the large one
+        small = asyncio.create_task(hold(controller, 1.0, rest, order))
+        await asyncio.sleep(0.01)
+        blocked = [megapixels for megapixels, _ in order]
+        first.set()
+        await running
+        await asyncio.sleep(0.01)
+        rest.set()
+        await asyncio.gather(large, small)
+        return blocked, order
+
+    blocked, order = asyncio.run(run())
+    assert blocked == [3.0]
+    assert order == [(3.0, False), (4.0, True), (1.0, True)]
+
+def test_sheddable_request_is_rejected_when_the_queue_is_full():
+    async def run():
+        controller = AdmissionController(capacity=1.0, max_waiting=1)
+        release, order = asyncio.Event(), []
+        running = asyncio.create_task(hold(controller, 1.0, release, order))
+        queued = asyncio.create_task(hold(controller, 1.0, release, order, shed=True))
+        await asyncio.sleep(0.01)
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with controller.admit(1.0):
+                pass
+        # Unsheddable work (jobs, batches) still queues
+        unsheddable = asyncio.create_task(hold(controller, 1.0, release, order, shed=False))
+        await asyncio.sleep(0.01)
+        waiting = controller.waiting
+        release.set()
+        await asyncio.gather(running, queued, unsheddable)
+        return rejected.value, waiting
+
+    rejection, waiting = asyncio.run(run())
+    assert rejection.reason == 'queue_full'
+    assert rejection.retry_after >= 1
+    assert waiting == 2
+
+def test_sheddable_request_gives_up_after_max_wait():
+    async def run():
+        controller = AdmissionController(capacity=1.0, max_wait=0.05)
+        # Keep the estimate under max_wait so the request queues instead of being rejected at once
+        controller.average_seconds = 0.01
+        release = asyncio.Event()
+        running = asyncio.create_task(hold(controller, 1.0, release, []))
+        await asyncio.sleep(0.01)
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with controller.admit(MIN_COST_MEGAPIXELS):
+                pass
+        waiting = controller.waiting
+        release.set()
+        await running
+        return rejected.value, waiting, controller.in_use
+
+    rejection, waiting, in_use = asyncio.run(run())
+    assert rejection.reason == 'timeout'
+    assert waiting == 0
+    assert in_use == 0.0
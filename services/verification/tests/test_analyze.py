@@ -0,0 +1,116 @@
+# services/verification/tests/test_analyze.py
+import asyncio
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from fastapi.testclient import TestClient
+from PIL import Image
+
+os.environ.setdefault('ANALYSIS_WARM_UP', 'false')
+
+import main
+from admission import AdmissionController
+from allocation_tracker import AllocationTracker
+
+def jpeg(seed: int) -> bytes:
+    pixels = np.random.default_rng(seed).integers(0, 256, (480, 640, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+def test_computed_result_reports_timings_and_peak_allocation(monkeypatch):
+    monkeypatch.setattr(main.forensics_engine, 'allocation_tracker', AllocationTracker())
+    contents = jpeg(seed=1)
+    with TestClient(main.app) as client:
+        first = client.post('/analyze', files={'file': ('a.jpg', contents, 'image/jpeg')}).json()
+        second = client.post('/analyze', files={'file': ('a.jpg', contents, 'image/jpeg')}).json()
+
+    assert first['cache_status'] == 'miss'
+    assert first['stage_timings_ms']['compute'] == first['compute_ms']
+    assert set(first['analyzers_run']) <= set(first['stage_timings_ms'])
+    assert first['peak_allocation_bytes'] > 0
+    assert first['peak_allocation_overlapped'] is False
+
+    assert second['cache_status'] == 'hit'
+    assert second['stage_timings_ms'] == {}
+    assert second['peak_allocation_bytes'] is None
+
+def test_job_with_internal_callback_is_refused_before_queueing():
+    with TestClient(main.app) as client:
+        response = client.post('/jobs', params={'callback_url': 'http://169.254.169.254/latest/meta-data/'},
+                               files={'file': ('a.jpg', jpeg(seed=2), 'image/jpeg')})
+        queued = main.job_queue.backend._queue.qsize()
+    assert response.status_code == 400
+    assert 'not a public address' in response.json()['detail']
+    assert queued == 0
+
+def test_stored_image_is_analyzed_from_the_blob_store(monkeypatch, tmp_path):
+    from blobstore import BlobStore
+    from ingest import BytesSource
+    monkeypatch.setattr(main, 'blob_store', BlobStore(root=str(tmp_path), max_age=0))
+    handle = main.blob_store.put(BytesSource(jpeg(seed=3)), {'filename': 'stored.jpg', 'exif': {}})
+    with TestClient(main.app) as client:
+        found = client.post(f'/analyze/stored/{handle}')
+        missing = client.post(f'/analyze/stored/{"0" * 64}')
+    assert found.status_code == 200
+    assert found.json()['filename'] == 'stored.jpg'
+    assert missing.status_code == 404
+
+def test_analyze_over_capacity_is_503_with_retry_after(monkeypatch):
+    controller = AdmissionController(capacity=1.0, max_waiting=0)
+    monkeypatch.setattr(main, 'admission', controller)
+    # Another analysis holds the whole capacity and nothing may queue behind it
+    controller.in_use = controller.capacity
+    with TestClient(main.app) as client:
+        shed = client.post('/analyze', files={'file': ('a.jpg', jpeg(seed=4), 'image/jpeg')})
+        controller.in_use = 0.0
+        admitted = client.post('/analyze', files={'file': ('a.jpg', jpeg(seed=4), 'image/jpeg')})
+
+    assert shed.status_code == 503
+    assert 'queue full' in shed.json()['detail']
+    assert int(shed.headers['Retry-After']) >= 1
+    # A shed request is not cached: the retry is analyzed
+    assert admitted.status_code == 200
+    assert admitted.json()['cache_status'] == 'miss'
+    assert controller.in_use == 0.0
+
+def test_analyze_expected_to_wait_too_long_is_503_with_its_estimate(monkeypatch):
+    controller = AdmissionController(capacity=1.0, max_waiting=4, max_wait=10.0)
+    monkeypatch.setattr(main, 'admission', controller)
+    controller.in_use = controller.capacity
+    controller.average_seconds = 100.0
+    with TestClient(main.app) as client:
+        response = client.post('/analyze', files={'file': ('a.jpg', jpeg(seed=5), 'image/jpeg')})
+
+    # 640x480 is charged 0.3072 MP: all of it must turn over at 100 s per capacity
+    assert response.status_code == 503
+    assert 'wait' in response.json()['detail']
+    assert response.headers['Retry-After'] == '31'
+    assert controller.waiting == 0
+
+def test_identical_concurrent_uploads_share_one_analysis(monkeypatch):
+    analyze_contents = main.analyze_contents
+    coalesced = main.result_cache.stats['coalesced']
+    calls = []
+
+    async def slow_analyze_contents(*args, **kwargs):
+        calls.append(args)
+        # Hold the computation until the second upload has joined it
+        for _ in range(500):
+            if main.result_cache.stats['coalesced'] > coalesced:
+                break
+            await asyncio.sleep(0.01)
+        return await analyze_contents(*args, **kwargs)
+
+    monkeypatch.setattr(main, 'analyze_contents', slow_analyze_contents)
+    contents = jpeg(seed=6)
+    with TestClient(main.app) as client, ThreadPoolExecutor(2) as pool:
+        responses = list(pool.map(
+            lambda _: client.post('/analyze', files={'file': ('a.jpg', contents, 'image/jpeg')}).json(),
+            range(2)
+        ))
+
+    assert len(calls) == 1
+    assert sorted(response['cache_status'] for response in responses) == ['coalesced', 'miss']
+    assert responses[0]['confidence_score'] == responses[1]['confidence_score']
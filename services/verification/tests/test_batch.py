@@ -0,0 +1,54 @@
+# services/verification/tests/test_batch.py
+import asyncio
+import io
+import tarfile
+import zipfile
+import pytest
+from fastapi import UploadFile
+
+from batch import BatchItem, _read_bounded, iter_batch_items, stream_batch
+
+def zip_upload(members) -> UploadFile:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    buffer.seek(0)
+    return UploadFile(buffer, filename='images.zip')
+
+def tar_upload(members) -> UploadFile:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w:gz') as archive:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    buffer.seek(0)
+    return UploadFile(buffer, filename='images.tar.gz')
+
+async def read_item(item: BatchItem):
+    with await item.open() as source:
+        return {'filename': item.filename, 'size': source.size}
+
+def run_batch(upload: UploadFile, max_member_bytes: int):
+    async def run():
+        return [line async for line in stream_batch(iter_batch_items([upload], max_member_bytes),
+                                                    read_item, max_concurrency=2)]
+    return sorted(asyncio.run(run()), key=lambda line: line['index'])
+
+@pytest.mark.parametrize('upload', [zip_upload, tar_upload])
+def test_oversized_archive_member_is_reported_not_read(upload):
+    # Zeros compress to almost nothing: a small archive, a large member
+    lines = run_batch(upload({'small.jpg': b'\xff' * 100, 'bomb.jpg': bytes(10 ** 6)}),
+                      max_member_bytes=1000)
+
+    assert lines[0]['filename'].endswith('/small.jpg')
+    assert lines[0]['size'] == 100
+    assert lines[1]['filename'].endswith('/bomb.jpg')
+    assert 'larger than' in lines[1]['error']
+    assert 'size' not in lines[1]
+
+def test_member_read_stops_at_the_limit_whatever_the_header_says():
+    with pytest.raises(ValueError, match='larger than'):
+        _read_bounded(io.BytesIO(bytes(2000)), 1000)
+    assert _read_bounded(io.BytesIO(bytes(1000)), 1000) == bytes(1000)
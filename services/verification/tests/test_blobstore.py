@@ -0,0 +1,48 @@
+# services/verification/tests/test_blobstore.py
+import os
+import threading
+import time
+
+from blobstore import BlobStore
+from ingest import BytesSource
+
+def test_put_sweeps_in_the_background(tmp_path):
+    store = BlobStore(root=str(tmp_path), max_age=60)
+    stale = store.put(BytesSource(b'stale'))
+    stale_path = os.path.join(tmp_path, stale[:2], stale)
+    old = time.time() - 120
+    os.utime(stale_path, (old, old))
+    store._last_sweep = old
+
+    started, release = threading.Event(), threading.Event()
+    sweep = store.sweep
+    def blocking_sweep():
+        started.set()
+        release.wait(5)
+        return sweep()
+    store.sweep = blocking_sweep
+
+    # put returns while the sweep is still held up
+    fresh = store.put(BytesSource(b'fresh'))
+    assert started.wait(5)
+    assert os.path.exists(stale_path)
+    release.set()
+
+    deadline = time.time() + 5
+    while store._sweeping.locked() and time.time() < deadline:
+        time.sleep(0.01)
+    assert not os.path.exists(stale_path)
+    with store.open(fresh) as source:
+        assert source.read_bytes() == b'fresh'
+
+def test_one_sweep_at_a_time(tmp_path):
+    store = BlobStore(root=str(tmp_path), max_age=60)
+    release = threading.Event()
+    calls = []
+    store.sweep = lambda: calls.append(1) or release.wait(5)
+    store._last_sweep = 0
+    store.put(BytesSource(b'a'))
+    store._last_sweep = 0
+    store.put(BytesSource(b'b'))
+    release.set()
+    assert len(calls) == 1
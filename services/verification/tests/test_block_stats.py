@@ -0,0 +1,100 @@
+# services/verification/tests/test_block_stats.py
+import numpy as np
+import pytest
+from scipy import signal
+
+from algorithms import block_stats
+from algorithms.block_stats import block_std, block_std_at, byte_histogram, laplacian_residual
+from algorithms.ela_analysis import ELAAnalyzer
+from algorithms.noise_analysis import NoisePatternAnalyzer
+
+def synthetic_gray(height: int, width: int, seed: int = 0) -> np.ndarray:
+    """Smooth gradient with sensor-like noise and a spliced, noisier patch"""
+    rng = np.random.default_rng(seed)
+    base = np.add.outer(np.linspace(40, 200, height), np.linspace(0, 30, width))
+    image = base + rng.normal(0, 3, (height, width))
+    image[height // 4:height // 2, width // 4:width // 2] += \
+        rng.normal(0, 9, (height // 2 - height // 4, width // 2 - width // 4))
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+def reference_noise_consistency(gray_image: np.ndarray) -> float:
+    """Per-block implementation NoisePatternAnalyzer used before block_std"""
+    kernel = np.array([[-1, -1, -1], [-1, 8, -1], [-1, -1, -1]])
+    noise = signal.convolve2d(gray_image.astype(float), kernel, mode='same')
+
+    h, w = gray_image.shape
+    block_size = min(64, max(32, min(h, w) // 10))
+    step = block_size // 2
+    noise_stats = []
+    for i in range(0, h - block_size + 1, step):
+        for j in range(0, w - block_size + 1, step):
+            std = np.std(noise[i:i + block_size, j:j + block_size])
+            if std > 1e-3:
+                noise_stats.append(std)
+
+    if len(noise_stats) < 4:
+        return 0.0
+    median_std = np.median(noise_stats)
+    mad = np.median(np.abs(np.array(noise_stats) - median_std))
+    if median_std == 0:
+        return 0.0
+    return mad / median_std
+
+def reference_ela_score(diff: np.ndarray) -> float:
+    """Per-quality ELA score computed with separate numpy passes, as before byte_histogram"""
+    histogram, _ = np.histogram(diff.flatten(), bins=256, range=(0, 255))
+    probabilities = histogram / np.sum(histogram)
+    entropy = -np.sum(probabilities * np.log2(probabilities + 1e-8))
+    return (np.mean(diff) + np.std(diff) / 10 + np.max(diff) / 255 + entropy / 10) / 4
+
+@pytest.mark.parametrize('shape', [(37, 53), (480, 640, 3)])
+def test_byte_histogram_matches_numpy(shape):
+    values = np.random.default_rng(1).integers(0, 256, shape, dtype=np.uint8)
+    expected, _ = np.histogram(values, bins=256, range=(0, 255))
+    assert np.array_equal(byte_histogram(values), expected)
+
+def test_byte_histogram_is_exact_across_chunks(monkeypatch):
+    # Small chunks exercise the per-chunk accumulation on a non-contiguous view
+    monkeypatch.setattr(block_stats, 'HISTOGRAM_CHUNK_PIXELS', 1000)
+    values = np.random.default_rng(2).integers(0, 256, (300, 400), dtype=np.uint8)[::2, 1::3]
+    expected, _ = np.histogram(values, bins=256, range=(0, 255))
+    assert np.array_equal(byte_histogram(values), expected)
+
+def test_laplacian_residual_matches_convolve2d():
+    gray = synthetic_gray(120, 170)
+    kernel = np.array([[-1, -1, -1], [-1, 8, -1], [-1, -1, -1]])
+    expected = signal.convolve2d(gray.astype(float), kernel, mode='same')
+    assert np.array_equal(laplacian_residual(gray), expected)
+
+@pytest.mark.parametrize('block_size, step', [(32, 16), (64, 32), (7, 3)])
+def test_block_std_matches_per_block_std(block_size, step):
+    values = laplacian_residual(synthetic_gray(300, 413))
+    h, w = values.shape
+    expected = np.array([[np.std(values[i:i + block_size, j:j + block_size].astype(np.float64))
+                          for j in range(0, w - block_size + 1, step)]
+                         for i in range(0, h - block_size + 1, step)])
+    assert np.allclose(block_std(values, block_size, step), expected, rtol=1e-6, atol=1e-6)
+
+def test_block_std_at_arbitrary_starts():
+    values = laplacian_residual(synthetic_gray(200, 200, seed=3))
+    rows, cols = np.array([0, 5, 150]), np.array([17, 168])
+    expected = np.array([[np.std(values[i:i + 32, j:j + 32].astype(np.float64)) for j in cols] for i in rows])
+    assert np.allclose(block_std_at(values, rows, cols, 32), expected, rtol=1e-6, atol=1e-6)
+
+def test_block_std_of_image_smaller_than_a_block_is_empty():
+    assert block_std(np.zeros((10, 40)), 32, 16).shape == (0, 0)
+
+@pytest.mark.parametrize('shape', [(240, 320), (768, 1024), (1000, 1333)])
+def test_noise_consistency_matches_per_block_reference(shape):
+    gray = synthetic_gray(*shape, seed=4)
+    score = NoisePatternAnalyzer()._analyze_noise_consistency(gray)
+    assert abs(score - reference_noise_consistency(gray)) <= 1e-6
+
+@pytest.mark.parametrize('seed', [5, 6])
+def test_ela_score_from_histogram_matches_separate_passes(seed):
+    # Shaped like recompression differences: mostly small values, a few large ones
+    rng = np.random.default_rng(seed)
+    diff = np.minimum(rng.exponential(2.0, (480, 640, 3)), 255).astype(np.uint8)
+    diff[100:110, 200:220] = 255
+    score = ELAAnalyzer()._score_from_histogram(byte_histogram(diff))
+    assert abs(score - reference_ela_score(diff)) <= 1e-12
@@ -0,0 +1,23 @@
+# services/verification/tests/test_bulk_scan.py
+import builtins
+import pytest
+
+import bulk_scan
+
+def test_load_closes_the_file_when_mapping_fails(tmp_path, monkeypatch):
+    path = tmp_path / 'image.jpg'
+    path.write_bytes(b'\xff\xd8not really a jpeg')
+    opened = []
+
+    def tracking_open(*args, **kwargs):
+        opened.append(builtins.open(*args, **kwargs))
+        return opened[-1]
+
+    def failing_source(fileobj):
+        raise OSError("mmap failed")
+
+    monkeypatch.setattr(bulk_scan, 'open', tracking_open, raising=False)
+    monkeypatch.setattr(bulk_scan, '_FileSource', failing_source)
+    with pytest.raises(OSError, match="mmap failed"):
+        bulk_scan._load(str(path))
+    assert len(opened) == 1 and opened[0].closed
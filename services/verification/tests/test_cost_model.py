@@ -0,0 +1,35 @@
+# services/verification/tests/test_cost_model.py
+import asyncio
+import numpy as np
+from PIL import Image
+
+from cost_model import DEFAULT_MS_PER_MEGAPIXEL, MAX_OBSERVATION_RATIO, CostModel
+from forensics_engine import AdvancedForensicsEngine
+
+def test_tiny_image_is_not_observed():
+    model = CostModel()
+    # 8x8 pixels taking 5 ms of fixed overhead would be a rate of ~78000 ms/MP
+    model.observe('enhanced_ela', 64 / 1e6, 5.0)
+    assert model.estimate('enhanced_ela', 12) == DEFAULT_MS_PER_MEGAPIXEL['enhanced_ela'] * 12
+
+def test_one_observation_moves_the_estimate_boundedly():
+    model = CostModel(smoothing=0.2)
+    previous = model.ms_per_megapixel['noise_pattern']
+    model.observe('noise_pattern', 0.1, 10_000.0)
+    limit = previous + 0.2 * (previous * MAX_OBSERVATION_RATIO - previous)
+    assert model.ms_per_megapixel['noise_pattern'] <= limit + 1e-9
+
+def test_small_image_then_large_image_keeps_the_budget():
+    engine = AdvancedForensicsEngine(early_exit=False)
+    rng = np.random.default_rng(0)
+    tiny = Image.fromarray(rng.integers(0, 256, (8, 8, 3), dtype=np.uint8))
+    large = Image.fromarray(rng.integers(0, 256, (1200, 1600, 3), dtype=np.uint8))
+
+    asyncio.run(engine.analyze_image(tiny, {}))
+    for stage, rate in DEFAULT_MS_PER_MEGAPIXEL.items():
+        assert engine.cost_model.ms_per_megapixel[stage] == rate
+
+    # Generous budget: every analyzer is expected to fit, as it would without the tiny image
+    result = asyncio.run(engine.analyze_image(large, {}, budget_ms=60_000))
+    assert result['analyzers_skipped'] == {}
+    assert set(result['analyzers_run']) == set(engine.analyzers)
@@ -0,0 +1,27 @@
+# services/verification/tests/test_forensics_engine.py
+from forensics_engine import AdvancedForensicsEngine
+
+FULL_12MP = {'full': (4000, 3000), 'reduced': None}
+
+def stages_for(engine: AdvancedForensicsEngine, tiled=(), sequential=True):
+    resolutions = {name: 'full' for name in engine.analyzers}
+    return engine._analysis_stages(resolutions, FULL_12MP, list(tiled), sequential=sequential)
+
+def test_analyzers_share_one_stage_without_early_exit_or_budget():
+    engine = AdvancedForensicsEngine(early_exit=False)
+    stages = stages_for(engine, sequential=False)
+    assert len(stages) == 1
+    assert sorted(stages[0]) == sorted(engine.analyzers)
+
+def test_sequential_stages_group_similar_costs():
+    engine = AdvancedForensicsEngine()
+    stages = stages_for(engine)
+    assert stages[0] == ['metadata_consistency']
+    assert sorted(name for stage in stages for name in stage) == sorted(engine.analyzers)
+    assert len(stages) < len(engine.analyzers)
+
+def test_tiled_analyzers_form_one_stage():
+    engine = AdvancedForensicsEngine(early_exit=False)
+    stages = stages_for(engine, tiled=['enhanced_ela', 'noise_pattern'], sequential=False)
+    assert sorted(stages[-1]) == ['enhanced_ela', 'noise_pattern']
+    assert sorted(stages[0]) == ['jpeg_quality', 'metadata_consistency']
@@ -0,0 +1,152 @@
+# services/verification/tests/test_jobs.py
+import asyncio
+import httpx
+import pytest
+from typing import Dict, List, Optional, Tuple
+
+from ingest import BytesSource, ImageSource
+from jobs import BlockedCallback, Job, JobBackend, JobQueue, _deliver
+
+class ListBackend(JobBackend):
+    """Jobs queued in a list; uploads can be dropped to simulate expiry"""
+
+    def __init__(self):
+        self.pending: List[Tuple[Job, Optional[bytes]]] = []
+        self.records: Dict[str, Job] = {}
+
+    async def put(self, job: Job, source: ImageSource):
+        self.records[job.id] = job
+        self.pending.append((job, source.read_bytes()))
+
+    async def take(self, timeout: float) -> Optional[Tuple[Job, Optional[ImageSource]]]:
+        if not self.pending:
+            await asyncio.sleep(0.01)
+            return None
+        job, data = self.pending.pop(0)
+        return job, BytesSource(data) if data is not None else None
+
+    async def save(self, job: Job):
+        self.records[job.id] = Job(**vars(job))
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return self.records.get(job_id)
+
+    async def depth(self) -> int:
+        return len(self.pending)
+
+async def wait_for_status(backend: ListBackend, job_id: str, status: str):
+    while backend.records[job_id].status != status:
+        await asyncio.sleep(0.01)
+
+def test_job_with_expired_upload_fails():
+    async def run():
+        backend = ListBackend()
+        finished = []
+        queue = JobQueue(backend, analyze=lambda job, source: asyncio.sleep(0, {}), on_finish=finished.append)
+        job = Job.new('a.jpg')
+        backend.records[job.id] = job
+        backend.pending.append((job, None))
+        queue.start()
+        await asyncio.wait_for(wait_for_status(backend, job.id, 'failed'), 5)
+        await queue.stop()
+        return backend.records[job.id], finished
+
+    record, finished = asyncio.run(run())
+    assert record.status == 'failed'
+    assert 'expired' in record.error
+    assert record.finished_at is not None
+    assert [job.id for job in finished] == [record.id]
+
+def test_stop_fails_interrupted_jobs():
+    async def run():
+        backend = ListBackend()
+        finished = []
+
+        async def analyze(job: Job, source: ImageSource):
+            await asyncio.Event().wait()
+
+        queue = JobQueue(backend, analyze, on_finish=finished.append)
+        queue.start()
+        job = await queue.submit(Job.new('a.jpg'), BytesSource(b'image'))
+        await asyncio.wait_for(wait_for_status(backend, job.id, 'running'), 5)
+        await queue.stop()
+        return backend.records[job.id], finished
+
+    record, finished = asyncio.run(run())
+    assert record.status == 'failed'
+    assert 'shutdown' in record.error
+    assert [job.id for job in finished] == [record.id]
+
+def test_redis_take_returns_job_without_its_expired_upload():
+    fakeredis = pytest.importorskip('fakeredis')
+    from jobs import RedisJobBackend
+
+    async def run():
+        # from_url doesn't connect; the fake server stands in for it
+        backend = RedisJobBackend('redis://localhost:6379/0')
+        backend._redis = fakeredis.FakeAsyncRedis()
+        job = Job.new('a.jpg')
+        await backend.put(job, BytesSource(b'image'))
+        await backend._redis.delete(backend._data_key(job.id))
+        return job, await backend.take(timeout=1)
+
+    job, (taken, source) = asyncio.run(run())
+    assert taken.id == job.id
+    assert source is None
+
+@pytest.mark.parametrize('url', [
+    'http://10.0.0.5/hook',
+    'http://192.168.1.20:8080/hook',
+    'http://169.254.169.254/latest/meta-data/',
+    'http://127.0.0.1:8000/hook',
+    'http://[::1]/hook',
+    'http://localhost/hook',
+    'ftp://example.com/hook',
+])
+def test_submit_refuses_callbacks_to_internal_addresses(url):
+    async def run():
+        backend = ListBackend()
+        queue = JobQueue(backend, analyze=lambda job, source: asyncio.sleep(0, {}))
+        with pytest.raises(BlockedCallback):
+            await queue.submit(Job.new('a.jpg', callback_url=url), BytesSource(b'image'))
+        return backend
+
+    backend = asyncio.run(run())
+    assert backend.pending == [] and backend.records == {}
+
+def test_allowed_callback_host_is_accepted():
+    async def run():
+        backend = ListBackend()
+        queue = JobQueue(backend, analyze=lambda job, source: asyncio.sleep(0, {}),
+                         callback_allowed_hosts=['LocalHost'])
+        await queue.submit(Job.new('a.jpg', callback_url='http://localhost:9000/hook'), BytesSource(b'image'))
+        return backend
+
+    assert len(asyncio.run(run()).pending) == 1
+
+def test_callback_redirect_is_not_followed():
+    requested = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requested.append(str(request.url))
+        return httpx.Response(302, headers={'Location': 'http://169.254.169.254/latest/meta-data/'})
+
+    async def run():
+        job = Job.new('a.jpg', callback_url='http://93.184.216.34/hook')
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await _deliver(client, job)
+
+    callback = asyncio.run(run())
+    assert callback['status_code'] == 302
+    assert requested == ['http://93.184.216.34/hook']
+
+def test_delivery_checks_the_callback_url_again():
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise AssertionError("internal callback was requested")
+
+    async def run():
+        job = Job.new('a.jpg', callback_url='http://127.0.0.1/hook')
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await _deliver(client, job)
+
+    assert 'not a public address' in asyncio.run(run())['error']
@@ -0,0 +1,72 @@
+# services/verification/tests/test_metadata_analysis.py
+import io
+import json
+import os
+import numpy as np
+import pytest
+from PIL import Image
+
+from algorithms.jpeg_signatures import LIBJPEG_LABEL, default_index, read_signature
+from algorithms.metadata_analysis import MetadataAnalyzer
+
+PHOTOSHOP_TABLES = os.path.join(os.path.dirname(__file__), '..', 'tools', 'encoder_tables', 'photoshop.json')
+
+def photoshop_presets():
+    with open(PHOTOSHOP_TABLES, encoding='utf-8') as f:
+        return json.load(f)['encoders']
+
+def table_encoded(preset, sampling: str, **options) -> io.BytesIO:
+    """A JPEG written with a preset's quantization tables"""
+    tables = [[step for row in table for step in row] for table in preset['tables']]
+    buffer = io.BytesIO()
+    if sampling == 'grayscale':
+        Image.new('L', (64, 64), 100).save(buffer, 'JPEG', qtables=tables[:1], **options)
+    else:
+        subsampling = {'4:4:4': 0, '4:2:0': 2}[sampling]
+        Image.new('RGB', (64, 64), (120, 90, 60)).save(buffer, 'JPEG', qtables=tables,
+                                                       subsampling=subsampling, **options)
+    buffer.seek(0)
+    return buffer
+
+def libjpeg_encoded(quality: int = 85) -> io.BytesIO:
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 64), (120, 90, 60)).save(buffer, 'JPEG', quality=quality)
+    buffer.seek(0)
+    return buffer
+
+def test_generic_libjpeg_match_is_not_scored():
+    buffer = libjpeg_encoded()
+    pixels = np.asarray(Image.open(buffer).convert('RGB'))
+    buffer.seek(0)
+    result = MetadataAnalyzer().analyze({}, pixels, signature=read_signature(buffer))
+    assert result['success']
+    assert result['score'] == 0.0
+    assert any(match['label'] == LIBJPEG_LABEL for match in result['details']['encoder_matches'])
+
+def test_generic_libjpeg_match_does_not_contradict_exif_camera():
+    encoders = [{'kind': 'software', 'label': LIBJPEG_LABEL, 'quality': 92}]
+    exif = {'Make': 'Samsung', 'Model': 'Galaxy S24'}
+    assert MetadataAnalyzer()._check_encoder_signature(exif, encoders) == (0.0, None)
+
+def test_named_editor_preset_is_scored():
+    encoders = [{'kind': 'software', 'label': LIBJPEG_LABEL, 'quality': 60},
+                {'kind': 'software', 'label': 'Photoshop Save for Web 60', 'quality': None}]
+    score, indicator = MetadataAnalyzer()._check_encoder_signature({}, encoders)
+    assert score == 0.4
+    assert indicator == "Re-encoded by Photoshop Save for Web 60"
+
+def test_photoshop_table_jpeg_is_scored():
+    preset = next(p for p in photoshop_presets() if p['label'] == 'Adobe Photoshop' and p['quality'] == 8)
+    buffer = table_encoded(preset, '4:4:4', optimize=True)
+    pixels = np.asarray(Image.open(buffer).convert('RGB'))
+    buffer.seek(0)
+    result = MetadataAnalyzer().analyze({}, pixels, signature=read_signature(buffer))
+    assert result['score'] == 0.4
+    assert result['details']['indicators'] == ["Re-encoded by Adobe Photoshop (quality 8)"]
+
+@pytest.mark.parametrize('preset', photoshop_presets(), ids=lambda p: f"{p['label']} {p['quality']}")
+def test_shipped_index_has_every_photoshop_preset(preset):
+    for sampling in preset['sampling']:
+        for options in ({}, {'optimize': True}, {'progressive': True}):
+            matches = default_index().lookup(read_signature(table_encoded(preset, sampling, **options)))
+            assert {'label': preset['label'], 'kind': 'software', 'quality': preset['quality']} in matches
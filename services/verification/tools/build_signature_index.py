@@ -0,0 +1,163 @@
+# services/verification/tools/build_signature_index.py
+"""
+Build the JPEG encoder signature index
+
+Generates the libjpeg entries by encoding with libjpeg itself at every
+quality (1-100), for grayscale, 4:4:4, 4:2:2 and 4:2:0 sampling, with
+standard, optimized and progressive Huffman coding. Published tables of
+other encoders (tools/encoder_tables/*.json by default) are encoded the
+same way, with the sampling each preset uses:
+
+    {"source": "...", "encoders": [{"label": "Adobe Photoshop", "kind": "software",
+        "quality": 8, "sampling": ["4:4:4", "grayscale"], "tables": [<8x8 rows>, ...]}]}
+
+Reference images add entries for other encoders; they are organised as
+
+    REFERENCES/camera/<label>/*.jpg     e.g. camera/Canon EOS R5/IMG_0001.jpg
+    REFERENCES/software/<label>/*.jpg   e.g. software/Photoshop Save for Web 60/a.jpg
+
+Images placed directly in camera/ or software/ are labelled from their
+EXIF Make and Model, or Software tag. Every reference should be an
+untouched output of the encoder it is labelled with.
+
+Usage (from services/verification):
+    python tools/build_signature_index.py [--tables FILE ...] [--references DIR ...] [--output PATH]
+"""
+import argparse
+import glob
+import io
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+import PIL
+from PIL import Image, features
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from algorithms.jpeg_signatures import DEFAULT_INDEX_PATH, LIBJPEG_LABEL, read_signature, save_index
+
+KINDS = ('camera', 'software')
+EXTENSIONS = ('.jpg', '.jpeg', '.jpe', '.mpo')
+
+TABLES_DIR = os.path.join(os.path.dirname(__file__), 'encoder_tables')
+
+# (mode, Pillow subsampling) per sampling
+LAYOUTS = {'grayscale': ('L', -1), '4:4:4': ('RGB', 0), '4:2:2': ('RGB', 1), '4:2:0': ('RGB', 2)}
+LIBJPEG_LAYOUTS = list(LAYOUTS.values())
+LIBJPEG_CODINGS = [{}, {'optimize': True}, {'progressive': True}]
+
+class IndexBuilder:
+    """Accumulates labels and the signature keys that map to them"""
+
+    def __init__(self):
+        self.labels: List[Dict[str, Any]] = []
+        self.signatures: Dict[str, List[int]] = {}
+        self._label_ids: Dict[Tuple, int] = {}
+
+    def add(self, key: str, label: str, kind: str, quality: Optional[int] = None):
+        entry = (label, kind, quality)
+        if entry not in self._label_ids:
+            self._label_ids[entry] = len(self.labels)
+            self.labels.append({'label': label, 'kind': kind, 'quality': quality})
+        self.signatures.setdefault(key, []).append(self._label_ids[entry])
+
+def encode_signature(mode: str, subsampling: int, options: Dict[str, Any]) -> str:
+    """Key of a tiny libjpeg encode with the given layout and save options"""
+    buffer = io.BytesIO()
+    if subsampling >= 0:
+        options = dict(options, subsampling=subsampling)
+    Image.new(mode, (16, 16)).save(buffer, 'JPEG', **options)
+    return read_signature(buffer).key
+
+def add_libjpeg(builder: IndexBuilder) -> int:
+    """Signatures of libjpeg's own tables, which most software encoders use"""
+    count = 0
+    for quality in range(1, 101):
+        for mode, subsampling in LIBJPEG_LAYOUTS:
+            for coding in LIBJPEG_CODINGS:
+                key = encode_signature(mode, subsampling, dict(coding, quality=quality))
+                builder.add(key, LIBJPEG_LABEL, 'software', quality)
+                count += 1
+    return count
+
+def add_tables(builder: IndexBuilder, path: str) -> int:
+    """Signatures of published quantization tables, encoded by libjpeg
+
+    Only the tables come from the file; every Huffman coding is indexed,
+    since encoders such as Photoshop offer standard, optimized and
+    progressive output for each preset.
+    """
+    with open(path, encoding='utf-8') as f:
+        encoders = json.load(f)['encoders']
+    count = 0
+    for encoder in encoders:
+        # Tables are 8 rows of 8 steps, in natural order
+        tables = [[step for row in table for step in row] for table in encoder['tables']]
+        for sampling in encoder['sampling']:
+            mode, subsampling = LAYOUTS[sampling]
+            qtables = tables[:1] if mode == 'L' else tables
+            for coding in LIBJPEG_CODINGS:
+                key = encode_signature(mode, subsampling, dict(coding, qtables=qtables))
+                builder.add(key, encoder['label'], encoder['kind'], encoder.get('quality'))
+                count += 1
+    return count
+
+def add_references(builder: IndexBuilder, root: str) -> int:
+    count = 0
+    for kind in KINDS:
+        kind_dir = os.path.join(root, kind)
+        if not os.path.isdir(kind_dir):
+            continue
+        for dirpath, _, filenames in os.walk(kind_dir):
+            relative = os.path.relpath(dirpath, kind_dir)
+            for filename in sorted(filenames):
+                if not filename.lower().endswith(EXTENSIONS):
+                    continue
+                path = os.path.join(dirpath, filename)
+                with open(path, 'rb') as f:
+                    signature = read_signature(f)
+                label = relative if relative != '.' else exif_label(path, kind)
+                if signature is None or not label:
+                    print(f"skipped {path}: {'not a JPEG' if signature is None else 'no label'}")
+                    continue
+                builder.add(signature.key, label, kind)
+                count += 1
+    return count
+
+def exif_label(path: str, kind: str) -> Optional[str]:
+    """Make and Model for cameras, Software for editors"""
+    exif = Image.open(path).getexif()
+    if kind == 'camera':
+        make, model = str(exif.get(271, '')).strip(), str(exif.get(272, '')).strip()
+        if model.lower().startswith(make.lower()):
+            make = ''
+        return ' '.join(part for part in (make, model) if part) or None
+    return str(exif.get(305, '')).strip() or None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tables', nargs='*', default=sorted(glob.glob(os.path.join(TABLES_DIR, '*.json'))),
+                        help='JSON files of published encoder tables')
+    parser.add_argument('--references', nargs='*', default=[],
+                        help='directories laid out as camera/<label>/ and software/<label>/')
+    parser.add_argument('--output', default=DEFAULT_INDEX_PATH)
+    args = parser.parse_args()
+
+    builder = IndexBuilder()
+    sources = {
+        'libjpeg': {
+            'encodes': add_libjpeg(builder),
+            'pillow': PIL.__version__,
+            'libjpeg_turbo': features.version('libjpeg_turbo')
+        },
+        'tables': {os.path.basename(path): add_tables(builder, path) for path in args.tables},
+        'references': {os.path.basename(os.path.normpath(root)): add_references(builder, root)
+                       for root in args.references}
+    }
+    save_index(builder.labels, builder.signatures, args.output, sources)
+    print(f"{len(builder.signatures)} signatures, {len(builder.labels)} labels -> {args.output} "
+          f"({os.path.getsize(args.output) / 1024:.1f} KiB)")
+
+if __name__ == '__main__':
+    main()